@@ -1,15 +1,39 @@
 import os
-import operator
+import re
+import asyncio
+import atexit
+import inspect
+import math
+import threading
 import time
+from datetime import datetime, timezone
 from typing import TypedDict, Annotated, List
 from dotenv import load_dotenv
 
 # LangGraph & LangChain imports
 from langgraph.graph import StateGraph, START, END
-from pymongo import MongoClient
-from langchain_voyageai import VoyageAIEmbeddings
-from langchain_fireworks import ChatFireworks
+from langgraph.config import get_stream_writer
+from langgraph.types import Overwrite
+from pymongo import MongoClient, AsyncMongoClient
 from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from embedding_cache import CachedEmbeddings, build_store
+from embedding_providers import PROVIDERS, build_embeddings
+from vector_index import build_retriever
+from prefetch import PrefetchRegistry
+from intent_router import IntentRouter
+from semantic_cache import SemanticResponseCache
+from status_cache import AmenityStatusTable
+from spatial_index import LocationResolver
+from walking_graph import WalkingGraphs
+from flight_cache import FlightStatusCache
+from checkpointing import build_checkpointer, fold_summary, windowed
+from transcripts import build_transcript_store
+from session import SessionStore
+from llm_gateway import LLMGateway
+from rendering import SynthesisPolicy, render
+from itinerary import Stop, dwell_for, plan_itinerary
+from telemetry import log, telemetry
 
 # Load environment variables
 load_dotenv()
@@ -21,149 +45,420 @@ FIREWORKS_API_KEY = os.getenv("FIREWORKS_API_KEY")
 DB_NAME = "layover_os"
 COLLECTION_NAME = "amenities"
 FLIGHTS_COLLECTION = "flights"
-INDEX_NAME = "vector_index"
-
-if not MONGO_URI or not VOYAGE_API_KEY:
-    print("❌ ERROR: Missing MONGO_URI or VOYAGE_API_KEY in .env")
-    exit(1)
-
-# Initialize Real Connections
-client = MongoClient(MONGO_URI, tlsAllowInvalidCertificates=True)
-db = client[DB_NAME]
-collection = db[COLLECTION_NAME]
-flights_collection = db[FLIGHTS_COLLECTION]
-embeddings = VoyageAIEmbeddings(model="voyage-3-large", voyage_api_key=VOYAGE_API_KEY)
-
-# Initialize LLM (Fireworks)
-if FIREWORKS_API_KEY:
-    print("🧠 Fireworks AI Connected (Mixtral-8x7b)")
-    llm = ChatFireworks(
-        # model="accounts/fireworks/models/llama-v3p3-70b-instruct", 
-        model="accounts/fireworks/models/mixtral-8x7b-instruct",
-        api_key=FIREWORKS_API_KEY,
-        max_retries=0,
-        request_timeout=5
+INTENT_TABLE_PATH = os.getenv("INTENT_TABLE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "intents.json"))
+# Query embedder: voyage (API) | hashed (local, offline) | sentence-transformers (local model).
+# Each provider reads its own field/index on amenities; fill it with migrate_embeddings.py.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "voyage").lower()
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL") or PROVIDERS.get(EMBEDDING_PROVIDER, PROVIDERS["voyage"])["model"]
+EMBEDDING_FIELD = os.getenv("EMBEDDING_FIELD") or PROVIDERS.get(EMBEDDING_PROVIDER, PROVIDERS["voyage"])["field"]
+INDEX_NAME = os.getenv("INDEX_NAME") or PROVIDERS.get(EMBEDDING_PROVIDER, PROVIDERS["voyage"])["index"]
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "512"))  # hashed provider only
+EMBEDDING_IDF_PATH = os.getenv("EMBEDDING_IDF_PATH", "embedding_idf.json")  # hashed provider only
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "local")  # local (Atlas fallback) | atlas
+STATUS_CACHE = os.getenv("STATUS_CACHE", "on").lower() == "on"  # in-memory live status via change stream
+FLIGHT_CACHE_TTL = float(os.getenv("FLIGHT_CACHE_TTL", "60"))                # Seconds a cached flight status is trusted
+FLIGHT_REFRESH_SECONDS = float(os.getenv("FLIGHT_REFRESH_SECONDS", "20"))    # Bulk refresh period for active flights
+FLIGHT_CHANGE_STREAM = os.getenv("FLIGHT_CHANGE_STREAM", "on").lower() == "on"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SPATIAL_WEIGHT = float(os.getenv("SPATIAL_WEIGHT", "0.3"))  # Max score boost for being close (among relevant matches)
+PROXIMITY_SPATIAL_WEIGHT = float(os.getenv("PROXIMITY_SPATIAL_WEIGHT", "0.6"))  # ...when they ask for "nearest"
+PLANNER_CANDIDATES = int(os.getenv("PLANNER_CANDIDATES", "12"))      # Amenities the itinerary solver picks from
+PLANNER_DEADLINE_MS = float(os.getenv("PLANNER_DEADLINE_MS", "50"))  # Solver latency budget (best plan so far after that)
+BOARDING_BUFFER_MIN = float(os.getenv("BOARDING_BUFFER_MIN", "10"))  # Be at the gate this long before boarding
+
+# Conversation persistence: the last few messages verbatim, older ones folded into a summary
+CHECKPOINT_MODE = os.getenv("CHECKPOINT_MODE", "coalesced")  # coalesced | sqlite | memory | mongo (full history)
+CHECKPOINT_TTL = float(os.getenv("CHECKPOINT_TTL", str(7 * 24 * 3600)))  # Idle threads expire after this
+CHECKPOINT_FLUSH_SECONDS = float(os.getenv("CHECKPOINT_FLUSH_SECONDS", "2"))
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "checkpoints.sqlite3")
+MESSAGE_WINDOW = int(os.getenv("MESSAGE_WINDOW", "12"))
+TRANSCRIPT_BACKEND = os.getenv("TRANSCRIPT_BACKEND", "mongo")  # mongo | memory: the full log behind /threads/{id}/history
+
+# LLM gateway: coalescing, exact cache, rate/concurrency limits, hedging (see llm_gateway.py)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "10"))
+LLM_BURST = int(os.getenv("LLM_BURST", "20"))
+LLM_HEDGE_AFTER_MS = float(os.getenv("LLM_HEDGE_AFTER_MS", "1500"))  # 0 disables hedging
+LLM_BUDGET_MS = float(os.getenv("LLM_BUDGET_MS", "5000"))            # Past this, answer with the fallback template
+# Structured answers (flight status, a short hit list) are rendered from templates; the LLM only
+# synthesizes when the question needs judgement and its recent p50 fits this budget (see rendering.py)
+SYNTHESIS_BUDGET_MS = float(os.getenv("SYNTHESIS_BUDGET_MS", "1500"))
+SYNTHESIS_MODE = os.getenv("SYNTHESIS_MODE", "auto")  # auto | template | llm; per request via ?synthesis=
+
+# Query-embedding cache (repeat questions skip the Voyage round-trip)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+EMBED_CACHE_TTL = float(os.getenv("EMBED_CACHE_TTL", str(7 * 24 * 3600)))
+EMBED_CACHE_BACKEND = os.getenv("EMBED_CACHE_BACKEND", "memory")  # memory | sqlite | mongo
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", "embedding_cache.sqlite3")
+
+# Offline stand-ins for Mongo, Voyage and Fireworks with injected latency (see fakes.py):
+# no credentials needed, seeded with synthetic SFO amenities and flights.
+FAKE_BACKENDS = os.getenv("FAKE_BACKENDS", "off").lower() == "on"
+
+synthesis_policy = SynthesisPolicy(budget_ms=SYNTHESIS_BUDGET_MS)
+
+# --- SERVICES ---
+# Importing this module touches no network: init() (first request, /warmup, or the CLI) builds
+# the clients, caches and background watchers below once, as module globals the nodes use.
+def _connect():
+    """Clients (Mongo, embedder, LLM) and everything that reads through them."""
+    global cassette, REPLAYING, client, aclient, db, collection, flights_collection, adb, acollection
+    global aflights_collection, fake_embedder, intent_router, status_table, flight_cache, location_resolver
+    global walking_graphs, retriever, query_embedder, EMBEDDING_MODEL, embeddings, llm, llm_gateway, semantic_cache
+    # Record a live session once, replay it offline (see cassettes.py): CASSETTE_MODE=record|replay
+    from cassettes import CassetteChatModel, CassetteEmbeddings, CassetteMongoClient, cassette_from_env
+    cassette = cassette_from_env()
+    REPLAYING = cassette is not None and cassette.replaying
+    if cassette:
+        atexit.register(cassette.close)
+
+    if not FAKE_BACKENDS and not REPLAYING and (not MONGO_URI or (EMBEDDING_PROVIDER == "voyage" and not VOYAGE_API_KEY)):
+        raise RuntimeError("Missing MONGO_URI or VOYAGE_API_KEY in .env (or set EMBEDDING_PROVIDER=hashed)")
+
+    # Initialize Real Connections
+    # The sync client backs the checkpointer and bulk index loads; the async client serves
+    # the per-request queries so a slow Atlas call never pins a worker thread.
+    if FAKE_BACKENDS:
+        import fakes
+        client, aclient = fakes.mongo_clients(fakes.Latency.from_env("FAKE_MONGO_LATENCY_MS", 2))
+    elif REPLAYING:
+        client = aclient = None
+    else:
+        client = MongoClient(MONGO_URI, tlsAllowInvalidCertificates=True)
+        aclient = AsyncMongoClient(MONGO_URI, tlsAllowInvalidCertificates=True)
+    if cassette:
+        client = CassetteMongoClient(client, cassette)
+        aclient = CassetteMongoClient(aclient, cassette, asynchronous=True)
+    db = client[DB_NAME]
+    collection = db[COLLECTION_NAME]
+    flights_collection = db[FLIGHTS_COLLECTION]
+    adb = aclient[DB_NAME]
+    acollection = adb[COLLECTION_NAME]
+    aflights_collection = adb[FLIGHTS_COLLECTION]
+    if FAKE_BACKENDS:
+        fake_embedder = fakes.FakeEmbeddings(fakes.Latency.from_env("FAKE_EMBED_LATENCY_MS", 60), dim=EMBEDDING_DIM)
+        log.info("🧪 Fake backends seeded in memory", extra={"amenities": fakes.seed(db, fake_embedder.inner, EMBEDDING_FIELD)})
+    # Routing automaton: intents from the table, airport codes from the amenities we actually have
+    intent_router = IntentRouter.from_file(INTENT_TABLE_PATH, collection=collection)
+
+    # Live status (open/closed, wait time) mirrored in memory: change stream opened, then one bulk read
+    status_table = None
+    if STATUS_CACHE:
+        status_table = AmenityStatusTable()
+        log.info("📡 Live status table bootstrapped", extra={"amenities": status_table.watch(collection)})
+
+    # Flight board in memory: read-through on first ask, then kept fresh in bulk in the background
+    flight_cache = FlightStatusCache(ttl_seconds=FLIGHT_CACHE_TTL)
+    FlightStatusCache.ensure_index(flights_collection)
+    flight_cache.start(flights_collection, refresh_seconds=FLIGHT_REFRESH_SECONDS, watch=FLIGHT_CHANGE_STREAM)
+
+    location_resolver = LocationResolver.from_registry_file()
+    walking_graphs = WalkingGraphs.from_registry_file(collection)  # Precomputed gate/terminal walking times
+    retriever = build_retriever(RETRIEVAL_BACKEND, collection, index_name=INDEX_NAME, embedding_field=EMBEDDING_FIELD,
+                                acollection=acollection, status_table=status_table)
+    if FAKE_BACKENDS:
+        query_embedder, EMBEDDING_MODEL = fake_embedder, fake_embedder.model_name
+    elif REPLAYING:
+        query_embedder, EMBEDDING_MODEL = None, EMBEDDING_MODEL or EMBEDDING_PROVIDER
+    else:
+        query_embedder, EMBEDDING_MODEL = build_embeddings(EMBEDDING_PROVIDER, model=EMBEDDING_MODEL,
+                                                           api_key=VOYAGE_API_KEY, dim=EMBEDDING_DIM,
+                                                           idf_path=EMBEDDING_IDF_PATH)
+    if cassette:
+        query_embedder = CassetteEmbeddings(query_embedder, cassette)
+    embeddings = CachedEmbeddings(
+        query_embedder,
+        model_name=EMBEDDING_MODEL,
+        max_size=EMBED_CACHE_SIZE,
+        ttl_seconds=EMBED_CACHE_TTL,
+        store=build_store(EMBED_CACHE_BACKEND, path=EMBED_CACHE_PATH, db=db, ttl_seconds=EMBED_CACHE_TTL),
     )
-else:
-    print("⚠️ Warning: No FIREWORKS_API_KEY. Agent will use fallback text.")
-    llm = None
 
-print("✅ Connected to MongoDB Atlas & Voyage AI")
+    # Initialize LLM (Fireworks)
+    if FAKE_BACKENDS:
+        log.info("🧪 Fake LLM (FAKE_LLM_LATENCY_MS / FAKE_LLM_TOKEN_MS)")
+        llm = fakes.FakeChatModel(latency=fakes.Latency.from_env("FAKE_LLM_LATENCY_MS", 400),
+                                  token_ms=float(os.getenv("FAKE_LLM_TOKEN_MS", "5")))
+    elif REPLAYING:
+        llm = None
+    elif FIREWORKS_API_KEY:
+        from langchain_fireworks import ChatFireworks  # Pulls in the openai SDK: only when it's used
+        log.info("🧠 Fireworks AI connected", extra={"model": "mixtral-8x7b-instruct"})
+        llm = ChatFireworks(
+            # model="accounts/fireworks/models/llama-v3p3-70b-instruct", 
+            model="accounts/fireworks/models/mixtral-8x7b-instruct",
+            api_key=FIREWORKS_API_KEY,
+            max_retries=0,
+            request_timeout=5
+        )
+    else:
+        log.warning("⚠️ No FIREWORKS_API_KEY, agent will use fallback text")
+        llm = None
+    if cassette and (llm is not None or REPLAYING):
+        llm = CassetteChatModel(inner=llm, cassette=cassette)
+
+    llm_gateway = LLMGateway(
+        llm,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        rate_per_second=LLM_RATE_PER_SECOND,
+        burst=LLM_BURST,
+        hedge_after_ms=LLM_HEDGE_AFTER_MS or None,
+        budget_ms=LLM_BUDGET_MS,
+    )
+
+    log.info("✅ Connected to MongoDB", extra={"embedding_provider": EMBEDDING_PROVIDER, "embedding_model": EMBEDDING_MODEL,
+                                             "embedding_field": EMBEDDING_FIELD})
+
+    # Answers are reused only while their amenities are unchanged (timestamp lookups below)
+    semantic_cache = SemanticResponseCache(
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds=SEMANTIC_CACHE_TTL,
+        ats_lookup=table_amenity_timestamps if status_table is not None else fetch_amenity_timestamps,
+    )
+    if status_table is not None:
+        # Push invalidation: a status change evicts dependent answers before anyone asks again
+        status_table.on_change(lambda amenity_id, _status: semantic_cache.invalidate_amenities([amenity_id]))
+
+# --- SEMANTIC ANSWER CACHE ---
+# A cached answer is only reused if none of its amenities changed since (see simulate_airport.py).
+async def fetch_amenity_timestamps(amenity_ids):
+    docs = await acollection.find({"_id": {"$in": amenity_ids}}, {"metadata.last_updated_ts": 1}).to_list(None)
+    return {d["_id"]: d.get("metadata", {}).get("last_updated_ts") for d in docs}
+
+async def table_amenity_timestamps(amenity_ids):
+    return status_table.timestamps(amenity_ids)
+
+
+# --- SPECULATIVE PREFETCH ---
+# Embedding and flight lookup start the moment a message arrives, in parallel with routing.
+# Whatever the chosen route doesn't consume is cancelled by the supervisor.
+FLIGHT_CODE_PATTERN = re.compile(r'([A-Z]{2}\d{3,4})')
+PREFETCH_CONSUMERS = {"embed": {"scout", "planner"}, "flight": {"flight_tracker", "planner"}}
+
+def launch_prefetch(run, message: str):
+    run.launch("embed", embeddings.aembed_query(message))
+    match = FLIGHT_CODE_PATTERN.search(message.upper())
+    if match:
+        run.launch("flight", flight_cache.aget(match.group(1), aflights_collection), key=match.group(1))
+
+prefetcher = PrefetchRegistry(launch_prefetch)
+
+def request_id_of(config: RunnableConfig) -> str:
+    """Prefetch key: one per /chat request (api.py sets it); the thread id when run outside the API."""
+    configurable = (config or {}).get("configurable", {})
+    return configurable.get("request_id") or configurable.get("thread_id", "default_thread")
+
+def needs_llm(intent: str, query: str, config: RunnableConfig, hits: int = 0) -> bool:
+    """Asks the synthesis policy (mode from the request, else SYNTHESIS_MODE) and records its choice."""
+    mode = (config or {}).get("configurable", {}).get("synthesis") or SYNTHESIS_MODE
+    use_llm, reason = synthesis_policy.decide(intent, query, hits=hits, mode=mode,
+                                              llm_p50_ms=llm_gateway.p50_ms(intent), llm_available=llm is not None)
+    synthesis_policy.record(intent, use_llm, reason)
+    if not use_llm:
+        log.info("📝 template answer", extra={"intent": intent, "reason": reason})
+    return use_llm
+
+PROXIMITY_PATTERN = re.compile(r'\b(nearest|closest|near me|nearby|close by)\b', re.IGNORECASE)
+
+NAVIGATION_PATTERN = re.compile(
+    r'\b(?:get to|go to|walk to|way to|directions to)\s+((?:terminal|gate)\s+[A-Z0-9]+|[A-Z]\d{1,3}\b)', re.IGNORECASE
+)
+
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*(hours?|hrs?|minutes?|mins?)\b', re.IGNORECASE)
+
+def parse_duration_minutes(text: str):
+    """'2 hours' -> 120, '45 min' -> 45; None if the message names no duration."""
+    match = DURATION_PATTERN.search(text)
+    if not match:
+        return None
+    amount = float(match.group(1))
+    return amount * 60 if match.group(2).lower().startswith("h") else amount
+
+def minutes_until(value):
+    """Minutes from now until an epoch-seconds / ISO-8601 / datetime timestamp (None if unparseable)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        ts = float(value)
+    else:
+        try:
+            moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)  # Mongo hands back naive UTC datetimes
+        ts = moment.timestamp()
+    return (ts - time.time()) / 60
+
+def gate_timing(graph, user_location, gate, flight_doc):
+    """Walking time from the user to their gate and, given a boarding/departure time, whether they'll make it."""
+    if graph is None or not gate:
+        return None
+    origin, target = graph.resolve(user_location), graph.gate_node(gate)
+    if not origin or not target:
+        return None
+    walk = graph.minutes(origin, target)
+    if walk == float("inf"):
+        return None
+    timing = {"walk_minutes": round(walk, 1), "from": user_location}
+    until = minutes_until(flight_doc.get("boarding_time") or flight_doc.get("departure_time"))
+    if until is not None:
+        timing["minutes_to_spare"] = round(until - walk, 1)
+        timing["can_make_it"] = until >= walk
+    return timing
+
+async def location_in_graph(airport: str, user_location) -> bool:
+    """True if the walking graph knows this spot (gates like "D4" aren't terminal polygons)."""
+    if not user_location:
+        return False
+    graph = await walking_graphs.aget(airport)
+    return bool(graph and graph.resolve(user_location))
 
 # --- STATE DEFINITION ---
 class AgentState(TypedDict):
-    messages: Annotated[List[str], operator.add]
+    messages: Annotated[List[str], windowed(MESSAGE_WINDOW * 4)]  # compact_node keeps it at MESSAGE_WINDOW
+    summary: str         # Rolling summary of messages that fell out of the window
     user_location: str   # e.g., "Terminal 2"
     airport_code: str    # e.g., "SFO", "JFK", "DEN"
     flight_number: str   # e.g., "UA400" (Persisted)
     next_step: str
+    route_confidence: float
+
+def conversation_so_far(state: AgentState) -> str:
+    """The rolling summary plus the earlier messages still in the window, clipped; "" on a first turn."""
+    earlier = [m.content if hasattr(m, 'content') else str(m) for m in state['messages'][:-1]]
+    return fold_summary(state.get('summary', ''), earlier)
+
+def with_history(system_prompt: str, state: AgentState) -> SystemMessage:
+    """System prompt plus the conversation so far, so follow-ups ("and one closer?") make sense."""
+    history = conversation_so_far(state)
+    if history:
+        system_prompt += f"\n\nConversation so far (oldest first):\n{history}"
+    return SystemMessage(content=system_prompt)
 
 # --- NODE DEFINITIONS ---
 
-def supervisor_node(state: AgentState):
+async def supervisor_node(state: AgentState, config: RunnableConfig):
     raw_msg = state['messages'][-1]
-    if hasattr(raw_msg, 'content'):
-        last_message = raw_msg.content.lower()
-    else:
-        last_message = str(raw_msg).lower()
-    
-    import re
+    raw_text = raw_msg.content if hasattr(raw_msg, 'content') else str(raw_msg)
+
+    # No-op if the API layer already kicked this off for the same message
+    run = prefetcher.start(request_id_of(config), raw_text)
+    route_start = time.perf_counter()
     
-    # 0. Context Switching (Airport Code)
-    # Check if user mentioned a supported airport to switch context
-    found_airport = None
-    for code in ["SFO", "JFK", "DEN"]:
-        if code in last_message.upper():
-            found_airport = code
-            print(f"✈️ Context Switch Detected: {found_airport}")
-            break
-            
-    # 1. Check for Strong Flight Signals
-    # We only trigger flight logic if user EXPLICITLY asks for it or provides a code (e.g. UA400)
-    has_flight_code = re.search(r'[A-Z]{2}\d{3,4}', last_message.upper())
-    has_flight_keyword = any(kw in last_message for kw in ["flight", "fly", "airline", "boarding"])
-    is_planning_trip = "plan" in last_message and "to" in last_message # e.g. "Plan trip to JFK"
+    # Single-pass classification: intents, airport switch and flight code in one scan
+    decision = intent_router.classify(raw_text)
+    next_step = decision.intent
+    found_airport = decision.airport_code
+    if found_airport:
+        log.info("✈️ Context switch", extra={"airport": found_airport})
+    telemetry.count("route", intent=next_step)
     
-    if has_flight_keyword or has_flight_code or is_planning_trip:
-        return {"next_step": "flight_tracker", "airport_code": found_airport} if found_airport else {"next_step": "flight_tracker"}
-        
-    # 2. Check for Payment Intent
-    elif any(kw in last_message for kw in ["buy", "pay", "book", "purchase", "reserve"]):
-        return {"next_step": "bursar", "airport_code": found_airport} if found_airport else {"next_step": "bursar"}
-        
-    # 3. Default: Amenity Search (The Safety Net)
-    # "I am at SFO" -> Scout
-    # "Where is coffee?" -> Scout
-    else:
-        return {"next_step": "scout", "airport_code": found_airport} if found_airport else {"next_step": "scout"}
+    run.timings["route"] = round((time.perf_counter() - route_start) * 1000, 2)
+    run.cancel(*[name for name, steps in PREFETCH_CONSUMERS.items() if next_step not in steps])
+    update = {"next_step": next_step, "route_confidence": decision.confidence}
+    if found_airport:
+        update["airport_code"] = found_airport
+    return update
 
-def scout_node(state: AgentState):
+async def scout_node(state: AgentState, config: RunnableConfig):
     raw_msg = state['messages'][-1]
     if hasattr(raw_msg, 'content'):
         query_text = raw_msg.content
     else:
         query_text = str(raw_msg)
     airport = state.get('airport_code', 'SFO') # Default to SFO
+    run = prefetcher.start(request_id_of(config), query_text)
     
-    print(f"\n[Scout] Searching '{query_text}' in {airport}...")
+    log.info("[Scout] Searching", extra={"query": query_text, "airport": airport})
 
     # --- CONCIERGE MODE (Context Setting) ---
     # If user just says "I am at SFO", don't search. Ask for details.
     if len(query_text.split()) < 5 and ("at" in query_text.lower() or "in" in query_text.lower()) and airport.lower() in query_text.lower():
         # User is setting context: "I am at SFO"
-        if llm:
-            try:
-                sys_msg = SystemMessage(content=f"You are a helpful Concierge at {airport}. The user just arrived. Ask them TWO things: which Terminal they are in, and what amenity they are looking for. Keep it short.")
-                human_msg = HumanMessage(content=query_text)
-                ai_msg = llm.invoke([sys_msg, human_msg])
-                return {"messages": [ai_msg.content]}
-            except Exception as e:
-                print(f"❌ LLM Concierge Error: {e}")
-                return {"messages": ["Concierge: Which terminal are you in, and what do you need?"]}
-        else:
-            return {"messages": ["Concierge: Which terminal are you in, and what do you need?"]}
-    
-    query_vector = embeddings.embed_query(query_text)
+        run.cancel("embed")
+        user_location = state.get('user_location')
+        if location_resolver.resolve(airport, user_location) or await location_in_graph(airport, user_location):
+            # We already know where they are (request or session): no need to ask the LLM to ask
+            return {"messages": [render("concierge_known", airport=airport, location=user_location)]}
+        sys_msg = SystemMessage(content=f"You are a helpful Concierge at {airport}. The user just arrived. Ask them TWO things: which Terminal they are in, and what amenity they are looking for. Keep it short.")
+        human_msg = HumanMessage(content=query_text)
+        if not needs_llm("concierge", query_text, config):
+            return {"messages": [render("concierge")]}
+        # Same greeting for the same words: cacheable
+        with run.stage("llm"):
+            response = await llm_gateway.ainvoke([sys_msg, human_msg], node="concierge",
+                                                 fallback=render("concierge"), cacheable=True)
+        return {"messages": [response]}
     
+    # --- NAVIGATION ---
+    # "How do I get to Terminal 3?" is a lookup in the precomputed walking tables, not a search.
+    graph = await walking_graphs.aget(airport)
+    origin_node = graph.resolve(state.get('user_location')) if graph else None
+    nav_match = NAVIGATION_PATTERN.search(query_text)
+    if nav_match and origin_node:
+        destination = graph.resolve(nav_match.group(1))
+        if destination:
+            run.cancel("embed")
+            place = nav_match.group(1)
+            route = graph.path(origin_node, destination)
+            if route:
+                minutes = graph.minutes(origin_node, destination)
+                response = (f"Scout: {place} is about {minutes:.0f} min from {state['user_location']}. "
+                            f"Route: {' → '.join(route)}.")
+            else:
+                response = f"Scout: There's no open route to {place} from {state['user_location']} right now (a checkpoint may be closed)."
+            return {"messages": [response]}
+
     # --- TERMINAL FILTERING ---
-    import re
     terminal_match = re.search(r'Terminal\s+(\w+)', query_text, re.IGNORECASE)
     
-    # Base filter: Airport matches
-    search_filter = {"airport_code": {"$eq": airport}}
-    
+    target_terminal = None
     if terminal_match:
-        target_terminal = terminal_match.group(1)
         # Try to match the format in DB (usually just the number/letter)
-        # We add it to the filter logic
-        print(f"🎯 Filtering for Terminal: {target_terminal}")
-        search_filter["terminal_id"] = {"$eq": target_terminal}
+        target_terminal = terminal_match.group(1)
+        log.info("🎯 Filtering for terminal", extra={"terminal": target_terminal})
+
+    # --- WHERE IS THE USER? ---
+    # Gate/terminal from the session (or the terminal they just named) lets us rank by walking distance.
+    origin = location_resolver.resolve(airport, state.get('user_location'))
+    if origin is None and target_terminal:
+        origin = location_resolver.resolve(airport, target_terminal)
+    spatial_weight = 0.0
+    cache_scope = target_terminal
+    if origin is not None:
+        spatial_weight = PROXIMITY_SPATIAL_WEIGHT if PROXIMITY_PATTERN.search(query_text) else SPATIAL_WEIGHT
+        # The best answer now depends on where they stand, so cached answers must too.
+        cache_scope = f"{target_terminal or '*'}@{origin[0]:.4f},{origin[1]:.4f}"
+
+    # Usually already in flight (or done) thanks to the prefetch started with the request
+    query_vector = await run.take("embed")
+    if query_vector is None:
+        with run.stage("embed"):
+            query_vector = await embeddings.aembed_query(query_text)
+
+    # --- SEMANTIC CACHE ---
+    # Near-duplicate question about unchanged amenities: skip $vectorSearch AND the LLM.
+    with run.stage("semantic_cache"):
+        cached_answer = await semantic_cache.alookup(airport, cache_scope, query_vector)
+    if cached_answer is not None:
+        log.info("♻️ Semantic cache hit", extra={"airport": airport})
+        return {"messages": [cached_answer]}
 
     # --- PRO FILTERING ---
     # We only show results for the CURRENT AIRPORT (and Terminal if specified)
-    results = collection.aggregate([
-        {
-            "$vectorSearch": {
-                "index": INDEX_NAME,
-                "path": "embedding",
-                "queryVector": query_vector,
-                "numCandidates": 100,
-                "limit": 10,
-                "filter": search_filter
-            }
-        },
-        {"$limit": 3}, # Take top 3 after filter
-        {
-            "$project": {
-                "name": 1, 
-                "description_for_embedding": 1, 
-                "metadata": 1,
-                "terminal_id": 1,
-                "airport_code": 1
-            }
-        }
-    ])
+    with run.stage("retrieval"):
+        results = await retriever.asearch(query_vector, airport, target_terminal, limit=3,
+                                          origin=origin, spatial_weight=spatial_weight)
     
+    if origin_node:
+        # Real walking time (corridors, AirTrain, security) beats the straight-line estimate
+        for r in results:
+            minutes = graph.amenity_minutes(origin_node, r.get('_id'))
+            if minutes is not None:
+                r['walk_minutes'] = round(minutes, 1)
+
     found_items = []
     for r in results:
         name = r.get('name', 'Unknown Place')
@@ -176,48 +471,54 @@ def scout_node(state: AgentState):
         wait = meta.get('wait_time_minutes', 0)
         
         status_icon = "🟢 OPEN" if is_open else "🔴 CLOSED"
+        walk = f" | Walk: ~{r['walk_minutes']:g} min" if 'walk_minutes' in r else ""
         
-        found_items.append(
-            f"- **{name}** ({location})\n"
-            f"  Status: {status_icon} | Wait: {wait}m\n"
-            f"  {desc}"
-        )
+        found_items.append(render("scout_item", name=name, location=location, status=status_icon,
+                                  wait=wait, walk=walk, description=desc))
     
+    # Let /chat/stream show the hits while the LLM is still thinking.
+    get_stream_writer()({
+        "event": "retrieval",
+        "results": [
+            {"name": r.get('name'), "terminal_id": r.get('terminal_id'), "metadata": r.get('metadata', {}),
+             "walk_minutes": r.get('walk_minutes')}
+            for r in results
+        ]
+    })
+
     if not found_items:
-        response = f"Scout: I couldn't find anything matching '{query_text}' at {airport}."
+        response = render("scout_empty", query=query_text, airport=airport)
     else:
         context = "\n".join(found_items)
-        if llm:
-             # Natural Language Synthesis
-            sys_msg = SystemMessage(
-                content=f"You are LayoverOS, an advanced operating system for travel. {airport}. "
-                        "The user is on a layover. Optimize their time based on the amenities found. "
-                        "Keep it short, professional, and helpful. Mention the location (terminal) and status."
-            )
-            human_msg = HumanMessage(content=f"User Request: {query_text}\n\nContext Options:\n{context}")
-            try:
-                ai_msg = llm.invoke([sys_msg, human_msg])
-                response = ai_msg.content
-            except Exception as e:
-                print(f"❌ LLM Error: {e}") 
-                # Hackathon Fix: Hide the ugly error from the UI. User just wants results.
-                response = f"Scout: Here are the top options I found for you:\n{context}"
-        else:
-            # Fallback
-            response = f"Scout: Here are the top options at {airport}:\n\n" + "\n".join(found_items)
-        
+        if not needs_llm("scout", query_text, config, hits=len(found_items)):
+            return {"messages": [render("scout", context=context)]}
+        # Natural Language Synthesis
+        sys_msg = with_history(
+            f"You are LayoverOS, an advanced operating system for travel. {airport}. "
+            "The user is on a layover. Optimize their time based on the amenities found. "
+            "Keep it short, professional, and helpful. Mention the location (terminal), walking time if given, and status.",
+            state,
+        )
+        human_msg = HumanMessage(content=f"User Request: {query_text}\n\nContext Options:\n{context}")
+        # Hackathon Fix: on LLM trouble, hide the ugly error from the UI. User just wants results.
+        fallback = render("scout", context=context)
+        with run.stage("llm"):
+            response = await llm_gateway.ainvoke([sys_msg, human_msg], node="scout", fallback=fallback)
+        if response != fallback:
+            # Only real syntheses are worth reusing; fallbacks are cheap to rebuild.
+            semantic_cache.store(airport, cache_scope, query_text, query_vector, response, results)
+
     return {"messages": [response]}
 
-def flight_node(state: AgentState):
+async def flight_node(state: AgentState, config: RunnableConfig):
     """
     Looks up flight details in the 'flights' collection.
     """
     raw_msg = state['messages'][-1]
-    if hasattr(raw_msg, 'content'):
-        last_message = raw_msg.content.upper()
-    else:
-        last_message = str(raw_msg).upper()
-    print(f"\n[FlightTracker] Analyzing: {last_message}")
+    raw_text = raw_msg.content if hasattr(raw_msg, 'content') else str(raw_msg)
+    last_message = raw_text.upper()
+    run = prefetcher.start(request_id_of(config), raw_text)
+    log.info("[FlightTracker] Analyzing", extra={"query": last_message})
     
     # Simple extraction: look for typical flight codes like "UA123"
     # In a hackathon, we can just search the collection for *any* match in the text
@@ -227,46 +528,61 @@ def flight_node(state: AgentState):
     # Let's try searching text index if it exists, or just regex find
     
     # Hackathon Shortcut: Search for typical prefixes
-    import re
     # 1. Try to find in current message
-    import re
-    match = re.search(r'([A-Z]{2}\d{3,4})', last_message)
+    match = FLIGHT_CODE_PATTERN.search(last_message)
     
     current_flight = state.get('flight_number')
     
     if match:
         flight_num = match.group(1)
-        print(f"Detected Flight Number: {flight_num}")
+        log.info("Detected flight number", extra={"flight": flight_num})
         # SAVE TO STATE!
         # (Note: In LangGraph, returning a key updates that key in the state)
         
     elif current_flight:
         # Use memory
         flight_num = current_flight
-        print(f"Using Remembered Flight: {flight_num}")
+        log.info("Using remembered flight", extra={"flight": flight_num})
     else:
         flight_num = None
 
     if flight_num:
-        doc = flights_collection.find_one({"flight_number": flight_num})
+        if run.has("flight", flight_num):
+            doc = await run.take("flight")
+        else:
+            with run.stage("flight"):
+                doc = await flight_cache.aget(flight_num, aflights_collection)
         
         if doc:
             status = doc.get('status', 'Unknown')
             gate = doc.get('gate', 'TBD')
             dest = doc.get('destination', 'Unknown')
+
+            # "Can I make it?": precomputed walking time to the gate vs. time left before boarding
+            timing = gate_timing(await walking_graphs.aget(state.get('airport_code', 'SFO')),
+                                 state.get('user_location'), gate, doc)
+            walk_note = ""
+            if timing:
+                walk_note = f"\nWalk to gate: ~{timing['walk_minutes']:.0f} min from {timing['from']}"
+                if "minutes_to_spare" in timing:
+                    spare = timing["minutes_to_spare"]
+                    walk_note += f" ({spare:.0f} min to spare ✅)" if timing["can_make_it"] else f" (⚠️ {abs(spare):.0f} min short, hurry!)"
+
+            get_stream_writer()({
+                "event": "flight",
+                "flight": {"flight_number": flight_num, "destination": dest, "status": status, "gate": gate,
+                           "timing": timing}
+            })
             
-            if llm:
-                try:
-                    sys_msg = SystemMessage(content="You are a Flight Tracker. Inform the user about their flight status clearly.")
-                    # We mention the flight number in the human msg context so LLM knows it
-                    human_msg = HumanMessage(content=f"Flight: {flight_num} to {dest}. Status: {status}. Gate: {gate}. \nUser asked: {last_message}")
-                    ai_msg = llm.invoke([sys_msg, human_msg])
-                    response = ai_msg.content
-                except Exception as e:
-                    print(f"❌ LLM Error (FlightNode): {e}")
-                    response = f"✈️ **Flight {flight_num} to {dest}**\nStatus: **{status}**\nGate: {gate}"
-            else:
-                response = f"✈️ **Flight {flight_num} to {dest}**\nStatus: **{status}**\nGate: {gate}"
+            sys_msg = with_history("You are a Flight Tracker. Inform the user about their flight status clearly.", state)
+            # We mention the flight number in the human msg context so LLM knows it
+            human_msg = HumanMessage(content=f"Flight: {flight_num} to {dest}. Status: {status}. Gate: {gate}.{walk_note} \nUser asked: {last_message}")
+            fallback = render("flight_status", flight_number=flight_num, destination=dest, status=status,
+                              gate=gate, walk_note=walk_note)
+            if not needs_llm("flight_tracker", raw_text, config):
+                return {"messages": [fallback], "flight_number": flight_num}
+            with run.stage("llm"):
+                response = await llm_gateway.ainvoke([sys_msg, human_msg], node="flight_tracker", fallback=fallback)
                 
             return {"messages": [response], "flight_number": flight_num}
         else:
@@ -276,30 +592,166 @@ def flight_node(state: AgentState):
     else:
         # Fallback search in flights collection using text if no regex match?
         # For hackathon, just ask for clarity
-        if llm:
-            try:
-                 response = llm.invoke("User wants to find a flight but didn't provide a number. Ask them for it politely. Keep it short.").content
-            except Exception as e:
-                 print(f"❌ LLM Flight Fallback Error: {e}")
-                 response = "FlightTracker: I can help with that. What is the flight number? (e.g., UA400)"
-        else:
-             response = "FlightTracker: I can help with that. What is the flight number? (e.g., UA400)"
-             
+        if not needs_llm("flight_ask", raw_text, config):
+            return {"messages": [render("flight_ask")]}
+        # Always the same prompt: one LLM call, then served from the gateway cache
+        response = await llm_gateway.ainvoke(
+            "User wants to find a flight but didn't provide a number. Ask them for it politely. Keep it short.",
+            node="flight_ask", fallback=render("flight_ask"), cacheable=True,
+        )
+
         return {"messages": [response]}
 
-def bursar_node(state: AgentState):
-    print("\n[Bursar] Processing Payment...")
+async def planner_node(state: AgentState, config: RunnableConfig):
+    """
+    Packs amenities into the time before boarding: relevance from retrieval, live wait times
+    and open status, walking times from the precomputed tables, and an anytime orienteering
+    solver (itinerary.py) that always leaves enough time to reach the gate.
+    """
+    raw_msg = state['messages'][-1]
+    query_text = raw_msg.content if hasattr(raw_msg, 'content') else str(raw_msg)
+    airport = state.get('airport_code', 'SFO')
+    user_location = state.get('user_location')
+    run = prefetcher.start(request_id_of(config), query_text)
+    log.info("[Planner] Planning", extra={"query": query_text, "airport": airport})
+
+    graph = await walking_graphs.aget(airport)
+    origin = graph.resolve(user_location) if graph else None
+    if origin is None:
+        run.cancel("embed", "flight")
+        return {"messages": ["Planner: Which terminal or gate are you at right now? I'll plan your layover from there."]}
+
+    # The flight mentioned now, else the one we remember: gives the gate and boarding time
+    match = FLIGHT_CODE_PATTERN.search(query_text.upper())
+    flight_num = match.group(1) if match else state.get('flight_number')
+    doc = None
+    if flight_num:
+        if run.has("flight", flight_num):
+            doc = await run.take("flight")
+        else:
+            with run.stage("flight"):
+                doc = await flight_cache.aget(flight_num, aflights_collection)
+    gate = doc.get('gate') if doc else None
+    gate_node = graph.gate_node(gate) if gate else None
+    remember = {"flight_number": flight_num} if doc else {}
+
+    # An explicit "I have 2 hours" wins over the boarding time
+    budget = parse_duration_minutes(query_text)
+    if budget is None and doc:
+        budget = minutes_until(doc.get('boarding_time') or doc.get('departure_time'))
+    if budget is None:
+        run.cancel("embed")
+        return {"messages": ["Planner: How much time do you have, or what's your flight number (e.g., UA400)?"]}
+    if gate_node:
+        budget -= BOARDING_BUFFER_MIN
+    end = gate_node or origin  # No gate known: plan a loop back to where they are
+    destination = f"to gate {gate}" if gate_node else f"back to {user_location}"
+
+    # Nothing to plan: no walking route at all, or boarding (less the buffer) has already passed
+    walk = graph.minutes(origin, end)
+    if math.isinf(walk):
+        run.cancel("embed")
+        response = f"Planner: I can't find a walking route from {user_location} {destination}. Please ask airport staff or check the signs."
+        return {"messages": [response], **remember}
+    if budget <= 0:
+        run.cancel("embed")
+        response = f"Planner: Boarding is due now or has passed, so there's no time for stops. Go {destination} now (~{walk:.0f} min walk)."
+        return {"messages": [response], **remember}
+
+    query_vector = await run.take("embed")
+    if query_vector is None:
+        with run.stage("embed"):
+            query_vector = await embeddings.aembed_query(query_text)
+    with run.stage("retrieval"):
+        results = await retriever.asearch(query_vector, airport, None, limit=PLANNER_CANDIDATES)
+
+    stops = []
+    for r in results:
+        meta = r.get('metadata', {})
+        if not meta.get('is_open_now', True):
+            continue
+        stops.append(Stop(r['_id'], r.get('name', 'Unknown Place'), max(float(r.get('score', 0.0)), 0.01),
+                          dwell_for(r.get('type'), meta.get('wait_time_minutes', 0)), r.get('terminal_id')))
+
+    with run.stage("plan"):
+        plan = await asyncio.to_thread(plan_itinerary, graph, origin, end, stops, budget, PLANNER_DEADLINE_MS)
+
+    get_stream_writer()({
+        "event": "itinerary",
+        "budget_minutes": round(budget, 1),
+        "stops": [{"name": s.name, "terminal_id": s.terminal_id, "minutes": round(s.dwell_minutes)}
+                  for s in (plan.stops if plan else [])],
+        "total_minutes": plan.total_minutes if plan else None,
+        "optimal": plan.optimal if plan else None,
+    })
+
+    if plan is None:  # Reachable, but the walk alone takes longer than the time left
+        response = f"Planner: It's a ~{walk:.0f} min walk {destination} and you have ~{budget:.0f} min. Head there now!"
+    elif not plan.stops:
+        response = f"Planner: No stop fits in ~{budget:.0f} min. Take it easy and walk {destination} (~{plan.legs[-1]:.0f} min)."
+    else:
+        lines = [f"Planner: Here's your layover plan ({plan.total_minutes:.0f} of {budget:.0f} min):"]
+        for i, (stop, walk) in enumerate(zip(plan.stops, plan.legs), 1):
+            where = f"Terminal {stop.terminal_id}" if stop.terminal_id and stop.terminal_id != "General Area" else "General Area"
+            lines.append(f"{i}. **{stop.name}** ({where}): ~{walk:.0f} min walk, ~{stop.dwell_minutes:.0f} min there")
+        lines.append(f"Then ~{plan.legs[-1]:.0f} min {destination}.")
+        response = "\n".join(lines)
+        if needs_llm("planner", query_text, config, hits=len(plan.stops)):
+            sys_msg = with_history(
+                f"You are LayoverOS, planning a layover at {airport}. Present this plan in a friendly, short way. "
+                "Keep every stop, its order and the times; don't add places.",
+                state,
+            )
+            human_msg = HumanMessage(content=f"User Request: {query_text}\n\nPlan:\n{response}")
+            with run.stage("llm"):
+                response = await llm_gateway.ainvoke([sys_msg, human_msg], node="planner", fallback=response)
+
+    return {"messages": [response], **remember}
+
+async def bursar_node(state: AgentState):
+    log.info("[Bursar] Processing payment")
     # We send a special tag that the Frontend recognizes to open the Modal
     return {"messages": ["Bursar: I have located the United Club in Terminal 3. Access is $50. Opening secure payment gateway... [PAYMENT_REQUIRED]"]}
 
+async def compact_node(state: AgentState):
+    """Keeps the checkpoint bounded: messages beyond the window are folded into the rolling summary."""
+    messages = state['messages']
+    if len(messages) <= MESSAGE_WINDOW:
+        return {}
+    dropped = [m.content if hasattr(m, 'content') else str(m) for m in messages[:-MESSAGE_WINDOW]]
+    return {
+        "messages": Overwrite(messages[-MESSAGE_WINDOW:]),
+        "summary": fold_summary(state.get('summary', ''), dropped),
+    }
+
 # --- GRAPH CONSTRUCTION ---
 
+def timed_node(name: str, node):
+    """
+    Runs the node in a node.<name> span (/metrics, OpenTelemetry) and adds its wall time to the
+    request's timings (per-node latency in /chat).
+    """
+    takes_config = len(inspect.signature(node).parameters) > 1
+
+    async def run_node(state: AgentState, config: RunnableConfig):
+        start = time.perf_counter()
+        try:
+            with telemetry.span(f"node.{name}"):
+                return await (node(state, config) if takes_config else node(state))
+        finally:
+            run = prefetcher.get(request_id_of(config))
+            if run is not None:
+                run.timings[f"node.{name}"] = round((time.perf_counter() - start) * 1000, 2)
+    return run_node
+
 builder = StateGraph(AgentState)
 
-builder.add_node("supervisor", supervisor_node)
-builder.add_node("scout", scout_node)
-builder.add_node("flight_tracker", flight_node)
-builder.add_node("bursar", bursar_node)
+builder.add_node("supervisor", timed_node("supervisor", supervisor_node))
+builder.add_node("scout", timed_node("scout", scout_node))
+builder.add_node("flight_tracker", timed_node("flight_tracker", flight_node))
+builder.add_node("bursar", timed_node("bursar", bursar_node))
+builder.add_node("planner", timed_node("planner", planner_node))
+builder.add_node("compact", timed_node("compact", compact_node))
 
 builder.add_edge(START, "supervisor")
 
@@ -312,25 +764,146 @@ builder.add_conditional_edges(
     {
         "scout": "scout",
         "flight_tracker": "flight_tracker",
-        "bursar": "bursar"
+        "bursar": "bursar",
+        "planner": "planner"
     }
 )
 
-builder.add_edge("scout", END)
-builder.add_edge("flight_tracker", END)
-builder.add_edge("bursar", END)
+for answer_node in ("scout", "flight_tracker", "bursar", "planner"):
+    builder.add_edge(answer_node, "compact")
+builder.add_edge("compact", END)
+
+# --- LIFECYCLE ---
+# init() builds the services (once); warmup() then pre-connects the pools, pre-embeds common
+# questions and loads the per-airport indexes so the first real request doesn't pay for them.
+# api.py exposes both as /warmup and /ready.
+sessions = SessionStore(ttl_seconds=CHECKPOINT_TTL)  # Airport / location / flight per thread, see session.py
+
+WARMUP_QUERIES = [q.strip() for q in os.getenv(
+    "WARMUP_QUERIES", "coffee,restrooms,quiet lounge,something healthy to eat,bar,charging station,pharmacy"
+).split(",") if q.strip()]
+WARMUP_AIRPORTS = [a.strip().upper() for a in os.getenv("WARMUP_AIRPORTS", "SFO").split(",") if a.strip()]
 
-# --- PERSISTENCE (THE "OFFLINE" BRAIN) ---
-from langgraph.checkpoint.mongodb import MongoDBSaver
+_lifecycle = {"initialized": False, "warmed": False, "init_ms": None, "warmup": None, "error": None}
+_init_lock = threading.Lock()
+_warmup_lock = asyncio.Lock()
+_LAZY = {"checkpointer", "transcripts", "app", "cassette", "REPLAYING", "client", "aclient", "db", "collection",
+         "flights_collection", "adb", "acollection", "aflights_collection", "fake_embedder", "intent_router",
+         "status_table", "flight_cache", "location_resolver", "walking_graphs", "retriever", "query_embedder",
+         "embeddings", "llm", "llm_gateway", "semantic_cache"}
 
-# Initialize Checkpointer
-# This saves every "thought" to MongoDB so if WiFi dies, we remember everything.
-checkpointer = MongoDBSaver(client)
+def init():
+    """Connects and builds every service exactly once (thread-safe); returns the compiled graph."""
+    global checkpointer, transcripts, app
+    with _init_lock:
+        if _lifecycle["initialized"]:
+            return app
+        start = time.perf_counter()
+        try:
+            _connect()
+            # --- PERSISTENCE (THE "OFFLINE" BRAIN) ---
+            # Latest state per thread lives in memory and is flushed to MongoDB as deltas every few
+            # seconds, so if WiFi dies we still remember everything (see checkpointing.py).
+            if cassette and CHECKPOINT_MODE == "mongo":
+                # MongoDBSaver drives pymongo directly: keep it on the live client, and in memory on replay
+                checkpointer = build_checkpointer("memory" if REPLAYING else "mongo", client=client.inner,
+                                                  ttl_seconds=CHECKPOINT_TTL)
+            else:
+                checkpointer = build_checkpointer(CHECKPOINT_MODE, client=client, path=CHECKPOINT_PATH,
+                                                  ttl_seconds=CHECKPOINT_TTL, flush_seconds=CHECKPOINT_FLUSH_SECONDS)
+            if hasattr(checkpointer, "close"):
+                atexit.register(checkpointer.close)  # Last flush on shutdown
+            transcripts = build_transcript_store(TRANSCRIPT_BACKEND, db=db, adb=adb, ttl_seconds=CHECKPOINT_TTL)
 
-app = builder.compile(checkpointer=checkpointer)
+            # Cache / gateway counters, read at scrape time by /metrics (see telemetry.py)
+            telemetry.add_source("embedding_cache", embeddings.stats)
+            telemetry.add_source("semantic_cache", semantic_cache.stats)
+            telemetry.add_source("flight_cache", flight_cache.stats)
+            telemetry.add_source("llm", llm_gateway.stats)
+            telemetry.add_source("synthesis", synthesis_policy.stats)
+            if status_table is not None:
+                telemetry.add_source("status_table", status_table.stats)
+            if hasattr(checkpointer, "stats"):
+                telemetry.add_source("checkpoint", checkpointer.stats)
+
+            app = builder.compile(checkpointer=checkpointer)
+        except Exception as e:
+            _lifecycle["error"] = f"{type(e).__name__}: {e}"
+            raise
+        _lifecycle.update(initialized=True, error=None, init_ms=round((time.perf_counter() - start) * 1000, 1))
+        log.info("✅ LayoverOS services ready", extra={"init_ms": _lifecycle["init_ms"]})
+    return app
+
+async def ainit():
+    """init() off the event loop (the first build does blocking I/O); free once it has run."""
+    if _lifecycle["initialized"]:
+        return app
+    return await asyncio.to_thread(init)
+
+async def _ping(name: str, ping):
+    try:
+        await ping()
+        return name, "ok"
+    except Exception as e:
+        return name, f"{type(e).__name__}: {e}"
+
+async def warmup(queries: List[str] = None, airports: List[str] = None) -> dict:
+    """
+    Idempotent: builds the services if needed, then opens both Mongo pools, embeds `queries`
+    into the embedding cache and loads the vector index + walking graph of each airport.
+    Failures are reported per step; the service counts as warm once this has run.
+    """
+    queries = WARMUP_QUERIES if queries is None else queries
+    airports = WARMUP_AIRPORTS if airports is None else [a.upper() for a in airports]
+    async with _warmup_lock:
+        timings, checks = {}, {}
+        stage = time.perf_counter()
+        await ainit()
+        timings["init"] = round((time.perf_counter() - stage) * 1000, 1)
+
+        stage = time.perf_counter()
+        pings = []
+        if isinstance(client, MongoClient):
+            pings.append(_ping("mongo", lambda: asyncio.to_thread(client.admin.command, "ping")))
+        if isinstance(aclient, AsyncMongoClient):
+            pings.append(_ping("mongo_async", lambda: aclient.admin.command("ping")))
+        checks.update(dict(await asyncio.gather(*pings)))
+        timings["connect"] = round((time.perf_counter() - stage) * 1000, 1)
+
+        stage = time.perf_counter()
+        embedded = await asyncio.gather(*(embeddings.aembed_query(q) for q in queries), return_exceptions=True)
+        failed = [e for e in embedded if isinstance(e, Exception)]
+        checks["embed"] = f"{len(queries) - len(failed)}/{len(queries)} queries cached" + (
+            f" ({type(failed[0]).__name__}: {failed[0]})" if failed else "")
+        timings["embed"] = round((time.perf_counter() - stage) * 1000, 1)
+
+        for airport in airports:
+            stage = time.perf_counter()
+            try:
+                await asyncio.to_thread(retriever.warm, airport)
+                await walking_graphs.aget(airport)
+                checks[f"indexes.{airport}"] = "ok"
+            except Exception as e:
+                checks[f"indexes.{airport}"] = f"{type(e).__name__}: {e}"
+            timings[f"indexes.{airport}"] = round((time.perf_counter() - stage) * 1000, 1)
+
+        _lifecycle.update(warmed=True, warmup={"timings": timings, "checks": checks})
+        log.info("🔥 Warm", extra={"warmup_ms": round(sum(timings.values()), 1), "checks": checks})
+        return readiness()
+
+def readiness() -> dict:
+    """Lifecycle state for /ready: initialized (services built), warmed (warmup() ran), last error."""
+    return {"ready": _lifecycle["initialized"] and _lifecycle["warmed"], **_lifecycle}
+
+def __getattr__(name):
+    # `agent_graph.app`, `agent_graph.llm_gateway`, ... from outside build the services on first access
+    if name in _LAZY:
+        init()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- CLI TEST RUNNER ---
-if __name__ == "__main__":
+async def run_cli():
     print("🚀 LayoverOS (REAL MODE) Started.")
     
     # Mock Config
@@ -343,7 +916,7 @@ if __name__ == "__main__":
     
     while True:
         try:
-            user_input = input("\nUser (Type 'quit' to exit): ")
+            user_input = await asyncio.to_thread(input, "\nUser (Type 'quit' to exit): ")
             if user_input.lower() in ["quit", "exit"]:
                 break
             
@@ -355,8 +928,17 @@ if __name__ == "__main__":
                 continue
 
             current_state["messages"].append(user_input)
-            output = app.invoke(current_state, config=config)
+            output = await app.ainvoke(current_state, config=config)
             print(f"\n{output['messages'][-1]}")
             current_state = output
         except Exception as e:
             print(f"Error: {e}")
+
+if __name__ == "__main__":
+    try:
+        init()
+    except RuntimeError as e:
+        print(f"❌ ERROR: {e}")
+        exit(1)
+    # One event loop for the whole session: the async Mongo client is bound to it.
+    asyncio.run(run_cli())
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List, Optional
+
+from spatial_index import distance_m
+
+# Configuration
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "airports.json")
+OVERPASS_URL = os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+CACHE_DIR = os.getenv("OVERPASS_CACHE_DIR", ".overpass_cache")
+MIN_INTERVAL = float(os.getenv("OVERPASS_MIN_INTERVAL", "1.0"))  # Seconds between requests (public API etiquette)
+MAX_ATTEMPTS = 4
+DUPLICATE_RADIUS_M = 30  # Same name within this distance = the same place mapped as node and way
+DEFAULT_TERMINAL = "General Area"
+
+# --- REGISTRY ---
+
+def load_registry(path: str = REGISTRY_PATH) -> Dict[str, dict]:
+    with open(path, "r") as f:
+        return {a["code"].upper(): a for a in json.load(f)["airports"]}
+
+
+def build_query(airport: dict) -> str:
+    around = f"around:{airport['radius_m']}, {airport['lat']}, {airport['lon']}"
+    return f"""
+[out:json][timeout:90];
+(
+  node["amenity"]({around});
+  way["amenity"]({around});
+  node["shop"]({around});
+  way["shop"]({around});
+);
+out center;
+"""
+
+# --- GEOMETRY ---
+
+def point_in_polygon(lat: float, lon: float, polygon: List[List[float]]) -> bool:
+    """Ray casting over a [lat, lon] ring."""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lon_i > lon) != (lon_j > lon):
+            crossing = lat_i + (lon - lon_i) * (lat_j - lat_i) / (lon_j - lon_i)
+            if lat < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+def _bbox(polygon):
+    lats = [p[0] for p in polygon]
+    lons = [p[1] for p in polygon]
+    return min(lats), max(lats), min(lons), max(lons)
+
+
+class TerminalLocator:
+    """Maps a coordinate to a terminal_id; bounding boxes reject most polygons cheaply."""
+
+    def __init__(self, terminals: List[dict]):
+        self._terminals = [(t["id"], _bbox(t["polygon"]), t["polygon"]) for t in terminals]
+
+    def locate(self, lat: float, lon: float) -> str:
+        for terminal_id, (lat0, lat1, lon0, lon1), polygon in self._terminals:
+            if lat0 <= lat <= lat1 and lon0 <= lon <= lon1 and point_in_polygon(lat, lon, polygon):
+                return terminal_id
+        return DEFAULT_TERMINAL
+
+
+# --- OVERPASS CLIENT ---
+
+class RateLimiter:
+    """Spaces requests at least `min_interval` apart across all worker threads."""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class OverpassClient:
+    """
+    Fetches raw Overpass JSON, caching every response on disk keyed by airport + query hash.
+    With offline=True only the cache is used, so tests and CI never touch the network.
+    """
+
+    def __init__(self, url: str = OVERPASS_URL, cache_dir: Optional[str] = CACHE_DIR,
+                 offline: bool = False, refresh: bool = False, min_interval: float = MIN_INTERVAL):
+        self.url = url
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.refresh = refresh
+        self.limiter = RateLimiter(min_interval)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_path(self, code: str, query: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        digest = hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.cache_dir, f"{code.lower()}_{digest}.json")
+
+    def _download(self, query: str) -> bytes:
+        body = urllib.parse.urlencode({"data": query}).encode("utf-8")
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            self.limiter.wait()
+            try:
+                with urllib.request.urlopen(self.url, data=body, timeout=120) as resp:
+                    return resp.read()
+            except Exception as e:
+                if attempt == MAX_ATTEMPTS:
+                    raise
+                delay = 5 * attempt  # 429 / 504 from Overpass mean "slow down"
+                print(f"⚠️  Overpass request failed ({e}). Retry {attempt}/{MAX_ATTEMPTS - 1} in {delay}s...")
+                time.sleep(delay)
+
+    def fetch(self, code: str, query: str) -> dict:
+        path = self.cache_path(code, query)
+        if path and os.path.exists(path) and not self.refresh:
+            with open(path, "rb") as f:
+                return json.load(f)
+        if self.offline:
+            raise FileNotFoundError(f"No cached Overpass response for {code} ({path}) and offline mode is on")
+
+        raw = self._download(query)
+        if path:
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, path)
+        return json.loads(raw)
+
+# --- EXTRACTION ---
+
+def iter_amenities(airport: dict, data: dict) -> Iterator[dict]:
+    """Named amenity/shop elements as seed records, with node/way duplicates removed."""
+    code = airport["code"].upper()
+    locator = TerminalLocator(airport.get("terminals", []))
+    seen_ids = set()
+    seen_names: Dict[str, List[tuple]] = {}
+
+    for element in data.get("elements", []):
+        tags = element.get("tags") or {}
+        name = tags.get("name")
+        if not name:
+            continue
+        element_id = (element.get("type"), element.get("id"))
+        if element_id in seen_ids:
+            continue
+        seen_ids.add(element_id)
+
+        # Nodes carry lat/lon; ways carry a center (from `out center`).
+        center = element if "lat" in element else element.get("center")
+        if not center:
+            continue
+        lat, lon = float(center["lat"]), float(center["lon"])
+
+        # The same café is often mapped as a node AND as a building way a few metres away.
+        name_key = name.strip().lower()
+        nearby = seen_names.setdefault(name_key, [])
+        if any(distance_m(lat, lon, lat2, lon2) <= DUPLICATE_RADIUS_M for lat2, lon2 in nearby):
+            continue
+        nearby.append((lat, lon))
+
+        type_tag = "amenity" if "amenity" in tags else "shop"
+        terminal_id = locator.locate(lat, lon)
+        where = f"Terminal {terminal_id}" if terminal_id != DEFAULT_TERMINAL else "the general area"
+        yield {
+            "name": name,
+            "type": tags.get(type_tag),
+            "airport_code": code,
+            "terminal_id": terminal_id,
+            "desc": f"{name} is a {tags.get(type_tag)} located in {where} at {code} airport.",
+            "lat": lat,
+            "lon": lon,
+            "osm_id": f"{element_id[0]}/{element_id[1]}",
+        }
+
+
+def output_path(out_dir: str, code: str) -> str:
+    return os.path.join(out_dir, f"{code.lower()}_amenities.jsonl")
+
+
+def extract_airport(client: OverpassClient, airport: dict, out_dir: str) -> int:
+    """Writes one airport's amenities to <out_dir>/<code>_amenities.jsonl. Returns the count."""
+    code = airport["code"].upper()
+    data = client.fetch(code, build_query(airport))
+    path = output_path(out_dir, code)
+    tmp = path + ".tmp"
+    count = 0
+    with open(tmp, "w") as f:
+        for record in iter_amenities(airport, data):
+            f.write(json.dumps(record) + "\n")
+            count += 1
+    os.replace(tmp, path)  # Readers never see a half-written file
+    return count
+
+
+def extract_all(codes: Optional[List[str]] = None, out_dir: str = ".", workers: int = 4,
+                client: Optional[OverpassClient] = None, registry_path: str = REGISTRY_PATH) -> Dict[str, int]:
+    """Extracts airports in parallel: {code: places written}. An airport that failed is reported and left out."""
+    registry = load_registry(registry_path)
+    codes = [c.upper() for c in codes] if codes else list(registry)
+    unknown = [c for c in codes if c not in registry]
+    if unknown:
+        raise ValueError(f"Airports not in registry: {', '.join(unknown)}")
+
+    client = client or OverpassClient()
+    os.makedirs(out_dir, exist_ok=True)
+    results = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(extract_airport, client, registry[c], out_dir): c for c in codes}
+        for future in as_completed(futures):
+            code = futures[future]
+            try:
+                results[code] = future.result()
+                print(f"✅ {code}: {results[code]} places -> {output_path(out_dir, code)}")
+            except Exception as e:
+                print(f"❌ {code}: {e}")
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """CLI entry point; the exit status is 1 if any airport failed, so scripts and CI notice."""
+    parser = argparse.ArgumentParser(description="Extract airport amenities from OpenStreetMap.")
+    parser.add_argument("airports", nargs="*", help="Airport codes (default: every airport in the registry)")
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--offline", action="store_true", help="Only use cached Overpass responses")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL)
+    parser.add_argument("--registry", default=REGISTRY_PATH)
+    args = parser.parse_args(argv)
+
+    client = OverpassClient(cache_dir=args.cache_dir, offline=args.offline, refresh=args.refresh,
+                            min_interval=args.min_interval)
+    codes = [c.upper() for c in args.airports] or list(load_registry(args.registry))
+    results = extract_all(codes, args.out_dir, args.workers, client, args.registry)
+    failed = [c for c in codes if c not in results]
+    if failed:
+        print(f"❌ {len(failed)} of {len(codes)} airports failed: {', '.join(sorted(failed))}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,73 +1,275 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import APIRouter, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
-from agent_graph import app
+import agent_graph as graph  # Services are built on first use / warmup, not at import
+from agent_graph import prefetcher, sessions, synthesis_policy
+from rendering import SYNTHESIS_MODES
+from session import SESSION_FIELDS, request_context
+from telemetry import log, telemetry
+from transcripts import decode_cursor, encode_cursor
 import uvicorn
+import asyncio
+import json
 import os
+import time
+import uuid
 
-# Initialize FastAPI
-api = FastAPI(title="LayoverOS API", version="1.0")
+try:
+    import orjson  # Faster SSE frames when available
+except ImportError:
+    orjson = None
 
-# Allow Frontend to Talk to Backend (CORS)
-api.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"], # Allow all for Hackathon (or specific ["http://localhost:3000"])
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Build + warm the services in the background at startup; /ready says 503 until that's done
+WARMUP_ON_START = os.getenv("WARMUP_ON_START", "on").lower() == "on"
+
+router = APIRouter()
 
 class ChatRequest(BaseModel):
     message: str
     thread_id: str = "default_thread"
-    user_location: str = "SFO"
-    airport_code: str = "SFO"
+    # Session context. Omitted fields keep what the thread already knows.
+    user_location: Optional[str] = None   # "Terminal 2", "Gate D4" or "lat,lon"
+    airport_code: Optional[str] = None
+    terminal: Optional[str] = None        # Shorthand for user_location="Terminal <x>"
+    flight_number: Optional[str] = None
+
+class ChatMessage(BaseModel):
+    seq: int
+    role: str   # "user" | "assistant"
+    text: str
+    ts: float
 
 class ChatResponse(BaseModel):
     response: str
-    history: List[str]
+    messages: List[ChatMessage]   # Only this turn's messages; older ones via /threads/{id}/history
+    cursor: str                   # Pass as `before` to page back, or `after` to catch up later
+    timings: Dict[str, float] = {}  # Per-stage latency in ms (embed, route, retrieval, llm, ...)
+
+class HistoryPage(BaseModel):
+    thread_id: str
+    messages: List[ChatMessage]   # Oldest first
+    next_cursor: Optional[str]    # Continue in the same direction; None when there is nothing more
 
-@api.get("/")
+@router.get("/")
 def health_check():
+    """Liveness: the process is up (services may still be warming, see /ready)."""
     return {"status": "LayoverOS System Online"}
 
-@api.post("/chat", response_model=ChatResponse)
-def chat_endpoint(request: ChatRequest):
+@router.get("/ready")
+def ready():
+    """Readiness: 200 once the services are built and warmed, 503 (with the lifecycle state) until then."""
+    state = graph.readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+@router.post("/warmup")
+async def warmup():
+    """Builds the services if needed, pre-connects Mongo, pre-embeds common queries, loads indexes."""
+    try:
+        return await graph.warmup()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Warmup failed: {e}")
+
+def build_initial_state(request: ChatRequest) -> Dict[str, Any]:
+    # Request context merged into what the session already knows (airport, location, flight)
+    supplied = request_context(request.airport_code, request.user_location, request.terminal, request.flight_number)
+    return {"messages": [request.message], **sessions.merge(request.thread_id, supplied)}
+
+def message_text(message) -> str:
+    # In LangGraph/LangChain, messages are often objects, we ensure string format
+    if hasattr(message, 'content'):
+        return message.content
+    return str(message)
+
+async def ready_graph():
+    """The compiled graph, building the services on first use; 503 if they can't be built (e.g. no credentials)."""
+    try:
+        return await graph.ainit()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Service not ready: {e}")
+
+def graph_config(thread_id: str, synthesis: Optional[str]) -> Dict[str, Any]:
+    """`request_id` keys this request's prefetch: concurrent requests on one thread must not share it."""
+    if synthesis is not None and synthesis not in SYNTHESIS_MODES:
+        raise HTTPException(status_code=400, detail=f"synthesis must be one of {', '.join(SYNTHESIS_MODES)}")
+    return {"configurable": {"thread_id": thread_id, "synthesis": synthesis, "request_id": uuid.uuid4().hex}}
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, synthesis: Optional[str] = None):
     """
     Main Chat Endpoint.
     Receives user message -> Runs LangGraph Agent -> Returns Response.
+    `synthesis`: auto (default) | template (never call the LLM to phrase the answer) | llm (always).
     """
-    config = {"configurable": {"thread_id": request.thread_id}}
-    
-    # Initialize state with the user's location context
-    initial_state = {
-        "messages": [request.message],
-        "user_location": request.user_location,
-        # We will add airport_code to the state in agent_graph.py next
-    }
+    config = graph_config(request.thread_id, synthesis)
+    request_id = config["configurable"]["request_id"]
+    initial_state = build_initial_state(request)
+    app = await ready_graph()
+    # Start embedding / flight lookup now, overlapping checkpoint load and routing
+    run = prefetcher.start(request_id, request.message)
     
     try:
         # Run the Agent
-        output = app.invoke(initial_state, config=config)
+        with telemetry.span("request.chat"):
+            output = await app.ainvoke(initial_state, config=config)
         
         # Extract the last message from the agent
-        agent_response = output['messages'][-1]
-        
-        # In LangGraph/LangChain, messages are often objects, we ensure string format
-        if hasattr(agent_response, 'content'):
-            response_text = agent_response.content
-        else:
-            response_text = str(agent_response)
+        response_text = message_text(output['messages'][-1])
+        sessions.remember(request.thread_id, output)
+        new = await graph.transcripts.append(request.thread_id, [("user", request.message), ("assistant", response_text)])
 
         return ChatResponse(
             response=response_text,
-            history=[str(m) for m in output['messages']]
+            messages=new,
+            cursor=encode_cursor(new[-1]["seq"]),
+            timings=run.report()
         )
     
     except Exception as e:
-        print(f"Error processing chat: {e}")
+        log.error("Error processing chat", extra={"thread_id": request.thread_id, "error": str(e)})
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        prefetcher.finish(request_id)
+
+@router.get("/llm/stats")
+def llm_stats():
+    """Per-node LLM gateway metrics: calls, cache hits, coalesced, hedges, fallbacks, p50/p95 latency."""
+    return graph.llm_gateway.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics(format: str = "prometheus"):
+    """
+    Prometheus scrape target: span latency histograms (graph nodes, embed, vector search, find_one,
+    llm.invoke, checkpoint writes), route counts, and cache/gateway counters. `?format=json` for humans.
+    """
+    if format == "json":
+        return PlainTextResponse(json.dumps(telemetry.snapshot(), indent=2), media_type="application/json")
+    return PlainTextResponse(telemetry.prometheus(), media_type="text/plain; version=0.0.4")
+
+@router.get("/synthesis/stats")
+def synthesis_stats():
+    """Template vs. LLM answers per intent (with the reason), and the LLM time the templates saved."""
+    intents = synthesis_policy.stats().keys()
+    return synthesis_policy.stats({intent: graph.llm_gateway.p50_ms(intent) for intent in intents})
+
+@router.get("/threads/{thread_id}/history", response_model=HistoryPage)
+async def thread_history(thread_id: str, before: Optional[str] = None, after: Optional[str] = None,
+                         limit: int = Query(50, ge=1, le=200)):
+    """
+    Cursor-paged conversation log. No cursor: the latest `limit` messages.
+    `before`: older messages (scrolling back); `after`: newer ones (catching up).
+    """
+    if before is not None and after is not None:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    try:
+        before_seq, after_seq = decode_cursor(before), decode_cursor(after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await ready_graph()
+    rows, more = await graph.transcripts.page(thread_id, before=before_seq, after=after_seq, limit=limit)
+    next_cursor = None
+    if more and rows:
+        next_cursor = encode_cursor(rows[-1]["seq"] if after_seq is not None else rows[0]["seq"])
+    return HistoryPage(thread_id=thread_id, messages=rows, next_cursor=next_cursor)
+
+# Nodes whose LLM tokens are forwarded to the client as they arrive.
+STREAMED_NODES = {"scout", "flight_tracker", "planner"}
+
+def sse(event: str, data: Dict[str, Any]) -> str:
+    payload = orjson.dumps(data, default=str).decode() if orjson else json.dumps(data, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, synthesis: Optional[str] = None):
+    """
+    Server-Sent Events version of /chat.
+    Emits: route -> retrieval/flight -> token* -> done (or error).
+    """
+    config = graph_config(request.thread_id, synthesis)
+    request_id = config["configurable"]["request_id"]
+    initial_state = build_initial_state(request)
+
+    app = await ready_graph()
+
+    async def event_source():
+        final_text = None
+        run = prefetcher.start(request_id, request.message)
+        start = time.perf_counter()
+        try:
+            async for mode, chunk in app.astream(
+                initial_state, config=config, stream_mode=["updates", "custom", "messages"]
+            ):
+                if mode == "messages":
+                    token, meta = chunk
+                    if meta.get("langgraph_node") in STREAMED_NODES and token.content:
+                        yield sse("token", {"content": token.content})
+                elif mode == "custom":
+                    yield sse(chunk.pop("event", "progress"), chunk)
+                elif mode == "updates":
+                    for node, update in chunk.items():
+                        if not update:
+                            continue
+                        if any(field in update for field in SESSION_FIELDS):
+                            sessions.remember(request.thread_id, update)
+                        if node == "supervisor":
+                            yield sse("route", {
+                                "next_step": update.get("next_step"),
+                                "confidence": update.get("route_confidence"),
+                                "airport_code": update.get("airport_code"),
+                            })
+                        elif node != "compact" and update.get("messages"):
+                            final_text = message_text(update["messages"][-1])
+            new = await graph.transcripts.append(request.thread_id, [("user", request.message), ("assistant", final_text or "")])
+            yield sse("timings", run.report())
+            yield sse("done", {"response": final_text or "", "messages": new, "cursor": encode_cursor(new[-1]["seq"])})
+        except Exception as e:
+            log.error("Error streaming chat", extra={"thread_id": request.thread_id, "error": str(e)})
+            yield sse("error", {"detail": str(e)})
+        finally:
+            prefetcher.finish(request_id)
+            # Not a span: OTel context can't stay attached across the generator's yields
+            telemetry.observe("request.chat_stream", (time.perf_counter() - start) * 1000)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def background_warmup():
+    try:
+        await graph.warmup()
+    except Exception as e:
+        log.error("Warmup failed", extra={"error": str(e)})
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    task = asyncio.create_task(background_warmup()) if WARMUP_ON_START else None
+    yield
+    if task is not None and not task.done():
+        task.cancel()
+
+def create_api() -> FastAPI:
+    """Application factory: cheap to call, connects nothing (the lifespan starts the warmup)."""
+    api = FastAPI(title="LayoverOS API", version="1.0", lifespan=lifespan)
+
+    # Allow Frontend to Talk to Backend (CORS)
+    api.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"], # Allow all for Hackathon (or specific ["http://localhost:3000"])
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Clients that send Accept-Encoding: gzip get compressed bodies (SSE streams are left alone)
+    api.add_middleware(GZipMiddleware, minimum_size=1024)
+    api.include_router(router)
+    return api
+
+api = create_api()
 
 if __name__ == "__main__":
     port = int(os.getenv("PORT", 8000))
@@ -0,0 +1,189 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+# Closed-loop load on /chat: `concurrency` clients each send their next request as soon as the
+# previous one answers. Reports p50/p95/p99 per query kind and per graph node (node.* timings),
+# and writes everything to a JSON file so runs can be diffed across commits (--compare).
+# Needs the dev dependencies: pip install -r requirements-dev.txt
+QUERY_MIX = {
+    "amenity": (0.55, ["Where is the nearest coffee?", "Any quiet lounge in Terminal 3?", "Where are the restrooms?",
+                       "I want something healthy to eat", "which bar is best for a quick drink and why?"]),
+    "flight": (0.2, ["Status of flight UA400", "What gate is AA100?", "Is UA1 delayed?"]),
+    "concierge": (0.15, ["I am at SFO", "I'm in SFO"]),
+    "payment": (0.1, ["Can I pay for the lounge with Apple Pay?", "Buy me a day pass for the United Club"]),
+}
+REGRESSION_THRESHOLD = 0.10  # --compare flags p95/p99 more than 10% slower...
+REGRESSION_MIN_MS = 1.0      # ...and by more than this (sub-ms node timings are noise)
+
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 2)
+    return {"count": len(ordered), "p50": pick(0.5), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 2)}
+
+
+def next_query(rng: random.Random):
+    kinds = list(QUERY_MIX)
+    kind = rng.choices(kinds, [QUERY_MIX[k][0] for k in kinds])[0]
+    return kind, rng.choice(QUERY_MIX[kind][1])
+
+
+async def run_level(url: str, concurrency: int, total: int, seed: int, params: dict):
+    rng = random.Random(seed)
+    plan = [next_query(rng) for _ in range(total)]
+    by_kind, by_node, overall = defaultdict(list), defaultdict(list), []
+    errors = defaultdict(int)
+
+    async def client(worker: int, http: httpx.AsyncClient):
+        thread_id = f"bench_{uuid.uuid4().hex[:8]}"  # One conversation per client, like a real user
+        for kind, message in plan[worker::concurrency]:
+            start = time.perf_counter()
+            try:
+                response = await http.post(url, params=params, json={
+                    "message": message, "thread_id": thread_id, "airport_code": "SFO", "user_location": "Terminal 2",
+                })
+                elapsed = (time.perf_counter() - start) * 1000
+                if response.status_code != 200:
+                    errors[kind] += 1
+                    continue
+            except httpx.HTTPError:
+                errors[kind] += 1
+                continue
+            overall.append(elapsed)
+            by_kind[kind].append(elapsed)
+            for stage, ms in response.json().get("timings", {}).items():
+                if stage.startswith("node."):
+                    by_node[stage[5:]].append(ms)
+
+    start = time.perf_counter()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as http:
+        await asyncio.gather(*(client(i, http) for i in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_rps": round(len(overall) / wall, 2),
+        "errors": dict(errors),
+        "latency_ms": percentiles(overall),
+        "by_kind": {kind: percentiles(values) for kind, values in sorted(by_kind.items())},
+        "by_node": {node: percentiles(values) for node, values in sorted(by_node.items())},
+    }
+
+
+def print_level(result):
+    lat = result["latency_ms"]
+    print(f"\n   c={result['concurrency']:<4} {result['throughput_rps']:8.2f} req/s | p50 {lat.get('p50', 0):8.1f}ms "
+          f"p95 {lat.get('p95', 0):8.1f}ms p99 {lat.get('p99', 0):8.1f}ms | errors {sum(result['errors'].values())}")
+    for label, rows in (("kind", result["by_kind"]), ("node", result["by_node"])):
+        for name, stats in rows.items():
+            print(f"      {label} {name:<15} n={stats['count']:<5} p50 {stats['p50']:8.1f} "
+                  f"p95 {stats['p95']:8.1f} p99 {stats['p99']:8.1f} ms")
+
+
+def compare(current: dict, baseline_path: str):
+    """Prints p50/p95/p99 deltas against an earlier run; returns True if anything regressed."""
+    with open(baseline_path) as f:
+        baseline = {level["concurrency"]: level for level in json.load(f)["levels"]}
+    regressed = False
+    print(f"\n📊 vs {baseline_path}")
+    for level in current["levels"]:
+        before = baseline.get(level["concurrency"])
+        if before is None:
+            continue
+        rows = [("overall", level["latency_ms"], before["latency_ms"])]
+        rows += [(f"kind {k}", v, before["by_kind"].get(k, {})) for k, v in level["by_kind"].items()]
+        rows += [(f"node {k}", v, before["by_node"].get(k, {})) for k, v in level["by_node"].items()]
+        for name, now, then in rows:
+            cells = []
+            for q in ("p50", "p95", "p99"):
+                if then.get(q) and now.get(q) is not None:
+                    change = (now[q] - then[q]) / then[q]
+                    slower = change > REGRESSION_THRESHOLD and now[q] - then[q] > REGRESSION_MIN_MS
+                    flag = " ⚠️" if q != "p50" and slower else ""
+                    regressed |= bool(flag)
+                    cells.append(f"{q} {then[q]:.1f}->{now[q]:.1f} ({change:+.0%}){flag}")
+            if cells:
+                print(f"   c={level['concurrency']:<4} {name:<20} " + "  ".join(cells))
+    return regressed
+
+
+def start_offline_server():
+    """Runs api.py in this process on fake backends (fakes.py), on a free port in its own thread/loop."""
+    os.environ["FAKE_BACKENDS"] = "on"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")  # Per-request logging off on the measured path
+    import uvicorn
+    import api
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(api.api, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    while httpx.get(f"http://127.0.0.1:{port}/ready").status_code != 200:  # Measure warm, like production
+        time.sleep(0.1)
+    return f"http://127.0.0.1:{port}/chat"
+
+
+def fake_latencies():
+    import agent_graph
+    return {"mongo": agent_graph.client.latency.mean_ms, "embed": agent_graph.fake_embedder.latency.mean_ms,
+            "llm": agent_graph.llm.latency.mean_ms, "llm_token": agent_graph.llm.token_ms}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency/throughput of /chat per query kind and graph node.")
+    parser.add_argument("--url", default="http://localhost:8000/chat")
+    parser.add_argument("--offline", action="store_true",
+                        help="Serve api.py in-process on fake Mongo/Voyage/Fireworks (FAKE_*_LATENCY_MS apply)")
+    parser.add_argument("--levels", default="1,8,32", help="Comma-separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per level")
+    parser.add_argument("--synthesis", choices=["auto", "template", "llm"], help="Forwarded as ?synthesis=")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_chat_results.json")
+    parser.add_argument("--compare", help="Earlier --output file to diff against")
+    args = parser.parse_args()
+
+    url = start_offline_server() if args.offline else args.url
+    params = {"synthesis": args.synthesis} if args.synthesis else {}
+    print(f"🎯 {url} ({'offline fakes' if args.offline else 'live'}), {args.requests} requests per level")
+    levels = []
+    for concurrency in [int(c) for c in args.levels.split(",")]:
+        levels.append(asyncio.run(run_level(url, concurrency, args.requests, args.seed, params)))
+        print_level(levels[-1])
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "target": "offline" if args.offline else url,
+        "fake_latency_ms": fake_latencies() if args.offline else None,
+        "synthesis": args.synthesis,
+        "levels": levels,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+    if args.compare and compare(report, args.compare):
+        raise SystemExit(1)
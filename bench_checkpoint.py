@@ -0,0 +1,126 @@
+import argparse
+import operator
+import os
+import tempfile
+import time
+from typing import Annotated, List, TypedDict
+
+import numpy as np
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Overwrite
+
+from checkpointing import CoalescingSaver, SQLiteCheckpointStore, fold_summary, windowed
+
+# A reply about as long as a real Scout answer (~600 chars)
+REPLY = "Scout: " + "Blue Bottle Coffee in Terminal 2 is open, about a 4 minute walk, wait ~3 min. " * 8
+
+
+def build_graph(bounded: bool, window: int, checkpointer):
+    """Same shape as agent_graph: supervisor -> answer -> (compact) -> END, no I/O inside."""
+
+    class State(TypedDict):
+        messages: Annotated[List[str], windowed(window * 4) if bounded else operator.add]
+        summary: str
+        next_step: str
+
+    def supervisor(state):
+        return {"next_step": "scout"}
+
+    def answer(state):
+        return {"messages": [REPLY]}
+
+    def compact(state):
+        messages = state["messages"]
+        if len(messages) <= window:
+            return {}
+        return {"messages": Overwrite(messages[-window:]),
+                "summary": fold_summary(state.get("summary", ""), messages[:-window])}
+
+    builder = StateGraph(State)
+    builder.add_node("supervisor", supervisor)
+    builder.add_node("scout", answer)
+    builder.add_edge(START, "supervisor")
+    builder.add_edge("supervisor", "scout")
+    if bounded:
+        builder.add_node("compact", compact)
+        builder.add_edge("scout", "compact")
+        builder.add_edge("compact", END)
+    else:
+        builder.add_edge("scout", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def stored_bytes(saver: InMemorySaver) -> int:
+    """Everything an InMemorySaver holds (what MongoDBSaver would have written)."""
+    blobs = sum(len(v[1]) for v in saver.blobs.values())
+    checkpoints = sum(len(c[1]) + len(m[1]) for ns in saver.storage.values() for cps in ns.values()
+                      for c, m, _ in cps.values())
+    writes = sum(len(w[2][1]) for ws in saver.writes.values() for w in ws.values())
+    return blobs + checkpoints + writes
+
+
+def run(graph, turns: int, flush=None):
+    config = {"configurable": {"thread_id": "long-thread"}}
+    latencies = []
+    for turn in range(turns):
+        start = time.perf_counter()
+        graph.invoke({"messages": [f"question {turn}: where can I get coffee near gate D4?"]}, config)
+        if flush:
+            flush()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def report(name: str, latencies, total_bytes: int, checkpoint_bytes: int, load_ms: float):
+    def window(a, b):
+        return np.mean(latencies[a:b])
+    n = len(latencies)
+    print(f"   {name:<22} turn 1-50 {window(0, 50):6.2f} ms | last 50 {window(n - 50, n):6.2f} ms | "
+          f"checkpoint {checkpoint_bytes / 1024:8.1f} KB | stored {total_bytes / 1024 / 1024:7.2f} MB | "
+          f"cold load {load_ms:6.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkpoint size and latency for one long thread.")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--window", type=int, default=12)
+    args = parser.parse_args()
+    config = {"configurable": {"thread_id": "long-thread"}}
+    print(f"🧵 {args.turns} turns in one thread (reply ~{len(REPLY)} chars)")
+
+    # Baseline: operator.add + a saver that keeps (and serializes) every checkpoint, like MongoDBSaver
+    saver = InMemorySaver()
+    latencies = run(build_graph(False, args.window, saver), args.turns)
+    latest = saver.get_tuple(config)
+    start = time.perf_counter()
+    saver.get_tuple(config)  # Deserializes the full message list
+    load_ms = (time.perf_counter() - start) * 1000
+    size = len(saver.serde.dumps_typed(latest.checkpoint["channel_values"])[1])
+    report("full history", latencies, stored_bytes(saver), size, load_ms)
+
+    # Windowed state + rolling summary + coalesced delta writes to SQLite
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.sqlite3")
+        for label, flush_every in (("window, flush per turn", 1), ("window, flush per 10", 10)):
+            if os.path.exists(path):
+                os.remove(path)
+            saver = CoalescingSaver(SQLiteCheckpointStore(path))
+            turn = {"n": 0}
+
+            def flush():
+                turn["n"] += 1
+                if turn["n"] % flush_every == 0:
+                    saver.flush()
+
+            latencies = run(build_graph(True, args.window, saver), args.turns, flush)
+            saver.flush()
+            latest = saver.get_tuple(config)
+            size = len(saver.serde.dumps_typed(latest.checkpoint["channel_values"])[1])
+            start = time.perf_counter()
+            CoalescingSaver(SQLiteCheckpointStore(path)).get_tuple(config)  # From disk, as after a restart
+            load_ms = (time.perf_counter() - start) * 1000
+            report(label, latencies, saver.bytes_written, size, load_ms)
+            print(f"      {saver.puts} checkpoints -> {saver.rows_written} store writes, "
+                  f"{len(latest.checkpoint['channel_values']['messages'])} messages kept, "
+                  f"summary {len(latest.checkpoint['channel_values'].get('summary', ''))} chars")
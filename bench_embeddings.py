@@ -0,0 +1,92 @@
+import argparse
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+from embedding_providers import PROVIDERS, build_embeddings
+from vector_index import LocalVectorIndex
+
+# Side-by-side retrieval quality of embedding providers on the real amenities.
+# - type precision@k: "Where can I get a cafe?" should return cafes (labels come from the `type` field);
+# - overlap@k with Voyage: how much of the current production top-k a local provider reproduces.
+QUESTION = "Where can I get a {kind}?"
+
+
+def load_docs(args):
+    """Amenity docs with every stored embedding field, from Mongo or (offline) from a seed file."""
+    if args.input:
+        from seed_database import iter_records, to_document
+        return [dict(to_document(item, args.airport), _id=i) for i, item in enumerate(iter_records(args.input))]
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+    load_dotenv()
+    collection = MongoClient(os.getenv("MONGO_URI"), tlsAllowInvalidCertificates=True)["layover_os"]["amenities"]
+    return list(collection.find({"airport_code": args.airport}))
+
+
+def index_for(provider: str, docs, args):
+    embedder, model_name = build_embeddings(provider, api_key=os.getenv("VOYAGE_API_KEY"), dim=args.dim,
+                                            idf_path=args.idf_path)
+    field = PROVIDERS[provider]["field"]
+    if all(field in d for d in docs):
+        vectors = [d[field] for d in docs]
+    else:
+        # Not migrated (or offline input): embed the corpus now
+        texts = [d["description_for_embedding"] for d in docs]
+        if hasattr(embedder, "fit") and not os.path.exists(args.idf_path):
+            model_name = embedder.fit(texts).model_name
+        vectors = embedder.embed_documents(texts)
+    payloads = [{"name": d.get("name"), "type": d.get("type"), "terminal_id": d.get("terminal_id")} for d in docs]
+    index = LocalVectorIndex(args.airport, [d["_id"] for d in docs], np.asarray(vectors, dtype=np.float32),
+                             payloads, use_hnsw=False)
+    return embedder, model_name, index
+
+
+def main(args):
+    docs = load_docs(args)
+    if not docs:
+        print(f"❌ No amenities for {args.airport}")
+        return
+    kinds = [kind for kind, count in Counter(d.get("type") for d in docs).most_common() if kind and count >= args.k]
+    queries = [(QUESTION.format(kind=kind.replace("_", " ")), kind) for kind in kinds[:args.queries]]
+    print(f"📦 {len(docs)} amenities at {args.airport}, {len(queries)} queries (one per amenity type)")
+
+    results = {}
+    for provider in args.providers:
+        try:
+            embedder, model_name, index = index_for(provider, docs, args)
+        except Exception as e:
+            print(f"   ⏭️  {provider}: skipped ({e})")
+            continue
+        start = time.perf_counter()
+        vectors = [embedder.embed_query(q) for q, _ in queries]
+        embed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        tops = [[row for row, _ in index.brute_force(np.asarray(v, dtype=np.float32), args.k)] for v in vectors]
+        precision = np.mean([
+            sum(index.payloads[row]["type"] == kind for row in top) / args.k
+            for top, (_, kind) in zip(tops, queries)
+        ])
+        results[provider] = tops
+        print(f"   {provider:<22} {model_name:<28} type precision@{args.k}: {precision:.3f}  "
+              f"embed: {embed_ms:7.2f} ms/query")
+
+    reference = results.get("voyage")
+    if reference is not None:
+        for provider, tops in results.items():
+            if provider != "voyage":
+                overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(tops, reference)])
+                print(f"   {provider:<22} overlap@{args.k} with voyage: {overlap:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall/latency of local embedding providers vs. Voyage.")
+    parser.add_argument("--airport", default="SFO")
+    parser.add_argument("--input", help="Offline: read amenities from a seed file (.jsonl/.json) instead of MongoDB")
+    parser.add_argument("--providers", nargs="+", default=["voyage", "hashed"], choices=list(PROVIDERS))
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=30)
+    parser.add_argument("--dim", type=int, default=int(os.getenv("EMBEDDING_DIM", "512")))
+    parser.add_argument("--idf-path", default=os.getenv("EMBEDDING_IDF_PATH", "embedding_idf.json"))
+    main(parser.parse_args())
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import gzip
+import time
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from transcripts import MemoryTranscriptStore, encode_cursor
+
+# Response shapes as api.py serializes them (FastAPI -> pydantic -> JSON bytes)
+REPLY = "Scout: " + "Blue Bottle Coffee in Terminal 2 is open, about a 4 minute walk, wait ~3 min. " * 8
+
+
+class LegacyChatResponse(BaseModel):
+    response: str
+    history: List[str]
+    timings: Dict[str, float] = {}
+
+
+class ChatMessage(BaseModel):
+    seq: int
+    role: str
+    text: str
+    ts: float
+
+
+class ChatResponse(BaseModel):
+    response: str
+    messages: List[ChatMessage]
+    cursor: str
+    timings: Dict[str, float] = {}
+
+
+class HistoryPage(BaseModel):
+    thread_id: str
+    messages: List[ChatMessage]
+    next_cursor: Optional[str]
+
+
+def per_call_us(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def main(turn_counts, page_size: int, repeat: int):
+    print(f"{'turns':>6} | {'legacy /chat':>22} | {'new /chat':>20} | {'history page':>20}")
+    for turns in turn_counts:
+        store = MemoryTranscriptStore()
+        history = []
+        for turn in range(turns):
+            question = f"question {turn}: where can I get coffee near gate D4?"
+            new = await store.append("t", [("user", question), ("assistant", REPLY)])
+            history += [question, REPLY]
+
+        legacy = lambda: LegacyChatResponse(response=REPLY, history=[str(m) for m in history]).model_dump_json().encode()
+        latest = lambda: ChatResponse(response=REPLY, messages=new, cursor=encode_cursor(new[-1]["seq"])).model_dump_json().encode()
+        rows, more = await store.page("t", limit=page_size)
+        page = lambda: HistoryPage(thread_id="t", messages=rows,
+                                   next_cursor=encode_cursor(rows[0]["seq"]) if more else None).model_dump_json().encode()
+
+        cells = []
+        for build in (legacy, latest, page):
+            body = build()
+            cells.append(f"{len(body) / 1024:7.1f} KB ({len(gzip.compress(body)) / 1024:5.1f} gz) "
+                         f"{per_call_us(build, repeat):7.0f} µs")
+        print(f"{turns:>6} | " + " | ".join(cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/chat payload size and serialization time vs. conversation length.")
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.page_size, args.repeat))
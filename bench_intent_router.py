@@ -0,0 +1,74 @@
+import argparse
+import random
+import re
+import time
+
+from intent_router import IntentRouter, load_intent_table
+
+# Verbatim copy of the routing logic supervisor_node used before the IntentRouter,
+# kept here so the benchmark (and the agreement check) has a fixed baseline.
+def legacy_route(message):
+    last_message = message.lower()
+    found_airport = None
+    for code in ["SFO", "JFK", "DEN"]:
+        if code in last_message.upper():
+            found_airport = code
+            break
+    has_flight_code = re.search(r'[A-Z]{2}\d{3,4}', last_message.upper())
+    has_flight_keyword = any(kw in last_message for kw in ["flight", "fly", "airline", "boarding"])
+    is_planning_trip = "plan" in last_message and "to" in last_message
+    if has_flight_keyword or has_flight_code or is_planning_trip:
+        return "flight_tracker", found_airport
+    elif any(kw in last_message for kw in ["buy", "pay", "book", "purchase", "reserve"]):
+        return "bursar", found_airport
+    else:
+        return "scout", found_airport
+
+MESSAGES = [
+    "Where is the nearest coffee?",
+    "Status of flight UA400",
+    "I am at SFO",
+    "Where are the restrooms?",
+    "How do I get to Terminal 3?",
+    "Can I buy a day pass for the United Club?",
+    "Plan my trip to JFK",
+    "is DL1234 boarding yet",
+    "I'm hungry, something healthy near gate B12 please",
+    "Any quiet lounge in Terminal 2 where I can work for a couple of hours before my connection?",
+]
+
+def timeit(fn, messages, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for m in messages:
+            fn(m)
+    return (time.perf_counter() - start) / (rounds * len(messages)) * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IntentRouter vs. the old keyword scans in supervisor_node.")
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    router = IntentRouter(load_intent_table("intents.json"), ["SFO", "JFK", "DEN"])
+
+    print("🔀 Routing agreement (legacy -> router):")
+    for m in MESSAGES:
+        old = legacy_route(m)
+        new = router.classify(m)
+        flag = "✅" if old == (new.intent, new.airport_code) else "⚠️"
+        print(f"   {flag} {m[:50]:<50} {old[0]:<15} -> {new.intent:<15} conf={new.confidence:.2f}")
+
+    # Long, keyword-free messages are the worst case for per-keyword substring scans.
+    rng = random.Random(3)
+    words = "where is the nearest quiet place with outlets and good coffee near my gate".split()
+    long_messages = [" ".join(rng.choice(words) for _ in range(60)) for _ in range(10)]
+
+    for label, batch in [("typical", MESSAGES), ("long (60 words)", long_messages)]:
+        rounds = args.rounds // (6 if batch is long_messages else 1) // args.repeat
+        # Interleaved, best of --repeat: a noisy neighbour shouldn't decide which one "wins"
+        legacy_us = router_us = float("inf")
+        for _ in range(args.repeat):
+            legacy_us = min(legacy_us, timeit(legacy_route, batch, rounds))
+            router_us = min(router_us, timeit(router.classify, batch, rounds))
+        print(f"\n⏱️  {label}: legacy {legacy_us:.2f} µs/msg | router {router_us:.2f} µs/msg | {legacy_us / router_us:.2f}x")
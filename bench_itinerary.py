@@ -0,0 +1,95 @@
+import argparse
+import time
+
+import numpy as np
+
+from itinerary import Stop, plan_itinerary, travel_matrix
+from walking_graph import WalkingGraph
+
+
+def generated_airport(nodes: int, amenities: int, seed: int) -> WalkingGraph:
+    """Random concourse graph (~1.5 km across) with amenities scattered around it."""
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(0, 0.015, size=(nodes, 2)) + [37.61, -122.39]
+    node_list = [{"id": f"n{i}", "lat": float(a), "lon": float(b)} for i, (a, b) in enumerate(coords)]
+    edges = [{"a": f"n{i}", "b": f"n{i + 1}"} for i in range(nodes - 1)]  # Connected spine
+    edges += [{"a": f"n{i}", "b": f"n{j}"} for i, j in rng.integers(0, nodes, size=(nodes, 2)) if i != j]
+    graph = WalkingGraph("GEN", node_list, edges)
+    spots = coords[rng.integers(0, nodes, amenities)] + rng.normal(0, 0.0005, size=(amenities, 2))
+    graph.attach_amenities({"_id": i, "lat": float(a), "lon": float(b)} for i, (a, b) in enumerate(spots))
+    return graph
+
+
+def exact_value(times: np.ndarray, values, dwell, budget: float) -> float:
+    """Subset DP (min arrival time per (visited set, last stop)): exponential, ground truth for small m."""
+    m = len(values)
+    start, end = m, m + 1
+    inf = float("inf")
+    arrive = np.full((1 << m, m), inf)
+    for j in range(m):
+        arrive[1 << j, j] = times[start, j] + dwell[j]
+    best = 0.0
+    for mask in range(1, 1 << m):
+        value = sum(values[j] for j in range(m) if mask >> j & 1)
+        for last in range(m):
+            t = arrive[mask, last]
+            if t == inf or t + times[last, end] > budget:
+                continue
+            best = max(best, value)
+            for j in range(m):
+                if not mask >> j & 1:
+                    nt = t + times[last, j] + dwell[j]
+                    if nt < arrive[mask | 1 << j, j]:
+                        arrive[mask | 1 << j, j] = nt
+    return best
+
+
+def instances(graph: WalkingGraph, count: int, candidates: int, seed: int):
+    rng = np.random.default_rng(seed)
+    ids = list(graph.amenity_row)
+    for _ in range(count):
+        picked = rng.choice(len(ids), candidates, replace=False)
+        stops = [Stop(ids[i], f"POI {ids[i]}", float(rng.uniform(0.2, 1.0)), float(rng.uniform(5, 40))) for i in picked]
+        start, end = rng.choice(graph.ids, 2, replace=False)
+        yield stops, str(start), str(end), float(rng.uniform(60, 180))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Layover itinerary solver on generated airports.")
+    parser.add_argument("--instances", type=int, default=40)
+    parser.add_argument("--exact-max", type=int, default=11, help="Largest candidate count checked against exact DP")
+    args = parser.parse_args()
+
+    graph = generated_airport(nodes=120, amenities=2000, seed=1)
+    print(f"🗺️  Generated airport: {graph.stats()['nodes']} nodes, {len(graph.amenity_row)} amenities")
+
+    for candidates in (8, 11, 15, 25):
+        batch = list(instances(graph, args.instances, candidates, seed=candidates))
+        # Reference: the same search with a generous budget (exact DP too, while that is tractable)
+        reference = [plan_itinerary(graph, start, end, stops, budget, deadline_ms=2000)
+                     for stops, start, end, budget in batch]
+        exact = ""
+        if candidates <= args.exact_max:
+            ratios = []
+            for plan, (stops, start, end, budget) in zip(reference, batch):
+                if plan is not None:
+                    times = travel_matrix(graph, start, end, [s.id for s in stops])
+                    truth = exact_value(times, [s.value for s in stops], [s.dwell_minutes for s in stops], budget)
+                    ratios.append(plan.value / truth if truth else 1.0)
+            exact = f": unbounded search vs exact DP {np.mean(ratios):.3f} (min {np.min(ratios):.3f})"
+        print(f"   {candidates:>2} candidates{exact}")
+
+        for deadline_ms in (1, 5, 50):
+            latencies, finished, ratios = [], 0, []
+            for ref, (stops, start, end, budget) in zip(reference, batch):
+                t0 = time.perf_counter()
+                plan = plan_itinerary(graph, start, end, stops, budget, deadline_ms=deadline_ms)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if plan is None:
+                    continue  # Can't even reach the gate in time
+                finished += plan.optimal
+                ratios.append(plan.value / ref.value if ref.value else 1.0)
+            p50, p95 = np.percentile(latencies, [50, 95])
+            print(f"      deadline {deadline_ms:>2} ms: p50 {p50:6.2f} ms | p95 {p95:6.2f} ms | "
+                  f"search finished {finished}/{len(ratios)} | value vs unbounded {np.mean(ratios):.3f} "
+                  f"(min {np.min(ratios):.3f})")
@@ -0,0 +1,102 @@
+import argparse
+import time
+
+import numpy as np
+
+from spatial_index import GridIndex
+from vector_index import LocalVectorIndex
+
+# Synthetic airport around SFO's centroid: POIs clustered along a few concourses, like the real thing.
+CENTER = (37.6213, -122.3790)
+M_PER_DEG_LAT = 111195.0
+
+
+def synthetic_airport(n: int, dim: int, seed: int) -> LocalVectorIndex:
+    rng = np.random.default_rng(seed)
+    concourses = rng.uniform(-1500, 1500, size=(6, 2))
+    which = rng.integers(0, len(concourses), n)
+    offsets = concourses[which] + rng.normal(0, 250, size=(n, 2))
+    lats = CENTER[0] + offsets[:, 1] / M_PER_DEG_LAT
+    lons = CENTER[1] + offsets[:, 0] / (M_PER_DEG_LAT * np.cos(np.radians(CENTER[0])))
+    # Amenity "types" share a direction in embedding space, so queries have many near-equivalent hits.
+    types = rng.standard_normal((40, dim)).astype(np.float32)
+    kinds = rng.integers(0, len(types), n)
+    vectors = types[kinds] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    payloads = [
+        {"name": f"POI {i}", "terminal_id": str(which[i] + 1), "lat": float(lats[i]), "lon": float(lons[i])}
+        for i in range(n)
+    ]
+    index = LocalVectorIndex("SYN", list(range(n)), vectors, payloads, use_hnsw=False)
+    index.types = types
+    return index
+
+
+def per_call_us(fn, args_list):
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def brute_nearest(xy, point, k):
+    dist = np.hypot(xy[:, 0] - point[0], xy[:, 1] - point[1])
+    top = np.argpartition(dist, k - 1)[:k]
+    return top[np.argsort(dist[top])]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid index + hybrid ranking on a synthetic airport.")
+    parser.add_argument("--size", type=int, default=50000, help="Number of POIs")
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--weight", type=float, default=0.6, help="Spatial weight for hybrid ranking")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = synthetic_airport(args.size, args.dim, seed=5)
+    print(f"📦 {args.size} POIs, dim {args.dim}: built in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    grid = GridIndex([p["lat"] for p in index.payloads], [p["lon"] for p in index.payloads])
+    print(f"🗺️  Grid alone: {len(grid._cells)} cells in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    rng = np.random.default_rng(9)
+    origins = [
+        (CENTER[0] + dy / M_PER_DEG_LAT, CENTER[1] + dx / (M_PER_DEG_LAT * np.cos(np.radians(CENTER[0]))))
+        for dx, dy in rng.uniform(-1500, 1500, size=(args.queries, 2))
+    ]
+    queries = index.types[rng.integers(0, len(index.types), args.queries)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    # --- Nearest-k: grid vs. scanning every POI ---
+    mismatches = 0
+    for origin in origins:
+        got = [row for row, _ in grid.nearest(*origin, args.k)]
+        want = brute_nearest(grid.xy, grid.project(*origin), args.k).tolist()
+        mismatches += got != want
+    grid_us = per_call_us(lambda o: grid.nearest(*o, args.k), [(o,) for o in origins])
+    scan_us = per_call_us(lambda o: brute_nearest(grid.xy, grid.project(*o), args.k), [(o,) for o in origins])
+    print(f"\n📍 nearest-{args.k}: grid {grid_us:.0f} µs | full scan {scan_us:.0f} µs | "
+          f"{scan_us / grid_us:.1f}x | mismatches {mismatches}/{len(origins)}")
+
+    # --- Hybrid ranking: growing relevance shortlist vs. exact scoring of every POI ---
+    pairs = list(zip(queries, origins))
+    found = total = 0
+    for q, origin in pairs:
+        truth = {row for row, _, _ in index.hybrid_brute_force(q, args.k, origin, args.weight)}
+        got = {row for row, _, _ in index.hybrid_search(q, args.k, origin, args.weight)}
+        found += len(truth & got)
+        total += len(truth)
+    vector_us = per_call_us(lambda q, o: index.search(q, args.k), pairs)
+    hybrid_us = per_call_us(lambda q, o: index.hybrid_search(q, args.k, o, args.weight), pairs)
+    exact_us = per_call_us(lambda q, o: index.hybrid_brute_force(q, args.k, o, args.weight), pairs)
+    print(f"🔀 hybrid top-{args.k} (weight {args.weight}): shortlist {hybrid_us:.0f} µs | exact {exact_us:.0f} µs | "
+          f"vector-only {vector_us:.0f} µs | recall {found / total:.3f}")
+
+    # How much does location change the answer?
+    moved = sum(
+        {r for r, _ in index.search(q, args.k)} != {r for r, _, _ in index.hybrid_search(q, args.k, o, args.weight)}
+        for q, o in pairs
+    )
+    print(f"   Location changed the top-{args.k} for {moved}/{len(pairs)} queries")
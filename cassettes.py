@@ -0,0 +1,379 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, List, Optional
+
+from bson import json_util
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from fakes import _IdleChangeStream
+from llm_gateway import prompt_key
+from telemetry import log
+
+# Record/replay of every external call the graph makes (Voyage, Fireworks, Mongo):
+# CASSETTE_MODE=record runs against the live services and writes each call's request key,
+# response and duration to CASSETTE_PATH (replacing what was there); CASSETTE_MODE=replay serves
+# those responses with no network and no credentials, optionally sleeping the recorded durations
+# (CASSETTE_TIMING).
+CASSETTE_MODES = ("off", "record", "replay")
+MONGO_WRITE_OPS = {"insert_one", "insert_many", "update_one", "update_many", "replace_one", "delete_one",
+                   "delete_many", "bulk_write", "create_index", "create_indexes", "drop_index"}
+
+
+def request_key(*parts) -> str:
+    payload = json_util.dumps(parts, sort_keys=True, json_options=json_util.RELAXED_JSON_OPTIONS)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class Cassette:
+    """
+    One JSONL file of interactions: {service, op, key, response, elapsed_ms}. Recording starts the
+    file afresh (appending a second session would replay the first one's answers). Replay hands out a key's responses in recorded order and repeats the last one once they run
+    out (background refreshes ask the same thing many times). Unknown keys return `None`-shaped
+    results and are counted, or raise with strict=True.
+    """
+
+    def __init__(self, path: str, mode: str = "replay", timing_scale: float = 0.0, strict: bool = False):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be record or replay, not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.timing_scale = timing_scale
+        self.strict = strict
+        self._lock = threading.Lock()
+        self._tapes = defaultdict(deque)
+        self._last = {}
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self.recorded = defaultdict(int)
+        if mode == "replay":
+            self._load()
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = open(path, "w", encoding="utf-8")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json_util.loads(line)
+                    self._tapes[(entry["service"], entry["key"])].append(entry)
+
+    def record(self, service: str, op: str, key: str, response, elapsed_ms: float):
+        line = json_util.dumps({"service": service, "op": op, "key": key, "response": response,
+                                "elapsed_ms": round(elapsed_ms, 2)}, json_options=json_util.RELAXED_JSON_OPTIONS)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded[service] += 1
+
+    def _take(self, service: str, key: str):
+        with self._lock:
+            tape = self._tapes.get((service, key))
+            if tape:
+                entry = self._last[(service, key)] = tape.popleft()
+            else:
+                entry = self._last.get((service, key))
+            if entry is None:
+                self.misses[service] += 1
+                if self.misses[service] <= 3:
+                    log.warning("⚠️ Cassette miss", extra={"service": service, "key": key})
+            else:
+                self.hits[service] += 1
+        if entry is None and self.strict:
+            raise LookupError(f"No recorded {service} response for key {key}")
+        return entry
+
+    def replay(self, service: str, key: str, default=None):
+        entry = self._take(service, key)
+        if entry is None:
+            return default
+        if self.timing_scale:
+            time.sleep(entry["elapsed_ms"] * self.timing_scale / 1000)
+        return entry["response"]
+
+    async def areplay(self, service: str, key: str, default=None):
+        entry = self._take(service, key)
+        if entry is None:
+            return default
+        if self.timing_scale:
+            await asyncio.sleep(entry["elapsed_ms"] * self.timing_scale / 1000)
+        return entry["response"]
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, "path": self.path, "hits": dict(self.hits), "misses": dict(self.misses),
+                "recorded": dict(self.recorded)}
+
+    def close(self):
+        if self.mode == "record":
+            self._file.close()
+
+# --- VOYAGE ---
+
+class CassetteEmbeddings(Embeddings):
+    """There is no harmless stand-in for a vector, so an unrecorded text raises instead of returning empty."""
+
+    def __init__(self, inner: Optional[Embeddings], cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def _call(self, op: str, payload):
+        key = request_key(op, payload)
+        if self.cassette.replaying:
+            return self._replayed(self.cassette.replay("embed", key), payload)
+        start = time.perf_counter()
+        result = getattr(self.inner, op)(payload)
+        self.cassette.record("embed", op, key, result, (time.perf_counter() - start) * 1000)
+        return result
+
+    @staticmethod
+    def _replayed(vectors, payload):
+        if vectors is None:
+            raise LookupError(f"Cassette has no embedding for {payload!r}")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call("embed_query", text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._call("embed_documents", texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = request_key("embed_query", text)
+        if self.cassette.replaying:
+            return self._replayed(await self.cassette.areplay("embed", key), text)
+        start = time.perf_counter()
+        result = await self.inner.aembed_query(text)
+        self.cassette.record("embed", "embed_query", key, result, (time.perf_counter() - start) * 1000)
+        return result
+
+# --- FIREWORKS ---
+
+class CassetteChatModel(BaseChatModel):
+    """Streams the live model's tokens while recording; replays the recorded answer as one chunk."""
+
+    inner: Any = None
+    cassette: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = prompt_key(messages)
+        if self.cassette.replaying:
+            text = self.cassette.replay("llm", key, default="")
+        else:
+            start = time.perf_counter()
+            text = self.inner.invoke(messages).content
+            self.cassette.record("llm", "invoke", key, text, (time.perf_counter() - start) * 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        chunks = [chunk async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(c.text for c in chunks)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = prompt_key(messages)
+        if self.cassette.replaying:
+            pieces = [await self.cassette.areplay("llm", key, default="")]
+        else:
+            start = time.perf_counter()
+            pieces = []
+            async for chunk in self.inner.astream(messages):
+                pieces.append(chunk.content)
+                chunk_out = ChatGenerationChunk(message=AIMessageChunk(content=chunk.content))
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk_out.text, chunk=chunk_out)
+                yield chunk_out
+            self.cassette.record("llm", "invoke", key, "".join(pieces), (time.perf_counter() - start) * 1000)
+            return
+        chunk_out = ChatGenerationChunk(message=AIMessageChunk(content=pieces[0]))
+        if run_manager:
+            await run_manager.on_llm_new_token(chunk_out.text, chunk=chunk_out)
+        yield chunk_out
+
+# --- MONGO ---
+
+class CassetteCursor:
+    """find()/aggregate() result: sort/limit/skip are part of the key; rows are fetched on first use."""
+
+    def __init__(self, collection: "CassetteCollection", op: str, args, kwargs):
+        self._collection = collection
+        self._op = op
+        self._args = args
+        self._kwargs = kwargs
+        self._chain = []
+
+    def _chained(self, name, *args):
+        self._chain.append((name, args))
+        return self
+
+    def sort(self, *args):
+        return self._chained("sort", *args)
+
+    def limit(self, n):
+        return self._chained("limit", n)
+
+    def skip(self, n):
+        return self._chained("skip", n)
+
+    def _key(self):
+        return self._collection.key(self._op, self._args, self._kwargs, self._chain)
+
+    def _apply(self, cursor):
+        for name, args in self._chain:
+            cursor = getattr(cursor, name)(*args)
+        return cursor
+
+    def __iter__(self):
+        cassette, key = self._collection.cassette, self._key()
+        if cassette.replaying:
+            return iter(cassette.replay("mongo", key, default=[]))
+        start = time.perf_counter()
+        rows = list(self._apply(getattr(self._collection.inner, self._op)(*self._args, **self._kwargs)))
+        cassette.record("mongo", self._collection.label(self._op), key, rows, (time.perf_counter() - start) * 1000)
+        return iter(rows)
+
+    async def to_list(self, length=None):
+        cassette, key = self._collection.cassette, self._key()
+        if cassette.replaying:
+            rows = await cassette.areplay("mongo", key, default=[])
+        else:
+            start = time.perf_counter()
+            cursor = getattr(self._collection.inner, self._op)(*self._args, **self._kwargs)
+            if asyncio.iscoroutine(cursor):  # AsyncCollection.aggregate is awaited for its cursor
+                cursor = await cursor
+            rows = await self._apply(cursor).to_list(None)
+            cassette.record("mongo", self._collection.label(self._op), key, rows, (time.perf_counter() - start) * 1000)
+        return rows[:length] if length else rows
+
+    def __aiter__(self):
+        async def rows():
+            for row in await self.to_list(None):
+                yield row
+        return rows()
+
+
+class CassetteCollection:
+    """
+    Reads (find, find_one, aggregate, distinct, count...) are recorded by query and replayed.
+    Writes go to the live collection when recording and are dropped on replay.
+    """
+
+    def __init__(self, inner, cassette: Cassette, name: str, asynchronous: bool = False):
+        self.inner = inner
+        self.cassette = cassette
+        self.name = name
+        self.asynchronous = asynchronous
+
+    def label(self, op: str) -> str:
+        return f"{self.name}.{op}"
+
+    def key(self, op: str, args, kwargs, chain=()) -> str:
+        return request_key(self.name, op, list(args), kwargs, list(chain))
+
+    def find(self, *args, **kwargs):
+        return CassetteCursor(self, "find", args, kwargs)
+
+    def aggregate(self, pipeline, **kwargs):
+        cursor = CassetteCursor(self, "aggregate", (pipeline,), kwargs)
+        if not self.asynchronous:
+            return cursor
+
+        async def opened():
+            return cursor
+        return opened()
+
+    def watch(self, *args, **kwargs):
+        if self.cassette.replaying:
+            return _IdleChangeStream()  # Nothing is recorded from change streams
+        return self.inner.watch(*args, **kwargs)
+
+    def __getattr__(self, op):
+        if op.startswith("_"):
+            raise AttributeError(op)
+        if op in MONGO_WRITE_OPS:
+            if self.cassette.replaying:
+                return (self._async_noop if self.asynchronous else lambda *args, **kwargs: None)
+            return getattr(self.inner, op)
+        return self._async_read(op) if self.asynchronous else self._read(op)
+
+    @staticmethod
+    async def _async_noop(*args, **kwargs):
+        return None
+
+    def _read(self, op):
+        def call(*args, **kwargs):
+            key = self.key(op, args, kwargs)
+            if self.cassette.replaying:
+                return self.cassette.replay("mongo", key)
+            start = time.perf_counter()
+            result = getattr(self.inner, op)(*args, **kwargs)
+            self.cassette.record("mongo", self.label(op), key, result, (time.perf_counter() - start) * 1000)
+            return result
+        return call
+
+    def _async_read(self, op):
+        async def call(*args, **kwargs):
+            key = self.key(op, args, kwargs)
+            if self.cassette.replaying:
+                return await self.cassette.areplay("mongo", key)
+            start = time.perf_counter()
+            result = await getattr(self.inner, op)(*args, **kwargs)
+            self.cassette.record("mongo", self.label(op), key, result, (time.perf_counter() - start) * 1000)
+            return result
+        return call
+
+
+class CassetteDatabase:
+    def __init__(self, inner, cassette: Cassette, name: str, asynchronous: bool):
+        self.inner = inner
+        self.cassette = cassette
+        self.name = name
+        self.asynchronous = asynchronous
+
+    def __getitem__(self, collection: str):
+        inner = self.inner[collection] if self.inner is not None else None
+        return CassetteCollection(inner, self.cassette, f"{self.name}.{collection}", self.asynchronous)
+
+
+class CassetteMongoClient:
+    def __init__(self, inner, cassette: Cassette, asynchronous: bool = False):
+        self.inner = inner
+        self.cassette = cassette
+        self.asynchronous = asynchronous
+
+    def __getitem__(self, db: str):
+        return CassetteDatabase(self.inner[db] if self.inner is not None else None, self.cassette, db,
+                                self.asynchronous)
+
+    def close(self):
+        if self.inner is not None:
+            self.inner.close()
+
+
+def cassette_from_env() -> Optional[Cassette]:
+    """CASSETTE_MODE=record|replay, CASSETTE_PATH, CASSETTE_TIMING (off | original | a scale factor), CASSETTE_STRICT."""
+    mode = os.getenv("CASSETTE_MODE", "off").lower()
+    if mode == "off":
+        return None
+    if mode not in CASSETTE_MODES:
+        raise ValueError(f"CASSETTE_MODE must be one of {', '.join(CASSETTE_MODES)}")
+    timing = os.getenv("CASSETTE_TIMING", "off").lower()
+    scale = {"off": 0.0, "original": 1.0}.get(timing)
+    cassette = Cassette(os.getenv("CASSETTE_PATH", os.path.join("cassettes", "session.jsonl")), mode,
+                        timing_scale=float(timing) if scale is None else scale,
+                        strict=os.getenv("CASSETTE_STRICT", "off").lower() == "on")
+    log.info("📼 Cassette", extra={"mode": mode, "path": cassette.path})
+    return cassette
@@ -0,0 +1,72 @@
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Import-time budget for the API modules: each run imports the module in a fresh interpreter
+# with the network disabled (any connect / DNS lookup fails the check) and no credentials, and
+# reports wall time plus the slowest imports (python -X importtime). Exits 1 if over budget.
+PROBE = """
+import socket, sys, time
+def refuse(*args, **kwargs):
+    raise RuntimeError("network access while importing")
+socket.socket.connect = socket.socket.connect_ex = refuse
+socket.create_connection = socket.getaddrinfo = refuse
+start = time.perf_counter()
+import {module}
+print("IMPORT_MS", (time.perf_counter() - start) * 1000)
+"""
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+ENV_BLOCKLIST = ("MONGO_URI", "VOYAGE_API_KEY", "FIREWORKS_API_KEY", "FAKE_BACKENDS", "CASSETTE_MODE")
+
+
+def probe(module: str, importtime: bool = False):
+    env = {k: v for k, v in os.environ.items() if k not in ENV_BLOCKLIST}
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", PROBE.format(module=module)]
+    result = subprocess.run(cmd, capture_output=True, text=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        error = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise SystemExit(f"❌ import {module} failed:\n" + "\n".join(error[-15:]))
+    ms = float(next(line.split()[1] for line in result.stdout.splitlines() if line.startswith("IMPORT_MS")))
+    return ms, result.stderr
+
+
+def slowest(importtime_output: str, module: str, top: int):
+    """The module's direct imports by cumulative time (us -> ms), grouped by top-level package."""
+    rows = [(len(m.group(3)), m.group(4), int(m.group(2)) / 1000) for m in IMPORTTIME_LINE.finditer(importtime_output)]
+    end = max(i for i, (_, name, _) in enumerate(rows) if name == module)
+    depth = rows[end][0]
+    totals = {}
+    for child_depth, name, ms in reversed(rows[:end]):  # Children are printed before their parent
+        if child_depth <= depth:
+            break
+        if child_depth == depth + 2:
+            root = name.split(".")[0]
+            totals[root] = totals.get(root, 0) + ms
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure and enforce the import time of the API modules.")
+    parser.add_argument("modules", nargs="*", default=["agent_graph", "api"])
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "2000")),
+                        help="Fail if the median import takes longer (IMPORT_BUDGET_MS)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Slowest imported packages to list")
+    args = parser.parse_args()
+
+    over = False
+    for module in args.modules:
+        runs = [probe(module)[0] for _ in range(args.runs)]
+        median = statistics.median(runs)
+        flag = "✅" if median <= args.budget_ms else "❌"
+        over |= median > args.budget_ms
+        print(f"{flag} import {module}: median {median:.0f} ms, min {min(runs):.0f} ms "
+              f"over {args.runs} runs (budget {args.budget_ms:.0f} ms, network blocked)")
+        for name, ms in slowest(probe(module, importtime=True)[1], module, args.top):
+            print(f"      {name:<28} {ms:8.1f} ms")
+    if over:
+        raise SystemExit(1)
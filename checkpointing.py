@@ -0,0 +1,505 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    copy_checkpoint,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+from telemetry import log, telemetry
+
+# --- BOUNDED CONVERSATION STATE ---
+# The graph keeps the last few messages verbatim and folds older ones into a short
+# rolling summary (the full log lives in transcripts.py), so a thread's checkpoint stays
+# the same size on turn 10 and turn 1,000 while prompts still see what came before.
+
+
+def windowed(limit: int):
+    """`operator.add` for message lists, capped at the newest `limit` entries (hard backstop for compaction)."""
+
+    def add(left: list, right: list) -> list:
+        merged = (left or []) + (right or [])
+        return merged[-limit:] if len(merged) > limit else merged
+
+    return add
+
+
+def _clip(text: str, width: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= width else text[: width - 1] + "…"
+
+
+def fold_summary(summary: str, dropped: List[str], max_chars: int = 1200, line_chars: int = 90) -> str:
+    """Rolling extractive summary: one clipped line per dropped message, oldest lines fall off first."""
+    lines = [line for line in (summary or "").splitlines() if line.startswith("- ")]
+    lines += [f"- {_clip(message, line_chars)}" for message in dropped]
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+# --- DURABLE STORES ---
+# One row/document per thread: the checkpoint header plus one entry per channel.
+# save() only rewrites channels whose version moved since the last flush (delta writes).
+
+class MemoryCheckpointStore:
+    """Dict-backed store for tests and local runs."""
+
+    def __init__(self):
+        self.threads: Dict[Tuple[str, str], dict] = {}
+        self.channels: Dict[Tuple[str, str], Dict[str, tuple]] = {}
+
+    def load(self, thread_id: str, ns: str):
+        row = self.threads.get((thread_id, ns))
+        if row is None:
+            return None
+        return row, dict(self.channels.get((thread_id, ns), {}))
+
+    def save(self, thread_id: str, ns: str, row: dict, changed: Dict[str, tuple], removed: Sequence[str]):
+        self.threads[(thread_id, ns)] = row
+        channels = self.channels.setdefault((thread_id, ns), {})
+        channels.update(changed)
+        for name in removed:
+            channels.pop(name, None)
+
+    def delete(self, thread_id: str):
+        for key in [k for k in self.threads if k[0] == thread_id]:
+            self.threads.pop(key, None)
+            self.channels.pop(key, None)
+
+    def expire(self):
+        return 0
+
+
+class SQLiteCheckpointStore:
+    """Local on-disk store. Old threads are swept on expire() once `ttl_seconds` have passed since their last turn."""
+
+    def __init__(self, path: str = "checkpoints.sqlite3", ttl_seconds: Optional[float] = None):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS checkpoint_threads ("
+            "thread_id TEXT, ns TEXT, checkpoint_id TEXT, parent_id TEXT, header_type TEXT, header BLOB, "
+            "metadata_type TEXT, metadata BLOB, updated_at REAL, PRIMARY KEY (thread_id, ns));"
+            "CREATE TABLE IF NOT EXISTS checkpoint_channels ("
+            "thread_id TEXT, ns TEXT, channel TEXT, version TEXT, value_type TEXT, value BLOB, "
+            "PRIMARY KEY (thread_id, ns, channel));"
+            "CREATE INDEX IF NOT EXISTS checkpoint_threads_updated ON checkpoint_threads (updated_at);"
+        )
+        self._conn.commit()
+
+    def load(self, thread_id: str, ns: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT checkpoint_id, parent_id, header_type, header, metadata_type, metadata, updated_at "
+                "FROM checkpoint_threads WHERE thread_id = ? AND ns = ?", (thread_id, ns)
+            ).fetchone()
+            if row is None:
+                return None
+            channels = self._conn.execute(
+                "SELECT channel, version, value_type, value FROM checkpoint_channels WHERE thread_id = ? AND ns = ?",
+                (thread_id, ns),
+            ).fetchall()
+        if self.ttl_seconds and time.time() - row[6] > self.ttl_seconds:
+            return None
+        checkpoint_id, parent_id, header_type, header, metadata_type, metadata, _ = row
+        return (
+            {"checkpoint_id": checkpoint_id, "parent_id": parent_id,
+             "header": (header_type, header), "metadata": (metadata_type, metadata)},
+            {name: (version, (value_type, value)) for name, version, value_type, value in channels},
+        )
+
+    def save(self, thread_id: str, ns: str, row: dict, changed: Dict[str, tuple], removed: Sequence[str]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoint_threads VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, ns, row["checkpoint_id"], row["parent_id"], *row["header"], *row["metadata"], time.time()),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO checkpoint_channels VALUES (?, ?, ?, ?, ?, ?)",
+                [(thread_id, ns, name, version, *typed) for name, (version, typed) in changed.items()],
+            )
+            self._conn.executemany(
+                "DELETE FROM checkpoint_channels WHERE thread_id = ? AND ns = ? AND channel = ?",
+                [(thread_id, ns, name) for name in removed],
+            )
+            self._conn.commit()
+
+    def delete(self, thread_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoint_threads WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM checkpoint_channels WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def expire(self) -> int:
+        if not self.ttl_seconds:
+            return 0
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM checkpoint_channels WHERE (thread_id, ns) IN "
+                "(SELECT thread_id, ns FROM checkpoint_threads WHERE updated_at < ?)", (cutoff,)
+            )
+            removed = self._conn.execute("DELETE FROM checkpoint_threads WHERE updated_at < ?", (cutoff,)).rowcount
+            self._conn.commit()
+        return removed
+
+
+class MongoCheckpointStore:
+    """One document per thread in Mongo; a TTL index on `updated_at` lets Atlas expire idle threads."""
+
+    def __init__(self, collection, ttl_seconds: Optional[float] = None):
+        self.collection = collection
+        if ttl_seconds:
+            self.collection.create_index("updated_at", expireAfterSeconds=int(ttl_seconds))
+
+    @staticmethod
+    def _id(thread_id: str, ns: str) -> str:
+        return f"{thread_id}|{ns}"
+
+    def load(self, thread_id: str, ns: str):
+        doc = self.collection.find_one({"_id": self._id(thread_id, ns)})
+        if doc is None:
+            return None
+        row = {
+            "checkpoint_id": doc["checkpoint_id"],
+            "parent_id": doc.get("parent_id"),
+            "header": (doc["header"]["type"], bytes(doc["header"]["value"])),
+            "metadata": (doc["metadata"]["type"], bytes(doc["metadata"]["value"])),
+        }
+        channels = {
+            name: (entry["version"], (entry["type"], bytes(entry["value"])))
+            for name, entry in (doc.get("channels") or {}).items()
+        }
+        return row, channels
+
+    def save(self, thread_id: str, ns: str, row: dict, changed: Dict[str, tuple], removed: Sequence[str]):
+        update = {
+            "$set": {
+                "thread_id": thread_id,
+                "checkpoint_id": row["checkpoint_id"],
+                "parent_id": row["parent_id"],
+                "header": {"type": row["header"][0], "value": row["header"][1]},
+                "metadata": {"type": row["metadata"][0], "value": row["metadata"][1]},
+                "updated_at": datetime.now(timezone.utc),
+                **{
+                    f"channels.{name}": {"version": version, "type": typed[0], "value": typed[1]}
+                    for name, (version, typed) in changed.items()
+                },
+            }
+        }
+        if removed:
+            update["$unset"] = {f"channels.{name}": "" for name in removed}
+        self.collection.update_one({"_id": self._id(thread_id, ns)}, update, upsert=True)
+
+    def delete(self, thread_id: str):
+        self.collection.delete_many({"thread_id": thread_id})
+
+    def expire(self):
+        return 0  # The TTL index does it
+
+
+# --- COALESCING SAVER ---
+
+class _Slot:
+    """Latest checkpoint of one (thread, namespace) plus what has already reached the store."""
+
+    __slots__ = ("checkpoint", "metadata", "parent_id", "writes", "dirty", "flushed_versions")
+
+    def __init__(self, checkpoint, metadata, parent_id, flushed_versions=None):
+        self.checkpoint = checkpoint
+        self.metadata = metadata
+        self.parent_id = parent_id
+        self.writes: Dict[tuple, tuple] = {}
+        self.dirty = flushed_versions is None
+        self.flushed_versions: Dict[str, Any] = flushed_versions or {}
+
+
+class CoalescingSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpointer that keeps only the LATEST checkpoint of each thread in memory and
+    writes it to a durable store in the background.
+
+    - A turn produces several checkpoints (input, supervisor, answer node, compact);
+      puts only touch memory, and flush() persists whatever is newest per thread, so
+      many puts collapse into one store write every `flush_seconds`.
+    - Writes are deltas: only channels whose version changed since the last flush.
+    - Threads not in memory are loaded from the store on first access; idle, flushed
+      threads beyond `max_threads` are evicted.
+    History (older checkpoint ids, time travel) is intentionally not kept. A crash loses
+    at most the last `flush_seconds` of turns.
+    """
+
+    def __init__(self, store, flush_seconds: float = 2.0, max_threads: int = 10000, serde=None):
+        super().__init__(serde=serde)
+        self.store = store
+        self.flush_seconds = flush_seconds
+        self.max_threads = max_threads
+        self._slots: "OrderedDict[Tuple[str, str], _Slot]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._versions = InMemorySaver()  # Borrow its version scheme
+        self.puts = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.bytes_written = 0
+
+    # --- STORE <-> MEMORY ---
+
+    def _cached(self, key: Tuple[str, str]) -> Optional[_Slot]:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is not None:
+                self._slots.move_to_end(key)
+            return slot
+
+    def _install(self, key: Tuple[str, str], loaded) -> Optional[_Slot]:
+        if loaded is None:
+            return None
+        row, channels = loaded
+        checkpoint = self.serde.loads_typed(row["header"])
+        checkpoint["channel_values"] = {
+            name: self.serde.loads_typed(typed) for name, (_, typed) in channels.items() if typed[0] != "empty"
+        }
+        slot = _Slot(checkpoint, self.serde.loads_typed(row["metadata"]), row["parent_id"],
+                     flushed_versions={name: version for name, (version, _) in channels.items()})
+        with self._lock:
+            slot = self._slots.setdefault(key, slot)
+            self._evict()
+        return slot
+
+    def _slot(self, thread_id: str, ns: str) -> Optional[_Slot]:
+        key = (thread_id, ns)
+        slot = self._cached(key)
+        if slot is not None:
+            return slot
+        with telemetry.span("checkpoint.load"):
+            return self._install(key, self.store.load(thread_id, ns))
+
+    async def _aslot(self, thread_id: str, ns: str) -> Optional[_Slot]:
+        """_slot() for the event loop: a thread's first access reads the store on a worker thread."""
+        key = (thread_id, ns)
+        slot = self._cached(key)
+        if slot is not None:
+            return slot
+        with telemetry.span("checkpoint.load"):
+            return self._install(key, await asyncio.to_thread(self.store.load, thread_id, ns))
+
+    def _evict(self):
+        while len(self._slots) > self.max_threads:
+            for key, slot in self._slots.items():
+                if not slot.dirty:
+                    del self._slots[key]
+                    break
+            else:
+                return  # Everything is dirty: the next flush makes room
+
+    def flush(self) -> int:
+        """Persist the newest checkpoint of every thread that changed since the last flush."""
+        with self._lock:
+            pending = [(key, slot) for key, slot in self._slots.items() if slot.dirty]
+            snapshots = []
+            for key, slot in pending:
+                slot.dirty = False
+                snapshots.append((key, slot, slot.checkpoint, slot.metadata, slot.parent_id))
+        for (thread_id, ns), slot, checkpoint, metadata, parent_id in snapshots:
+            versions = checkpoint["channel_versions"]
+            values = checkpoint["channel_values"]
+            changed = {
+                name: (version, self.serde.dumps_typed(values[name]) if name in values else ("empty", b""))
+                for name, version in versions.items()
+                if slot.flushed_versions.get(name) != version
+            }
+            removed = [name for name in slot.flushed_versions if name not in versions]
+            header = {k: v for k, v in checkpoint.items() if k != "channel_values"}
+            row = {
+                "checkpoint_id": checkpoint["id"],
+                "parent_id": parent_id,
+                "header": self.serde.dumps_typed(header),
+                "metadata": self.serde.dumps_typed(metadata),
+            }
+            try:
+                with telemetry.span("checkpoint.write", channels=len(changed)):
+                    self.store.save(thread_id, ns, row, changed, removed)
+            except Exception as e:
+                log.warning("⚠️ Checkpoint flush failed", extra={"thread_id": thread_id, "error": str(e)})
+                slot.dirty = True
+                continue
+            slot.flushed_versions = dict(versions)
+            self.rows_written += 1
+            self.bytes_written += len(row["header"][1]) + sum(len(t[1]) for _, t in changed.values())
+        if snapshots:
+            self.flushes += 1
+        return len(snapshots)
+
+    def start(self):
+        """Flush on a daemon thread every `flush_seconds` (and sweep expired threads)."""
+
+        def run():
+            while not self._stop.wait(self.flush_seconds):
+                self.flush()
+                try:
+                    self.store.expire()
+                except Exception as e:
+                    log.warning("⚠️ Checkpoint expiry failed", extra={"error": str(e)})
+
+        self._flusher = threading.Thread(target=run, name="checkpoint-flush", daemon=True)
+        self._flusher.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    # --- CHECKPOINTER API ---
+
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        return self._tuple(config, self._slot(thread_id, ns))
+
+    def _tuple(self, config, slot: Optional[_Slot]) -> Optional[CheckpointTuple]:
+        if slot is None:
+            return None
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id and checkpoint_id != slot.checkpoint["id"]:
+            return None  # Only the latest checkpoint is kept
+        with self._lock:
+            checkpoint = copy_checkpoint(slot.checkpoint)
+            writes = [(task_id, channel, value) for task_id, channel, value, _ in slot.writes.values()]
+            metadata, parent_id = slot.metadata, slot.parent_id
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}},
+            checkpoint=checkpoint,
+            metadata=metadata,
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=writes,
+        )
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        if config is None:
+            return
+        latest = self.get_tuple(config)
+        if latest is None or (before and get_checkpoint_id(before) and latest.checkpoint["id"] >= get_checkpoint_id(before)):
+            return
+        if filter and any(latest.metadata.get(k) != v for k, v in filter.items()):
+            return
+        yield latest
+
+    def put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> dict:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        # Loads flushed versions first, so the first flush is a delta too
+        return self._put(config, checkpoint, metadata, self._slot(thread_id, ns))
+
+    def _put(self, config, checkpoint: Checkpoint, metadata: CheckpointMetadata, existing: Optional[_Slot]) -> dict:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            snapshot = copy_checkpoint(checkpoint)
+            meta = get_checkpoint_metadata(config, metadata)
+            parent_id = config["configurable"].get("checkpoint_id")
+            if existing is None:
+                self._slots[(thread_id, ns)] = _Slot(snapshot, meta, parent_id)
+                self._evict()
+            else:
+                existing.checkpoint, existing.metadata, existing.parent_id = snapshot, meta, parent_id
+                existing.writes = {}
+                existing.dirty = True
+            self.puts += 1
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            slot = self._slots.get((thread_id, ns))
+            if slot is None or slot.checkpoint["id"] != config["configurable"].get("checkpoint_id"):
+                return  # Writes against a checkpoint we no longer hold
+            for idx, (channel, value) in enumerate(writes):
+                key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if key[1] >= 0 and key in slot.writes:
+                    continue
+                slot.writes[key] = (task_id, channel, value, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._slots if k[0] == thread_id]:
+                del self._slots[key]
+        self.store.delete(thread_id)
+
+    # Memory-only on the hot path; only a thread's first load goes to the store (off the event loop).
+    async def aget_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        return self._tuple(config, await self._aslot(thread_id, ns))
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        if config is not None:
+            await self._aslot(config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns", ""))
+        for item in self.list(config, filter=filter, before=before, limit=limit):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        return self._put(config, checkpoint, metadata, await self._aslot(thread_id, ns))
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return self.delete_thread(thread_id)
+
+    def get_next_version(self, current, channel) -> str:
+        return self._versions.get_next_version(current, channel)
+
+    def stats(self) -> dict:
+        return {
+            "threads_in_memory": len(self._slots),
+            "dirty": sum(slot.dirty for slot in self._slots.values()),
+            "puts": self.puts,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "bytes_written": self.bytes_written,
+        }
+
+
+def build_checkpointer(mode: str, client=None, db_name: str = "checkpointing_db", path: str = "checkpoints.sqlite3",
+                       ttl_seconds: Optional[float] = None, flush_seconds: float = 2.0):
+    """
+    mode: coalesced (memory + Mongo deltas) | sqlite (memory + local file) | memory | mongo (MongoDBSaver, full history).
+    """
+    mode = (mode or "coalesced").lower()
+    if mode == "memory":
+        return InMemorySaver()
+    if mode == "mongo":
+        from langgraph.checkpoint.mongodb import MongoDBSaver
+        return MongoDBSaver(client, ttl=int(ttl_seconds) if ttl_seconds else None)
+    if mode == "sqlite":
+        store = SQLiteCheckpointStore(path, ttl_seconds=ttl_seconds)
+    else:
+        store = MongoCheckpointStore(client[db_name]["thread_checkpoints"], ttl_seconds=ttl_seconds)
+    return CoalescingSaver(store, flush_seconds=flush_seconds).start()
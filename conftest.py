@@ -0,0 +1,3 @@
+# test_routing.py and test_retrieval.py are scripts against a live server / Atlas cluster
+# (`python test_routing.py`), not pytest modules; the offline unit tests are everything else.
+collect_ignore = ["test_routing.py", "test_retrieval.py"]
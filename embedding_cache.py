@@ -0,0 +1,276 @@
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from telemetry import log, telemetry
+
+# --- KEYING ---
+# Travelers ask the same handful of things ("coffee", "Coffee?", "coffee  ").
+# We normalize before hashing so those all land on the same cache entry.
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n?!.,;:"
+
+
+def normalize_query(text: str) -> str:
+    return _WHITESPACE.sub(" ", text.casefold()).strip(_EDGE_PUNCTUATION)
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha1(f"{model_name}\x00{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+
+# --- PERSISTENT TIERS ---
+
+class SQLiteEmbeddingStore:
+    """Local on-disk tier. Vectors are stored as packed float32 blobs."""
+
+    def __init__(self, path: str = "embedding_cache.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, vector BLOB, created_at REAL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str, ttl_seconds: Optional[float]) -> Optional[List[float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        blob, created_at = row
+        if ttl_seconds and time.time() - created_at > ttl_seconds:
+            self.delete(key)
+            return None
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector.tolist()
+
+    def put(self, key: str, model_name: str, vector: List[float]):
+        blob = array("f", vector).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (key, model, vector, created_at) VALUES (?, ?, ?, ?)",
+                (key, model_name, blob, time.time()),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM query_embeddings WHERE key = ?", (key,))
+            self._conn.commit()
+
+
+class MongoEmbeddingStore:
+    """Shared tier in a Mongo collection, so every API worker benefits from every other worker's misses."""
+
+    def __init__(self, collection, ttl_seconds: Optional[float] = None):
+        self.collection = collection
+        if ttl_seconds:
+            # Let Atlas expire old entries for us instead of sweeping them by hand.
+            self.collection.create_index("created_at", expireAfterSeconds=int(ttl_seconds))
+
+    def get(self, key: str, ttl_seconds: Optional[float]) -> Optional[List[float]]:
+        doc = self.collection.find_one({"_id": key}, {"vector": 1, "created_at": 1})
+        if doc is None:
+            return None
+        if ttl_seconds:
+            created_at = doc["created_at"].replace(tzinfo=timezone.utc).timestamp()
+            if time.time() - created_at > ttl_seconds:
+                return None
+        return doc["vector"]
+
+    def put(self, key: str, model_name: str, vector: List[float]):
+        self.collection.replace_one(
+            {"_id": key},
+            {"model": model_name, "vector": list(vector), "created_at": datetime.now(timezone.utc)},
+            upsert=True,
+        )
+
+
+# --- CACHED EMBEDDER ---
+
+class CachedEmbeddings:
+    """
+    Wraps an embeddings client (e.g. VoyageAIEmbeddings) so repeat queries skip the network.
+    Lookup order: in-process LRU -> optional persistent store -> the real embedder.
+    Async misses are single-flight per query, and the persistent-tier write happens in the background.
+    """
+
+    def __init__(self, embedder, model_name: str, max_size: int = 1024,
+                 ttl_seconds: Optional[float] = 24 * 3600, store=None):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.store = store
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._writes = set()  # Background persistent-tier writes, referenced until done
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _get_local(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            vector, created_at = entry
+            if self.ttl_seconds and time.time() - created_at > self.ttl_seconds:
+                del self._lru[key]
+                return None
+            self._lru.move_to_end(key)
+            return vector
+
+    def _put_local(self, key: str, vector: List[float]):
+        with self._lock:
+            self._lru[key] = (vector, time.time())
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_size:
+                self._lru.popitem(last=False)
+
+    def _get_persistent(self, key: str) -> Optional[List[float]]:
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(key, self.ttl_seconds)
+        except Exception as e:
+            # A broken cache tier must never break search; just fall through to the embedder.
+            log.warning("⚠️ Embedding cache store read failed", extra={"error": str(e)})
+            return None
+
+    def _put_persistent(self, key: str, vector: List[float]):
+        if self.store is None:
+            return
+        try:
+            self.store.put(key, self.model_name, vector)
+        except Exception as e:
+            log.warning("⚠️ Embedding cache store write failed", extra={"error": str(e)})
+
+    def embed_query(self, text: str) -> List[float]:
+        key = cache_key(self.model_name, text)
+
+        vector = self._get_local(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+
+        vector = self._get_persistent(key)
+        if vector is not None:
+            self.store_hits += 1
+            self._put_local(key, vector)
+            return vector
+
+        self.misses += 1
+        with telemetry.span("embed", model=self.model_name):
+            vector = self.embedder.embed_query(text)
+        self._put_local(key, vector)
+        self._put_persistent(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = cache_key(self.model_name, text)
+
+        vector = self._get_local(key)
+        if vector is not None:
+            self.hits += 1
+            return vector
+
+        # Single flight: concurrent misses for the same query share one store read / embed call.
+        pending = self._pending.get(key)
+        if pending is not None:
+            try:
+                vector = await asyncio.shield(pending)
+                self.coalesced += 1
+                return vector
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Its owner was cancelled (e.g. an unused prefetch): look it up ourselves
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            vector = await self._alookup(key, text)
+            future.set_result(vector)
+            return vector
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved: waiters (if any) re-raise it themselves
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    async def _alookup(self, key: str, text: str) -> List[float]:
+        if self.store is not None:
+            # The persistent tiers use blocking drivers; keep them off the event loop.
+            vector = await asyncio.to_thread(self._get_persistent, key)
+            if vector is not None:
+                self.store_hits += 1
+                self._put_local(key, vector)
+                return vector
+
+        self.misses += 1
+        with telemetry.span("embed", model=self.model_name):
+            vector = await self.embedder.aembed_query(text)
+        self._put_local(key, vector)
+        if self.store is not None:
+            # Written in the background: the caller already has its vector, and the LRU serves repeats
+            task = asyncio.create_task(asyncio.to_thread(self._put_persistent, key, vector))
+            self._writes.add(task)
+            task.add_done_callback(self._writes.discard)
+        return vector
+
+    async def aflush(self):
+        """Waits for pending persistent-tier writes (tests, shutdown)."""
+        while self._writes:
+            await asyncio.gather(*list(self._writes))
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Document embedding is an ingestion concern; no point caching it here.
+        return self.embedder.embed_documents(texts)
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.store_hits + self.misses
+        return {
+            "size": len(self._lru),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "store_hits": self.store_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.store_hits) / lookups if lookups else 0.0,
+        }
+
+
+def build_store(backend: str, path: str = "embedding_cache.sqlite3", db=None,
+                ttl_seconds: Optional[float] = None):
+    """Returns the persistent tier named by EMBED_CACHE_BACKEND ('memory', 'sqlite' or 'mongo')."""
+    backend = (backend or "memory").lower()
+    if backend == "sqlite":
+        return SQLiteEmbeddingStore(path)
+    if backend == "mongo":
+        if db is None:
+            raise ValueError("Mongo embedding cache requires a database handle")
+        return MongoEmbeddingStore(db["query_embedding_cache"], ttl_seconds=ttl_seconds)
+    return None
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import math
+import os
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:  # Optional: only needed for EMBEDDING_PROVIDER=sentence-transformers
+    SentenceTransformer = None
+
+# Where each provider's vectors live on an amenity doc, so several can coexist during a
+# migration (see migrate_embeddings.py). The Voyage field is the original one; the hashed
+# model is named after its dimension and idf (HashedTfidfEmbeddings.model_name).
+PROVIDERS: Dict[str, dict] = {
+    "voyage": {"model": "voyage-3-large", "field": "embedding", "index": "vector_index"},
+    "hashed": {"model": None, "field": "embedding_local", "index": "vector_index_local"},
+    "sentence-transformers": {"model": "all-MiniLM-L6-v2", "field": "embedding_st", "index": "vector_index_st"},
+}
+
+
+def embedding_hash(model_name: str, text: str) -> str:
+    """What a stored vector depends on; kept as <field>_hash next to it, so an edited description is re-embedded."""
+    return hashlib.sha1(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+
+# --- HASHED TF-IDF ---
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are at be by can do for from get have i in is it me my near of on or some the there "
+    "to want what where which with you".split()
+)
+
+
+def _bucket(feature: str, dim: int):
+    # crc32, not hash(): vectors must be identical across processes and restarts
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+
+class HashedTfidfEmbeddings(Embeddings):
+    """
+    CPU-only, dependency-free embedder: words, word bigrams and character trigrams hashed into
+    `dim` signed buckets, sublinear tf, optional idf per bucket, L2-normalized.
+    Lexical rather than semantic ("espresso" won't find "coffee" unless the description says it),
+    but deterministic, ~0.1 ms per query and fully offline. Fit the idf on the corpus with
+    migrate_embeddings.py; queries and documents must use the same idf file.
+    """
+
+    def __init__(self, dim: int = 512, idf_path: Optional[str] = None, char_weight: float = 0.5):
+        self.dim = dim
+        self.char_weight = char_weight
+        self.idf = np.ones(dim, dtype=np.float32)
+        self.idf_path = idf_path
+        if idf_path and os.path.exists(idf_path):
+            self.load_idf(idf_path)
+
+    def features(self, text: str) -> Dict[str, float]:
+        words = [w for w in _TOKEN.findall(text.lower()) if w not in STOPWORDS]
+        counts: Dict[str, float] = {}
+        for i, word in enumerate(words):
+            counts[word] = counts.get(word, 0.0) + 1.0
+            if i:
+                bigram = f"{words[i - 1]} {word}"
+                counts[bigram] = counts.get(bigram, 0.0) + 1.0
+            padded = f"<{word}>"
+            for j in range(len(padded) - 2):
+                trigram = "#" + padded[j:j + 3]
+                counts[trigram] = counts.get(trigram, 0.0) + self.char_weight
+        return counts
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in self.features(text).items():
+            bucket, sign = _bucket(feature, self.dim)
+            vector[bucket] += sign * (1.0 + math.log(count) if count >= 1 else count)
+        vector *= self.idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    @property
+    def model_name(self) -> str:
+        # Vectors change with the idf, so cached query vectors and migrated docs are tagged with it
+        return f"hashed-tfidf-{self.dim}-{zlib.crc32(self.idf.tobytes()):08x}"
+
+    def fit(self, texts: Iterable[str]) -> "HashedTfidfEmbeddings":
+        """Smoothed idf per bucket from a corpus (streamed: one pass, O(dim) memory)."""
+        df = np.zeros(self.dim, dtype=np.float64)
+        n = 0
+        for text in texts:
+            n += 1
+            df[list({_bucket(f, self.dim)[0] for f in self.features(text)})] += 1
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def save_idf(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"dim": self.dim, "idf": self.idf.tolist()}, f)  # Exact: the model name hashes it
+
+    def load_idf(self, path: str):
+        with open(path) as f:
+            data = json.load(f)
+        if data["dim"] != self.dim:
+            raise ValueError(f"{path} was fitted for dim={data['dim']}, not {self.dim}")
+        self.idf = np.asarray(data["idf"], dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._vector(text).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # Microseconds of CPU: cheaper inline than a thread hop
+        return self.embed_query(text)
+
+
+# --- SENTENCE TRANSFORMERS ---
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """Small local model (MiniLM by default; backend="onnx" for ONNX Runtime), batched on CPU."""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", batch_size: int = 64, backend: str = "torch"):
+        if SentenceTransformer is None:
+            raise ImportError("EMBEDDING_PROVIDER=sentence-transformers needs `pip install sentence-transformers`")
+        self.model = SentenceTransformer(model_name, device="cpu", backend=backend)
+        self.batch_size = batch_size
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def build_embeddings(provider: str, model: Optional[str] = None, api_key: Optional[str] = None,
+                     dim: int = 512, idf_path: Optional[str] = None, batch_size: int = 64):
+    """(embedder, model_name) for EMBEDDING_PROVIDER: voyage | hashed | sentence-transformers."""
+    provider = (provider or "voyage").lower()
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider {provider!r} (expected one of {', '.join(PROVIDERS)})")
+    model = model or PROVIDERS[provider]["model"]
+    if provider == "hashed":
+        embedder = HashedTfidfEmbeddings(dim=dim, idf_path=idf_path)
+        return embedder, embedder.model_name
+    if provider == "sentence-transformers":
+        backend = "onnx" if os.getenv("EMBEDDING_ONNX", "off").lower() == "on" else "torch"
+        return SentenceTransformerEmbeddings(model, batch_size=batch_size, backend=backend), model
+    from langchain_voyageai import VoyageAIEmbeddings  # Only the API provider needs the client
+    return VoyageAIEmbeddings(model=model, voyage_api_key=api_key, batch_size=batch_size), model
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import OperationFailure
+
+from embedding_providers import HashedTfidfEmbeddings
+
+try:
+    import mongomock
+except ImportError:  # Optional: only FAKE_BACKENDS=on needs it (`pip install mongomock`)
+    mongomock = None
+
+# Offline stand-ins for Mongo, Voyage and Fireworks (FAKE_BACKENDS=on): the whole graph runs
+# on one machine with no credentials, and each backend sleeps a configurable time per call so
+# benchmarks (bench_chat.py) still see realistic network-shaped latency.
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "airports.json")
+
+
+class Latency:
+    """mean_ms ± jitter (a fraction of the mean), uniformly; 0 disables."""
+
+    def __init__(self, mean_ms: float = 0.0, jitter: float = 0.3, seed: Optional[int] = None):
+        self.mean_ms = mean_ms
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+
+    def sample(self) -> float:
+        if self.mean_ms <= 0:
+            return 0.0
+        return max(0.0, self.mean_ms * (1 + self._rng.uniform(-self.jitter, self.jitter))) / 1000
+
+    def sleep(self):
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self):
+        delay = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+
+    @classmethod
+    def from_env(cls, name: str, default_ms: float) -> "Latency":
+        return cls(float(os.getenv(name, str(default_ms))), float(os.getenv("FAKE_LATENCY_JITTER", "0.3")))
+
+# --- VOYAGE ---
+
+class FakeEmbeddings(Embeddings):
+    """Hashed TF-IDF vectors (deterministic, lexical) behind a simulated API round-trip."""
+
+    def __init__(self, latency: Latency, dim: int = 512):
+        self.latency = latency
+        self.inner = HashedTfidfEmbeddings(dim=dim)
+        self.model_name = f"fake-{self.inner.model_name}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.latency.sleep()
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.latency.sleep()
+        return self.inner.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await self.latency.asleep()
+        return self.inner.embed_query(text)
+
+# --- FIREWORKS ---
+
+class FakeChatModel(BaseChatModel):
+    """Answers by echoing the prompt's context after `latency` (first token) plus `token_ms` per word."""
+
+    latency: Any = None
+    token_ms: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-fireworks"
+
+    @staticmethod
+    def _answer(messages) -> str:
+        prompt = messages[-1].content if messages else ""
+        context = prompt.split("Context Options:", 1)[-1].strip()
+        lines = [line.strip("- ").replace("**", "") for line in context.splitlines() if line.strip().startswith("- **")]
+        if lines:
+            return "Offline answer: " + "; ".join(lines[:3])
+        return f"Offline answer: {prompt.splitlines()[0][:160] if prompt else 'Hello!'}"
+
+    def _generate(self, messages, stop=None, run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs):
+        if self.latency:
+            self.latency.sleep()
+        text = self._answer(messages)
+        time.sleep(self.token_ms * len(text.split()) / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                         **kwargs):
+        chunks = [chunk async for chunk in self._astream(messages, stop, run_manager, **kwargs)]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(c.text for c in chunks)))])
+
+    async def _astream(self, messages, stop=None, run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs):
+        if self.latency:
+            await self.latency.asleep()
+        words = self._answer(messages).split(" ")
+        for i, word in enumerate(words):
+            if self.token_ms:
+                await asyncio.sleep(self.token_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+# --- MONGO ---
+
+class _IdleChangeStream:
+    """mongomock has no change streams: block like a quiet one until closed."""
+
+    def __init__(self):
+        self._closed = threading.Event()
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self) -> Iterator[dict]:
+        self._closed.wait()
+        return iter(())
+
+    def close(self):
+        self._closed.set()
+
+
+class FakeCollection:
+    """A mongomock collection with injected latency, bulk_write over the pymongo op classes, and no Atlas stages."""
+
+    ATLAS_STAGES = ("$vectorSearch", "$search", "$geoNear")
+
+    def __init__(self, collection, latency: Latency):
+        self._collection = collection
+        self.latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            self.latency.sleep()
+            return attr(*args, **kwargs)
+        return call
+
+    def bulk_write(self, requests, ordered: bool = True):
+        self.latency.sleep()
+        for op in requests:  # mongomock doesn't accept the current driver's op objects
+            if isinstance(op, UpdateMany):
+                self._collection.update_many(op._filter, op._doc, upsert=op._upsert)
+            elif isinstance(op, UpdateOne):
+                self._collection.update_one(op._filter, op._doc, upsert=op._upsert)
+            else:
+                self._collection.bulk_write([op], ordered=ordered)
+
+    def check_pipeline(self, pipeline):
+        if pipeline and next(iter(pipeline[0])) in self.ATLAS_STAGES:
+            raise OperationFailure(f"{next(iter(pipeline[0]))} is not available offline")
+
+    def aggregate(self, pipeline, **kwargs):
+        self.check_pipeline(pipeline)
+        self.latency.sleep()
+        return self._collection.aggregate(pipeline, **kwargs)
+
+    def watch(self, *args, **kwargs):
+        return _IdleChangeStream()
+
+
+class FakeAsyncCursor:
+    def __init__(self, cursor_factory, latency: Latency):
+        self._cursor = cursor_factory
+        self.latency = latency
+        self._sort = None
+        self._limit = 0
+
+    def sort(self, key, direction=None):
+        self._sort = (key, direction)
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    async def to_list(self, length=None):
+        await self.latency.asleep()
+        cursor = self._cursor()
+        if self._sort:
+            key, direction = self._sort
+            cursor = cursor.sort(key, direction) if direction is not None else cursor.sort(key)
+        if self._limit:
+            cursor = cursor.limit(self._limit)
+        return list(cursor)[:length] if length else list(cursor)
+
+    def __aiter__(self):
+        async def rows():
+            for row in await self.to_list(None):
+                yield row
+        return rows()
+
+
+class FakeAsyncCollection:
+    """The AsyncMongoClient collection API the app uses, over the same mongomock data."""
+
+    def __init__(self, collection: FakeCollection):
+        self._collection = collection
+        self.latency = collection.latency
+
+    def find(self, *args, **kwargs):
+        return FakeAsyncCursor(lambda: self._collection._collection.find(*args, **kwargs), self.latency)
+
+    async def aggregate(self, pipeline, **kwargs):
+        self._collection.check_pipeline(pipeline)
+        return FakeAsyncCursor(lambda: self._collection._collection.aggregate(pipeline, **kwargs), self.latency)
+
+    def __getattr__(self, name):
+        method = getattr(self._collection._collection, name)
+
+        async def call(*args, **kwargs):
+            await self.latency.asleep()
+            return method(*args, **kwargs)
+        return call
+
+
+class FakeDatabase:
+    def __init__(self, database, latency: Latency, asynchronous: bool = False):
+        self._database = database
+        self.latency = latency
+        self.asynchronous = asynchronous
+
+    def __getitem__(self, name):
+        collection = FakeCollection(self._database[name], self.latency)
+        return FakeAsyncCollection(collection) if self.asynchronous else collection
+
+    def __getattr__(self, name):
+        return getattr(self._database, name)
+
+
+class FakeMongoClient:
+    def __init__(self, backing, latency: Latency, asynchronous: bool = False):
+        self._client = backing
+        self.latency = latency
+        self.asynchronous = asynchronous
+
+    def __getitem__(self, name):
+        return FakeDatabase(self._client[name], self.latency, self.asynchronous)
+
+    def close(self):
+        pass
+
+
+def mongo_clients(latency: Latency):
+    """(sync, async) clients sharing one in-memory server."""
+    if mongomock is None:
+        raise ImportError("FAKE_BACKENDS=on needs `pip install mongomock`")
+    backing = mongomock.MongoClient()
+    return FakeMongoClient(backing, latency), FakeMongoClient(backing, latency, asynchronous=True)
+
+# --- SEED DATA ---
+
+CATALOGUE = {
+    "cafe": ["Blue Bottle Coffee", "Peet's Coffee", "Starbucks", "Illy Caffe", "Equator Coffees"],
+    "restaurant": ["Napa Farms Market", "Cat Cora's Kitchen", "Tomokazu", "Burger Joint", "Mustards Bar & Grill"],
+    "fast_food": ["Gott's Roadside", "Wendy's", "Sankaku", "Subway"],
+    "bar": ["Vino Volo", "Lark Creek Grill Bar", "Anchor Brewing Taproom"],
+    "lounge": ["United Club", "Centurion Lounge", "Yoga Room"],
+    "shop": ["InMotion Entertainment", "Hudson News", "Brookstone", "See's Candies"],
+    "pharmacy": ["Airport Pharmacy", "Benefit Cosmetics"],
+    "toilets": ["Restrooms"],
+}
+DESCRIPTIONS = {
+    "cafe": "Espresso, drip coffee, tea and pastries.", "restaurant": "Sit-down meals, salads and local wine.",
+    "fast_food": "Quick burgers, fries and grab-and-go food.", "bar": "Wine, craft beer and cocktails.",
+    "lounge": "Quiet seating, showers and wifi.", "shop": "Chargers, headphones, snacks and magazines.",
+    "pharmacy": "Medicine, toiletries and travel essentials.", "toilets": "Restrooms and family room.",
+}
+FLIGHTS = [("UA400", "Denver"), ("UA1", "Singapore"), ("AA100", "New York"), ("DL300", "Atlanta"),
+           ("AS200", "Seattle"), ("B6500", "Boston")]
+
+
+def seed(db, embedder, embedding_field: str = "embedding", airports=("SFO",), copies: int = 2,
+         seed_value: int = 7):
+    """Synthetic amenities (with vectors) and flights for each airport, placed inside its terminals."""
+    from seed_database import to_document  # Same document shape as the real ingestion
+    with open(REGISTRY_PATH) as f:
+        registry = {a["code"]: a for a in json.load(f)["airports"]}
+    rng = random.Random(seed_value)
+    docs = []
+    for code in airports:
+        terminals = registry.get(code, {}).get("terminals") or [{"id": "1", "polygon": [[0, 0]]}]
+        for copy in range(copies):
+            for kind, names in CATALOGUE.items():
+                for name in names:
+                    terminal = rng.choice(terminals)
+                    ring = terminal["polygon"]
+                    lat = sum(p[0] for p in ring) / len(ring) + rng.uniform(-0.0005, 0.0005)
+                    lon = sum(p[1] for p in ring) / len(ring) + rng.uniform(-0.0005, 0.0005)
+                    item = {"name": name if copy == 0 else f"{name} ({copy + 1})", "type": kind, "lat": lat,
+                            "lon": lon, "terminal_id": terminal["id"], "desc": DESCRIPTIONS[kind]}
+                    doc = to_document(item, code)
+                    doc["metadata"] = {"is_open_now": rng.random() > 0.1,
+                                       "wait_time_minutes": rng.randint(0, 25), "last_updated_ts": time.time()}
+                    docs.append(doc)
+    vectors = embedder.embed_documents([d["description_for_embedding"] for d in docs])
+    for doc, vector in zip(docs, vectors):
+        doc[embedding_field] = vector
+    db["amenities"].insert_many(docs)
+    gates = ["A", "B", "C", "D", "E", "F", "G"]
+    db["flights"].insert_many([
+        {"flight_number": number, "destination": destination, "status": rng.choice(["On Time", "Delayed"]),
+         "gate": f"{rng.choice(gates)}{rng.randint(1, 30)}", "boarding_time": time.time() + rng.randint(30, 240) * 60,
+         "airport_code": airports[0]}
+        for number, destination in FLIGHTS
+    ])
+    return len(docs)
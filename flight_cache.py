@@ -0,0 +1,246 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from telemetry import log, telemetry
+
+
+class FlightStatusCache:
+    """
+    Read-through, in-memory flight board keyed by flight_number.
+
+    - aget() serves fresh entries from memory; a miss costs one find_one, and concurrent
+      misses for the same flight share it. Unknown flights are remembered briefly too,
+      so a typo doesn't hit the database on every retry.
+    - A background thread re-pulls every recently asked-about flight in ONE query, and the
+      flights change stream (when available) pushes gate/status changes for flights already
+      on the board, so active flights stay fresh and repeat questions never wait on the database.
+    - Only flights someone asked about are held: expired entries are swept on every refresh
+      and the board never holds more than `max_entries` (least recently asked go first).
+    """
+
+    def __init__(self, ttl_seconds: float = 60.0, miss_ttl_seconds: float = 10.0, active_seconds: float = 1800.0,
+                 max_entries: int = 5000):
+        self.ttl_seconds = ttl_seconds
+        self.miss_ttl_seconds = miss_ttl_seconds
+        self.active_seconds = active_seconds  # Keep refreshing a flight this long after someone asked
+        self.max_entries = max_entries
+        # flight_number -> (doc or None, fetched_at), least recently asked first
+        self._entries: "OrderedDict[str, Tuple[Optional[dict], float]]" = OrderedDict()
+        self._asked: "OrderedDict[str, float]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.updates = 0
+        self.evictions = 0
+        self.stream_errors = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- READS ---
+
+    def get(self, flight_number: str) -> Tuple[bool, Optional[dict]]:
+        """(hit, doc) from memory only; a fresh 'not found' is a hit with doc None."""
+        entry = self._entries.get(flight_number)
+        if entry is None:
+            return False, None
+        doc, fetched_at = entry
+        if self._expired(doc, fetched_at, time.time()):
+            return False, None
+        return True, doc
+
+    def _expired(self, doc: Optional[dict], fetched_at: float, now: float) -> bool:
+        return now - fetched_at > (self.ttl_seconds if doc is not None else self.miss_ttl_seconds)
+
+    def _touch(self, flight_number: str):
+        with self._lock:
+            self._asked[flight_number] = time.time()
+            self._asked.move_to_end(flight_number)
+            if flight_number in self._entries:
+                self._entries.move_to_end(flight_number)
+            while len(self._asked) > self.max_entries:
+                self._asked.popitem(last=False)
+
+    async def aget(self, flight_number: str, acollection) -> Optional[dict]:
+        self._touch(flight_number)
+        hit, doc = self.get(flight_number)
+        if hit:
+            self.hits += 1
+            return doc
+        pending = self._pending.get(flight_number)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Its owner was cancelled (e.g. an unused prefetch): look it up ourselves
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[flight_number] = future
+        try:
+            with telemetry.span("mongo.find_one", collection="flights"):
+                doc = await acollection.find_one({"flight_number": flight_number})
+            self.put(flight_number, doc)
+            future.set_result(doc)
+            return doc
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Mark retrieved: waiters (if any) re-raise it themselves
+            raise
+        finally:
+            self._pending.pop(flight_number, None)
+
+    # --- WRITES ---
+
+    def put(self, flight_number: str, doc: Optional[dict], fetched_at: Optional[float] = None):
+        with self._lock:
+            self._entries[flight_number] = (doc, fetched_at or time.time())
+            self._entries.move_to_end(flight_number)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def sweep(self) -> int:
+        """Drops entries past their TTL (flights nobody asks about any more stop being refreshed)."""
+        now = time.time()
+        with self._lock:
+            expired = [number for number, (doc, fetched_at) in self._entries.items()
+                       if self._expired(doc, fetched_at, now)]
+            for number in expired:
+                del self._entries[number]
+        self.evictions += len(expired)
+        return len(expired)
+
+    def invalidate(self, flight_number: str):
+        with self._lock:
+            self._entries.pop(flight_number, None)
+
+    def active_flights(self) -> list:
+        cutoff = time.time() - self.active_seconds
+        with self._lock:
+            while self._asked and next(iter(self._asked.values())) < cutoff:  # Oldest ask first
+                self._asked.popitem(last=False)
+            return list(self._asked)
+
+    def refresh(self, collection) -> int:
+        """One query for every active flight; those that vanished become 'not found'. Then sweeps the rest."""
+        numbers, docs = self.active_flights(), {}
+        if numbers:
+            fetched_at = time.time()
+            docs = {doc["flight_number"]: doc for doc in collection.find({"flight_number": {"$in": numbers}})}
+            with self._lock:
+                for number in numbers:
+                    if number in self._entries:
+                        self._entries[number] = (docs.get(number), fetched_at)
+            self.refreshes += 1
+        self.sweep()
+        return len(docs)
+
+    # --- BACKGROUND ---
+
+    @staticmethod
+    def ensure_index(collection):
+        collection.create_index("flight_number")
+
+    def start(self, collection, refresh_seconds: float = 20.0, watch: bool = True, retry_seconds: float = 5.0):
+        """Periodic bulk refresh (and the change stream, if asked) on daemon threads."""
+
+        def refresh_loop():
+            while not self._stop.wait(refresh_seconds):
+                try:
+                    self.refresh(collection)
+                except Exception as e:
+                    log.warning("⚠️ Flight refresh failed", extra={"error": str(e)})
+
+        self._spawn(refresh_loop, "flight-refresh")
+        if watch:
+            self._spawn(lambda: self._watch(collection, retry_seconds), "flight-watch")
+
+    def _spawn(self, target, name: str):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _watch(self, collection, retry_seconds: float = 5.0, max_retry_seconds: float = 300.0):
+        """
+        Follows the flights change stream until stop(). After an error it reopens from the last
+        resume token, backing off exponentially while it keeps failing. If it can't resume (no
+        token yet, or the token fell out of the oplog) it opens a fresh stream and re-pulls the
+        board once, so nothing changed during the gap is missed.
+        """
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        resume_token, delay, resync = None, retry_seconds, False
+        while not self._stop.is_set():
+            stream = None
+            try:
+                if resume_token is not None:
+                    stream = collection.watch(pipeline, full_document="updateLookup", resume_after=resume_token)
+                else:
+                    stream = collection.watch(pipeline, full_document="updateLookup")
+                with stream:
+                    if resync and resume_token is None:
+                        self.refresh(collection)  # Stream first, then the bulk read: nothing falls in between
+                    resync = False
+                    for change in stream:
+                        self._apply_change(change)
+                        resume_token = stream.resume_token
+                        delay = retry_seconds  # Healthy again
+                        if self._stop.is_set():
+                            return
+            except Exception as e:
+                if stream is None:
+                    resume_token = None  # Couldn't reopen from the token: next attempt re-syncs
+                resync = True
+                self.stream_errors += 1
+                # The periodic refresh keeps things fresh meanwhile; no need to be loud about it.
+                log.info("⚠️ Flight change stream interrupted, reconnecting",
+                         extra={"error": str(e), "retry_seconds": delay, "resuming": resume_token is not None})
+                if self._stop.wait(delay):
+                    return
+                delay = min(delay * 2, max_retry_seconds)
+
+    def _apply_change(self, change: dict):
+        """Refreshes flights already on the board; the rest of the collection is none of our business."""
+        doc = change.get("fullDocument")
+        if doc and doc.get("flight_number"):
+            with self._lock:
+                if doc["flight_number"] not in self._entries:
+                    return
+                self._entries[doc["flight_number"]] = (doc, time.time())
+            self.updates += 1
+        elif change["operationType"] == "delete":
+            # Deletes only carry _id: drop whichever entry held that document
+            doc_id = change["documentKey"]["_id"]
+            with self._lock:
+                for number, (cached, _) in list(self._entries.items()):
+                    if cached is not None and cached.get("_id") == doc_id:
+                        self._entries.pop(number, None)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "flights": len(self._entries),
+            "active": len(self._asked),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+            "refreshes": self.refreshes,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "stream_errors": self.stream_errors,
+        }
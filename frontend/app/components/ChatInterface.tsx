@@ -25,6 +25,7 @@ export default function ChatInterface({ onTriggerPayment }: ChatProps) {
   ]);
   const [input, setInput] = useState("");
   const [isLoading, setIsLoading] = useState(false);
+  const [status, setStatus] = useState("Processing Request...");
   const messagesEndRef = useRef<HTMLDivElement>(null);
 
   // Auto-scroll to bottom
@@ -44,22 +45,76 @@ export default function ChatInterface({ onTriggerPayment }: ChatProps) {
     setMessages((prev) => [...prev, userMsg]);
     setInput("");
     setIsLoading(true);
+    setStatus("Processing Request...");
+
+    const agentTimestamp = new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
+    let agentStarted = false;
+
+    // Create the agent bubble on first output, then keep rewriting it as tokens arrive
+    const renderAgent = (content: string) => {
+      if (!agentStarted) {
+        agentStarted = true;
+        setMessages((prev) => [...prev, { role: "agent", content, timestamp: agentTimestamp }]);
+      } else {
+        setMessages((prev) => [...prev.slice(0, -1), { ...prev[prev.length - 1], content }]);
+      }
+    };
 
     try {
-      // Connect to Real Backend
-      const res = await fetch("http://localhost:8000/chat", {
+      // Connect to Real Backend (Server-Sent Events: progress first, then LLM tokens)
+      const res = await fetch("http://localhost:8000/chat/stream", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
         body: JSON.stringify({
           message: userMsg.content,
           user_location: "Terminal 2", // Hardcoded for demo
           airport_code: "SFO"
         }),
       });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let streamed = "";
+      let aiResponse = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // SSE frames are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+          const frame = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          const event = frame.match(/^event: (.*)$/m)?.[1] ?? "message";
+          const dataLine = frame.match(/^data: (.*)$/m)?.[1];
+          if (!dataLine) continue;
+          const data = JSON.parse(dataLine);
+
+          if (event === "route") {
+            setStatus(`Routing to ${data.next_step}...`);
+          } else if (event === "retrieval") {
+            setStatus(`Found ${data.results.length} options. Thinking...`);
+          } else if (event === "flight") {
+            setStatus(`Flight ${data.flight.flight_number} located. Thinking...`);
+          } else if (event === "itinerary") {
+            setStatus(`Planned ${data.stops.length} stops. Writing it up...`);
+          } else if (event === "token") {
+            streamed += data.content;
+            renderAgent(streamed);
+          } else if (event === "done") {
+            aiResponse = data.response;
+          } else if (event === "error") {
+            throw new Error(data.detail);
+          }
+        }
+      }
 
-      const data = await res.json();
-
-      let aiResponse = data.response || "System Error: No response received.";
+      aiResponse = aiResponse || streamed || "System Error: No response received.";
 
       // Auto-Trigger Logic
       if (aiResponse.includes("[PAYMENT_REQUIRED]")) {
@@ -69,13 +124,7 @@ export default function ChatInterface({ onTriggerPayment }: ChatProps) {
         }
       }
 
-      const agentMsg: Message = {
-        role: "agent",
-        content: aiResponse,
-        timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
-      };
-
-      setMessages((prev) => [...prev, agentMsg]);
+      renderAgent(aiResponse);
     } catch (error) {
       console.error(error);
       setMessages((prev) => [
@@ -143,7 +192,7 @@ export default function ChatInterface({ onTriggerPayment }: ChatProps) {
             <motion.div initial={{ opacity: 0 }} animate={{ opacity: 1 }} className="flex justify-start">
               <div className="bg-zinc-800/80 border border-zinc-700 p-3 rounded-lg flex items-center gap-2">
                 <Loader2 className="w-4 h-4 text-emerald-500 animate-spin" />
-                <span className="text-zinc-400 text-xs">Processing Request...</span>
+                <span className="text-zinc-400 text-xs">{status}</span>
               </div>
             </motion.div>
           )}
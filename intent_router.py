@@ -0,0 +1,155 @@
+import json
+import re
+from itertools import filterfalse
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from telemetry import log
+
+
+class RouteDecision(NamedTuple):
+    intent: str                   # next_step for the graph: "scout", "flight_tracker", "bursar", ...
+    confidence: float
+    airport_code: Optional[str]   # Airport the user switched to, if mentioned
+    flight_code: Optional[str]    # e.g. "UA400"
+    signals: List[str]            # What fired, for debugging ("kw:flight", "code:UA400", ...)
+
+
+def load_intent_table(path: str = "intents.json") -> dict:
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def load_airport_codes(collection, table_airports: Iterable[str] = ()) -> List[str]:
+    """Airports in the data plus the table's list (a code can be supported before it is seeded)."""
+    codes = {c.upper() for c in table_airports}
+    try:
+        codes.update(c.upper() for c in collection.distinct("airport_code") if c)
+    except Exception as e:
+        log.warning("⚠️ Could not load airport codes from DB, using intent table airports only", extra={"error": str(e)})
+    return sorted(codes)
+
+
+# One bytes.translate turns ASCII punctuation into whitespace, so "ua400?" and "i'm" split like
+# any other word (non-ASCII bytes pass through untouched)
+SEPARATORS = bytes(c if c >= 128 or chr(c).isalnum() else 32 for c in range(256))
+TERM, AIRPORT = object(), object()  # Vocabulary markers: compound-rule term, airport code
+INFLECTIONS = ("s", "es", "ed", "d", "ing")  # "flights", "booking", "hours", "purchased"...
+
+
+def _percent(weight: float) -> int:
+    return round(weight * 100)  # Integer arithmetic: 0.80 + 0.05 stays 0.85
+
+
+def _inflections(word: str) -> List[str]:
+    forms = [word] + [word + suffix for suffix in INFLECTIONS]
+    if word.endswith("e"):
+        forms.append(word[:-1] + "ing")  # "reserving", "purchasing"
+    return forms
+
+
+class IntentRouter:
+    """
+    Classifies a message with one translate + split() and a set intersection against a
+    precomputed vocabulary, so the per-word work stays in C and the cost doesn't grow with the
+    number of keywords.
+
+    Keywords and compound-rule terms match whole words plus their common inflections
+    ("flights", "booking", "hours"), airport codes whole words only (so "garden" doesn't read
+    as DEN), multi-word keywords ("kill time") as phrases. Flight codes are whole words too, so
+    "TO1234" is a code and never the word "to". Each distinct word counts once.
+    """
+
+    def __init__(self, table: dict, airports: Iterable[str]):
+        self.default_intent = table.get("default_intent", "scout")
+        self.default_confidence = table.get("default_confidence", 0.5)
+        self.priority = table.get("priority", [])
+        self.airports = [a.upper() for a in airports]
+
+        # word form -> (intent, weight in percent, signal); compound-rule terms and airports carry a marker
+        # instead of an intent, so every single-word signal is found in one pass over the words
+        self._vocabulary: Dict[str, tuple] = {}
+        self._phrases = []         # ("kill time", (intent, weight, signal))
+        self._compound_rules = []  # (frozenset of terms, (intent, weight, signal))
+
+        for intent, spec in table.get("intents", {}).items():
+            for keyword, weight in spec.get("keywords", {}).items():
+                keyword = keyword.lower()
+                hit = (intent, _percent(weight), f"kw:{keyword}")
+                if " " in keyword:
+                    self._phrases.append((keyword, hit))
+                    continue
+                for form in _inflections(keyword):
+                    self._vocabulary[form] = hit
+            for rule in spec.get("all_of", []):
+                terms = frozenset(t.lower() for t in rule["terms"])
+                self._compound_rules.append((terms, (intent, _percent(rule["weight"]), "all_of:" + "+".join(sorted(terms)))))
+                for term in terms:
+                    for form in _inflections(term):
+                        self._vocabulary.setdefault(form, (TERM, 0.0, term))
+
+        for code in self.airports:
+            self._vocabulary[code.lower()] = (AIRPORT, 0.0, code)
+
+        self._default = RouteDecision(self.default_intent, self.default_confidence, None, None, [])
+        flight_code = table.get("flight_code")
+        self._flight_code = None
+        if flight_code:
+            self._flight_code = (re.compile(flight_code["pattern"]), flight_code["intent"], _percent(flight_code["weight"]))
+
+    @classmethod
+    def from_file(cls, path: str, collection=None) -> "IntentRouter":
+        table = load_intent_table(path)
+        airports = table.get("airports", [])
+        if collection is not None:
+            airports = load_airport_codes(collection, airports)
+        return cls(table, airports)
+
+    def classify(self, message: str) -> RouteDecision:
+        text = message.lower().encode().translate(SEPARATORS).decode()
+        words = text.split()
+        # Each distinct word counts once; a set intersection keeps the per-word work in C
+        vocabulary = self._vocabulary
+        hits = list(map(vocabulary.__getitem__, vocabulary.keys() & words))  # (intent, weight, signal)
+        for phrase, hit in self._phrases:
+            if phrase in text:
+                hits.append(hit)
+        flight_code = None
+        if self._flight_code is not None and not text.replace(" ", "").isalpha():
+            pattern, intent, weight = self._flight_code
+            # Whole words with a digit in them: "to1234" is a code, never the word "to"
+            code = next(filter(pattern.fullmatch, filterfalse(str.isalpha, words)), None)
+            if code is not None:
+                flight_code = code.upper()
+                hits.append((intent, weight, "code:" + flight_code))
+        if not hits:
+            return self._default  # Most messages: nothing to score
+
+        scores: Dict[str, List[float]] = {}
+        signals = []
+        terms = set()
+        airport = None
+        for intent, weight, signal in hits:
+            if intent is TERM:
+                terms.add(signal)
+                continue
+            if intent is AIRPORT:
+                if airport is None or words.index(signal.lower()) < words.index(airport.lower()):
+                    airport = signal  # Two airports: the one mentioned first
+                signal = "airport:" + signal
+            else:
+                scores.setdefault(intent, []).append(weight)
+            signals.append(signal)
+        if terms:
+            for required, (intent, weight, signal) in self._compound_rules:
+                if required <= terms:
+                    scores.setdefault(intent, []).append(weight)
+                    signals.append(signal)
+
+        for intent in self.priority:
+            if intent in scores:
+                weights = scores[intent]
+                # Strongest signal sets the base; each corroborating signal adds a little.
+                confidence = min(99, max(weights) + 5 * (len(weights) - 1)) if len(weights) > 1 else weights[0]
+                return RouteDecision(intent, confidence / 100, airport, flight_code, signals)
+
+        return RouteDecision(self.default_intent, self.default_confidence, airport, flight_code, signals)
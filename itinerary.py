@@ -0,0 +1,149 @@
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+# Minutes spent at a stop beyond the queue, by OSM amenity/shop type.
+DWELL_MINUTES = {
+    "cafe": 15, "fast_food": 15, "restaurant": 35, "bar": 30, "pub": 30, "lounge": 45,
+    "toilets": 5, "pharmacy": 10, "atm": 3, "bank": 5, "charging_station": 20,
+}
+DEFAULT_DWELL = 15
+SHOP_DWELL = 10
+
+
+class Stop(NamedTuple):
+    id: object
+    name: str
+    value: float           # How much the traveller wants this stop (retrieval relevance)
+    dwell_minutes: float   # Time there, including the current queue
+    terminal_id: Optional[str] = None
+
+
+class Itinerary(NamedTuple):
+    stops: List[Stop]
+    legs: List[float]      # Walking minutes: start -> stop 1 -> ... -> stop n -> end
+    total_minutes: float
+    value: float
+    optimal: bool          # False if the latency budget ran out before the search finished
+    explored: int
+
+
+def dwell_for(amenity_type: Optional[str], wait_minutes: float = 0) -> float:
+    base = DWELL_MINUTES.get((amenity_type or "").lower())
+    if base is None:
+        base = SHOP_DWELL if amenity_type else DEFAULT_DWELL
+    return base + (wait_minutes or 0)
+
+
+def travel_matrix(graph, start: str, end: str, amenity_ids: list) -> np.ndarray:
+    """
+    (m + 2) x (m + 2) walking minutes: rows/cols 0..m-1 are amenities, m is start, m+1 is end.
+    Built from WalkingGraph tables with array lookups only (amenity = anchor node + access walk).
+    """
+    rows = [graph.amenity_row[a] for a in amenity_ids]
+    anchors = np.append(graph.amenity_anchor[rows], [graph.index[start], graph.index[end]]).astype(np.int64)
+    access = np.append(graph.amenity_access[rows], [0.0, 0.0]).astype(np.float64)
+    times = graph.dist[np.ix_(anchors, anchors)].astype(np.float64) + access[:, None] + access[None, :]
+    np.fill_diagonal(times, 0.0)
+    return times
+
+
+def _legs(times, order: List[int], start: int, end: int) -> List[float]:
+    points = [start] + order + [end]
+    return [float(times[a][b]) for a, b in zip(points, points[1:])]
+
+
+def solve(times, values, dwell, budget: float, deadline_ms: float = 50.0, max_stops: Optional[int] = None):
+    """
+    Orienteering: pick and order stops to maximise total value such that walking + dwell
+    from start (index m) through the stops to end (index m+1) fits in `budget` minutes.
+
+    Depth-first branch and bound, seeded with a greedy tour so there is always an answer:
+    - bound: current value + every remaining stop that is still individually reachable;
+    - memo: reaching the same (last stop, visited set) later than before is dominated,
+      since the collected value is identical and there is less time left.
+    Anytime: stops at `deadline_ms` and returns the best tour so far (optimal=False).
+    Returns (order, value, optimal, explored).
+    """
+    m = len(values)
+    start, end = m, m + 1
+    times = [list(map(float, row)) for row in times]
+    values = [float(v) for v in values]
+    dwell = [float(d) for d in dwell]
+    max_stops = max_stops or m
+    deadline = time.perf_counter() + deadline_ms / 1000.0
+
+    # Greedy incumbent: best value per minute (travel + dwell) that still leaves time to reach `end`
+    order, elapsed, last = [], 0.0, start
+    while len(order) < max_stops:
+        best_j, best_ratio = None, 0.0
+        for j in range(m):
+            if j in order:
+                continue
+            cost = times[last][j] + dwell[j]
+            if elapsed + cost + times[j][end] <= budget and values[j] / max(cost, 1e-6) > best_ratio:
+                best_j, best_ratio = j, values[j] / max(cost, 1e-6)
+        if best_j is None:
+            break
+        elapsed += times[last][best_j] + dwell[best_j]
+        order.append(best_j)
+        last = best_j
+    best = {"order": order, "value": sum(values[j] for j in order)}
+
+    memo: Dict[tuple, float] = {}
+    explored = 0
+    timed_out = False
+
+    def dfs(last: int, mask: int, path: List[int], elapsed: float, value: float):
+        nonlocal explored, timed_out
+        explored += 1
+        if explored & 255 == 0 and time.perf_counter() > deadline:
+            timed_out = True
+        if timed_out:
+            return
+        if value > best["value"]:
+            best["order"], best["value"] = list(path), value
+        if len(path) >= max_stops:
+            return
+
+        remaining = budget - elapsed
+        feasible = [
+            j for j in range(m)
+            if not mask >> j & 1 and times[last][j] + dwell[j] + times[j][end] <= remaining
+        ]
+        if value + sum(values[j] for j in feasible) <= best["value"] + 1e-9:
+            return
+        # Most promising first, so good tours (and tight bounds) show up early
+        feasible.sort(key=lambda j: -values[j] / max(times[last][j] + dwell[j], 1e-6))
+        for j in feasible:
+            arrive = elapsed + times[last][j] + dwell[j]
+            key = (j, mask | 1 << j)
+            if memo.get(key, float("inf")) <= arrive:
+                continue
+            memo[key] = arrive
+            path.append(j)
+            dfs(j, mask | 1 << j, path, arrive, value + values[j])
+            path.pop()
+            if timed_out:
+                return
+
+    dfs(start, 0, [], 0.0, 0.0)
+    return best["order"], best["value"], not timed_out, explored
+
+
+def plan_itinerary(graph, start: str, end: str, stops: List[Stop], budget_minutes: float,
+                   deadline_ms: float = 50.0, max_stops: Optional[int] = None) -> Optional[Itinerary]:
+    """Best sequence of `stops` from `start` that still reaches `end` (the gate) within the budget."""
+    stops = [s for s in stops if s.id in graph.amenity_row]
+    direct = graph.minutes(start, end)
+    if not np.isfinite(direct) or direct > budget_minutes:
+        return None
+    times = travel_matrix(graph, start, end, [s.id for s in stops])
+    order, value, optimal, explored = solve(
+        times, [s.value for s in stops], [s.dwell_minutes for s in stops], budget_minutes, deadline_ms, max_stops
+    )
+    m = len(stops)
+    legs = _legs(times, order, m, m + 1)
+    total = sum(legs) + sum(stops[j].dwell_minutes for j in order)
+    return Itinerary([stops[j] for j in order], legs, round(total, 1), value, optimal, explored)
@@ -0,0 +1,226 @@
+import asyncio
+import contextvars
+import hashlib
+import time
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+from telemetry import log, telemetry
+
+
+def prompt_key(messages) -> str:
+    """Stable key for a prompt: role + content of every message (or the raw string)."""
+    if isinstance(messages, str):
+        parts = [("human", messages)]
+    else:
+        parts = [(getattr(m, "type", "human"), getattr(m, "content", str(m))) for m in messages]
+    digest = hashlib.sha1()
+    for role, content in parts:
+        digest.update(f"{role}\x00{content}\x01".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TokenBucket:
+    """`rate` calls per second with bursts up to `capacity`; acquire() waits for a token (or gives up)."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, max_wait: float) -> bool:
+        deadline = time.monotonic() + max_wait
+        while not self.try_acquire():
+            wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+
+class _NodeStats:
+    __slots__ = ("calls", "llm_calls", "cache_hits", "coalesced", "hedges", "hedge_wins", "fallbacks",
+                 "errors", "shed", "latencies", "llm_latencies")
+
+    def __init__(self):
+        self.calls = self.llm_calls = self.cache_hits = self.coalesced = 0
+        self.hedges = self.hedge_wins = self.fallbacks = self.errors = self.shed = 0
+        self.latencies = deque(maxlen=512)  # ms, end to end as the node saw it
+        self.llm_latencies = deque(maxlen=512)  # ms, only calls answered by the LLM itself
+
+    def snapshot(self) -> dict:
+        out = {k: getattr(self, k) for k in self.__slots__ if k not in ("latencies", "llm_latencies")}
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            out["p50_ms"] = round(ordered[len(ordered) // 2], 1)
+            out["p95_ms"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1)
+        return out
+
+
+class LLMGateway:
+    """
+    Every LLM call in the graph goes through here:
+    - exact-match cache for prompts marked `cacheable` (deterministic asks like the concierge greeting);
+    - single-flight: identical prompts already in flight share one upstream call;
+    - token bucket (rate) + semaphore (concurrency) so a burst can't stampede Fireworks;
+    - hedging: if the call is still running after `hedge_after_ms`, fire a second one and take the first answer;
+    - latency budget: past `budget_ms` (or on error / no LLM) the caller's fallback text (rendering.py) is returned.
+    Only the primary call streams tokens; hedges run outside the graph's callback context.
+    """
+
+    def __init__(self, llm, max_concurrency: int = 8, rate_per_second: float = 10.0, burst: int = 20,
+                 cache_size: int = 512, cache_ttl: float = 3600.0, hedge_after_ms: Optional[float] = 1500.0,
+                 budget_ms: float = 5000.0):
+        self.llm = llm
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.hedge_after_ms = hedge_after_ms
+        self.budget_ms = budget_ms
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats: Dict[str, _NodeStats] = {}
+
+    def stats(self) -> dict:
+        return {node: s.snapshot() for node, s in self._stats.items()}
+
+    def p50_ms(self, node: str) -> Optional[float]:
+        """Recent median latency of real LLM answers for `node` (None until there are some)."""
+        stats = self._stats.get(node)
+        if stats is None or not stats.llm_latencies:
+            return None
+        ordered = sorted(stats.llm_latencies)
+        return ordered[len(ordered) // 2]
+
+    def _node(self, node: str) -> _NodeStats:
+        stats = self._stats.get(node)
+        if stats is None:
+            stats = self._stats[node] = _NodeStats()
+        return stats
+
+    # --- CACHE ---
+
+    def _cached(self, key: str) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        text, created_at = entry
+        if time.time() - created_at > self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return text
+
+    def _remember(self, key: str, text: str):
+        self._cache[key] = (text, time.time())
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # --- CALLS ---
+
+    async def _call(self, messages, stats: _NodeStats, node: str) -> str:
+        async with self._semaphore:
+            stats.llm_calls += 1
+            with telemetry.span("llm.invoke", node=node):
+                return (await self.llm.ainvoke(messages)).content
+
+    async def _hedged(self, messages, stats: _NodeStats, node: str) -> str:
+        primary = asyncio.ensure_future(self._call(messages, stats, node))
+        if self.hedge_after_ms is None:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_after_ms / 1000)
+        if done or not self.bucket.try_acquire():
+            return await primary
+        stats.hedges += 1
+        # Empty context: the hedge must not stream its tokens into the user's response
+        hedge = asyncio.get_running_loop().create_task(self._call(messages, stats, node), context=contextvars.Context())
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            stats.hedge_wins += 1
+                        return task.result()
+            return primary.result()  # Both failed: surface the primary's error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def ainvoke(self, messages, node: str = "default", fallback: Optional[str] = None,
+                      cacheable: bool = False, budget_ms: Optional[float] = None) -> str:
+        """LLM text for `messages`, or `fallback` if the LLM can't answer within budget (raises if no fallback)."""
+        stats = self._node(node)
+        stats.calls += 1
+        start = time.perf_counter()
+        budget = (self.budget_ms if budget_ms is None else budget_ms) / 1000  # 0 is a budget too
+        key = prompt_key(messages)
+        try:
+            if self.llm is None:
+                raise RuntimeError("No LLM configured")
+            if cacheable:
+                cached = self._cached(key)
+                if cached is not None:
+                    stats.cache_hits += 1
+                    return cached
+
+            leader = self._inflight.get(key)
+            while leader is not None:
+                stats.coalesced += 1
+                try:
+                    return await asyncio.wait_for(asyncio.shield(leader), budget - (time.perf_counter() - start))
+                except asyncio.CancelledError:
+                    if not leader.cancelled():
+                        raise
+                    # Its caller was cancelled (client went away): follow whoever took over, or call ourselves
+                    leader = self._inflight.get(key)
+
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            try:
+                if not await self.bucket.acquire(max_wait=budget / 2):
+                    stats.shed += 1
+                    raise RuntimeError("LLM rate limit: shedding load")
+                text = await asyncio.wait_for(self._hedged(messages, stats, node), budget - (time.perf_counter() - start))
+                stats.llm_latencies.append((time.perf_counter() - start) * 1000)
+                future.set_result(text)
+                if cacheable:
+                    self._remember(key, text)
+                return text
+            except BaseException as e:
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    future.exception()  # Followers re-raise it; don't log it as unretrieved
+                raise
+            finally:
+                self._inflight.pop(key, None)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if fallback is None:
+                raise
+            stats.fallbacks += 1
+            if self.llm is not None:
+                stats.errors += 1
+                log.warning("❌ LLM error, using fallback", extra={"node": node, "error": str(e) or type(e).__name__})
+            return fallback
+        finally:
+            stats.latencies.append((time.perf_counter() - start) * 1000)
@@ -0,0 +1,64 @@
+import argparse
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+URL = "http://localhost:8000/chat"
+
+QUERIES = [
+    "Where is the nearest coffee?",
+    "Where are the restrooms?",
+    "Any quiet lounge in Terminal 3?",
+    "Status of flight UA400",
+    "I want something healthy to eat",
+]
+
+
+def send_one(i):
+    payload = {
+        "message": QUERIES[i % len(QUERIES)],
+        "thread_id": f"load_{uuid.uuid4().hex[:8]}",  # Independent threads: no checkpoint contention
+        "user_location": "Terminal 2",
+        "airport_code": "SFO"
+    }
+    start = time.perf_counter()
+    try:
+        ok = requests.post(URL, json=payload, timeout=60).status_code == 200
+    except Exception:
+        ok = False
+    return ok, time.perf_counter() - start
+
+
+def run_level(concurrency, total):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send_one, range(total)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(d for ok, d in results if ok)
+    errors = sum(1 for ok, _ in results if not ok)
+    if not latencies:
+        print(f"   c={concurrency:<4} all {total} requests failed")
+        return
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"   c={concurrency:<4} {len(latencies) / wall:7.2f} req/s | "
+        f"p50 {statistics.median(latencies) * 1000:7.0f}ms | p95 {p95 * 1000:7.0f}ms | errors {errors}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of /chat at increasing client concurrency.")
+    parser.add_argument("--url", default=URL)
+    parser.add_argument("--levels", default="1,8,32,64,128", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=4, help="Requests per client at each level")
+    args = parser.parse_args()
+    URL = args.url
+
+    print(f"🚦 Load testing {URL}")
+    # Throughput that keeps climbing past the default threadpool size (40) is the async path paying off.
+    for level in [int(x) for x in args.levels.split(",")]:
+        run_level(level, level * args.requests)
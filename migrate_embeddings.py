@@ -0,0 +1,119 @@
+import os
+import time
+import argparse
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from embedding_providers import PROVIDERS, HashedTfidfEmbeddings, build_embeddings, embedding_hash
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+VOYAGE_API_KEY = os.getenv("VOYAGE_API_KEY")
+DB_NAME = "layover_os"
+COLLECTION_NAME = "amenities"
+TEXT_FIELD = "description_for_embedding"
+
+# Re-embeds amenities with another provider into a parallel field (embedding_local, embedding_st...),
+# leaving the live `embedding` field alone. Each vector is stored with <field>_hash, a hash of the
+# model and the text it was computed from (seed_database.py writes embedding_hash the same way), so
+# a rerun, a crashed run or a re-seed that edited descriptions only embeds what is actually stale.
+
+
+def iter_pending(collection, field: str, model_name: str, airport=None, batch_size=256):
+    """
+    Batches of {_id, text} whose <field>_hash doesn't match this model and their current text,
+    in _id order (keyset paging). The hash is compared here, not in the query: the filter
+    would need $expr over a computed value.
+    """
+    query = {TEXT_FIELD: {"$exists": True}}
+    if airport:
+        query["airport_code"] = airport
+    projection = {TEXT_FIELD: 1, f"{field}_hash": 1}
+    pending = []
+    last_id = None
+    while True:
+        page_query = dict(query, _id={"$gt": last_id}) if last_id is not None else query
+        page = list(collection.find(page_query, projection).sort("_id", 1).limit(batch_size))
+        if not page:
+            break
+        last_id = page[-1]["_id"]
+        pending.extend(doc for doc in page if doc.get(f"{field}_hash") != embedding_hash(model_name, doc[TEXT_FIELD]))
+        while len(pending) >= batch_size:
+            yield pending[:batch_size]
+            pending = pending[batch_size:]
+    if pending:
+        yield pending
+
+
+def fit_idf(collection, embedder: HashedTfidfEmbeddings, path: str, airport=None):
+    query = {TEXT_FIELD: {"$exists": True}}
+    if airport:
+        query["airport_code"] = airport
+    texts = (doc[TEXT_FIELD] for doc in collection.find(query, {TEXT_FIELD: 1}))
+    embedder.fit(texts).save_idf(path)
+    print(f"📐 Fitted idf over the corpus -> {path} ({embedder.model_name})")
+
+
+def migrate(collection, provider: str, field=None, model=None, airport=None, batch_size=256,
+            dim=512, idf_path="embedding_idf.json", refit=False):
+    field = field or PROVIDERS[provider]["field"]
+    if field == PROVIDERS["voyage"]["field"] and provider != "voyage":
+        raise ValueError(f"Refusing to overwrite the live '{field}' field with {provider} vectors")
+    embedder, model_name = build_embeddings(provider, model=model, api_key=VOYAGE_API_KEY, dim=dim,
+                                            idf_path=idf_path, batch_size=batch_size)
+    if isinstance(embedder, HashedTfidfEmbeddings) and (refit or not os.path.exists(idf_path)):
+        fit_idf(collection, embedder, idf_path, airport)
+        model_name = embedder.model_name  # New idf, new vectors: every doc gets redone
+
+    print(f"🧠 {provider} ({model_name}) -> '{field}'")
+    written = 0
+    start = time.time()
+    for batch in iter_pending(collection, field, model_name, airport, batch_size):
+        vectors = embedder.embed_documents([doc[TEXT_FIELD] for doc in batch])
+        collection.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {field: vector, f"{field}_model": model_name,
+                                                     f"{field}_hash": embedding_hash(model_name, doc[TEXT_FIELD])}})
+            for doc, vector in zip(batch, vectors)
+        ], ordered=False)
+        written += len(batch)
+        print(f"   📦 {written} re-embedded ({written / max(time.time() - start, 1e-9):.0f} docs/s)")
+    dims = len(embedder.embed_query("dimension probe"))
+    print(f"✅ {written} documents migrated in {time.time() - start:.1f}s.")
+    return field, model_name, dims
+
+
+def print_index_definition(field: str, dims: int, index_name: str):
+    print(f"\n⚠️  For RETRIEVAL_BACKEND=atlas, create Atlas Search index '{index_name}' (JSON Editor):")
+    print("-" * 50)
+    print(f"""
+{{
+  "fields": [
+    {{"type": "vector", "path": "{field}", "numDimensions": {dims}, "similarity": "cosine"}},
+    {{"type": "filter", "path": "airport_code"}},
+    {{"type": "filter", "path": "terminal_id"}}
+  ]
+}}
+    """)
+    print("-" * 50)
+    print("The default local retriever reads the field directly; no index needed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed amenities into a parallel field with another provider.")
+    parser.add_argument("--provider", default="hashed", choices=list(PROVIDERS))
+    parser.add_argument("--field", help="Target field (default: the provider's, e.g. embedding_local)")
+    parser.add_argument("--model", help="Model name for voyage / sentence-transformers")
+    parser.add_argument("--airport", help="Only this airport_code")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--dim", type=int, default=int(os.getenv("EMBEDDING_DIM", "512")), help="hashed only")
+    parser.add_argument("--idf-path", default=os.getenv("EMBEDDING_IDF_PATH", "embedding_idf.json"), help="hashed only")
+    parser.add_argument("--refit", action="store_true", help="hashed: refit the idf (re-embeds everything)")
+    args = parser.parse_args()
+
+    if not MONGO_URI:
+        print("❌ Error: MONGO_URI not found in .env")
+        raise SystemExit(1)
+    amenities = MongoClient(MONGO_URI, tlsAllowInvalidCertificates=True)[DB_NAME][COLLECTION_NAME]
+    target, _, dimensions = migrate(amenities, args.provider, args.field, args.model, args.airport,
+                                    args.batch_size, args.dim, args.idf_path, args.refit)
+    print_index_definition(target, dimensions, PROVIDERS[args.provider]["index"])
@@ -0,0 +1,103 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class Prefetch:
+    """
+    Speculative work for one in-flight request.
+    Tasks start as soon as the message arrives; nodes `take()` what they need and
+    whatever the router didn't pick gets cancelled. Every stage is timed (ms).
+    """
+
+    def __init__(self, message: str):
+        self.message = message
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.keys: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+        self.started_at = time.perf_counter()
+
+    def launch(self, name: str, coro, key: Any = None):
+        self.tasks[name] = asyncio.create_task(self._timed(name, coro))
+        self.keys[name] = key
+
+    def has(self, name: str, key: Any = None) -> bool:
+        """True if `name` was prefetched for exactly this key (e.g. the same flight number)."""
+        return name in self.tasks and self.keys.get(name) == key
+
+    async def _timed(self, name: str, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    async def take(self, name: str):
+        """Result of a prefetched task, or None if it was never started or got cancelled."""
+        task = self.tasks.pop(name, None)
+        if task is None or task.cancelled():
+            return None
+        try:
+            return await task
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            raise
+
+    def cancel(self, *names: str):
+        for name in names:
+            task = self.tasks.pop(name, None)
+            if task is not None and not task.done():
+                task.cancel()
+                self.timings[f"{name}_cancelled"] = 1.0
+            elif task is not None and not task.cancelled():
+                task.exception()  # Unused and already failed: mark the error as seen
+
+    def cancel_all(self):
+        self.cancel(*list(self.tasks))
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000, 2)
+
+    def report(self) -> Dict[str, float]:
+        return dict(self.timings, total=round((time.perf_counter() - self.started_at) * 1000, 2))
+
+
+class PrefetchRegistry:
+    """
+    One Prefetch per in-flight request (keyed by its request id, never the thread: two requests
+    on the same thread must not cancel each other). `launcher(prefetch, message)` decides what to start.
+    start() is idempotent for the same message, so both the API layer and the first
+    graph node can call it and only the earliest caller actually launches work.
+    """
+
+    def __init__(self, launcher: Callable[[Prefetch, str], None]):
+        self.launcher = launcher
+        self._runs: Dict[str, Prefetch] = {}
+
+    def start(self, key: str, message: str) -> Prefetch:
+        run = self._runs.get(key)
+        if run is not None and run.message == message:
+            return run
+        if run is not None:
+            run.cancel_all()
+        run = Prefetch(message)
+        self._runs[key] = run
+        self.launcher(run, message)
+        return run
+
+    def get(self, key: str) -> Optional[Prefetch]:
+        return self._runs.get(key)
+
+    def finish(self, key: str) -> Dict[str, float]:
+        run = self._runs.pop(key, None)
+        if run is None:
+            return {}
+        run.cancel_all()
+        return run.report()
@@ -0,0 +1,106 @@
+import re
+import string
+import threading
+from typing import Dict, Optional, Tuple
+
+# --- TEMPLATES ---
+# Answers whose content is fully structured (a flight's status, a short list of hits) can be
+# rendered directly; the LLM would only rephrase them. Each template is parsed once at import.
+
+
+class Template:
+    """str.format-style template, pre-split into literal/field parts so render() is a single join."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self._parts = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if literal:
+                self._parts.append((True, literal, None))
+            if field is not None:
+                self._parts.append((False, field, f"{{0{'!' + conversion if conversion else ''}{':' + spec if spec else ''}}}"))
+
+    def render(self, **fields) -> str:
+        return "".join(
+            text if literal else (str(fields[text]) if fmt == "{0}" else fmt.format(fields[text]))
+            for literal, text, fmt in self._parts
+        )
+
+
+TEMPLATES: Dict[str, Template] = {name: Template(source) for name, source in {
+    # Degradations (LLM missing, slow or failing) and the structured fast path share these.
+    "concierge": "Concierge: Which terminal are you in, and what do you need?",
+    "concierge_known": "Concierge: Welcome to {airport}! I have you at {location}. What are you looking for?",
+    "scout": "Scout: Here are the top options I found for you:\n{context}",
+    "scout_item": "- **{name}** ({location})\n  Status: {status} | Wait: {wait}m{walk}\n  {description}",
+    "scout_empty": "Scout: I couldn't find anything matching '{query}' at {airport}.",
+    "flight_status": "✈️ **Flight {flight_number} to {destination}**\nStatus: **{status}**\nGate: {gate}{walk_note}",
+    "flight_ask": "FlightTracker: I can help with that. What is the flight number? (e.g., UA400)",
+}.items()}
+
+
+def render(name: str, /, **fields) -> str:
+    return TEMPLATES[name].render(**fields)
+
+
+# --- SYNTHESIS POLICY ---
+# Words that mean the user wants judgement, not a list: worth an LLM call.
+COMPLEX_PATTERN = re.compile(
+    r"\b(why|should|recommend|suggest|best|better|compare|versus|vs|which one|worth|explain|"
+    r"healthy|vegan|vegetarian|gluten|kid|quiet|cheap|romantic|if)\b",
+    re.IGNORECASE,
+)
+SYNTHESIS_MODES = ("auto", "template", "llm")
+
+
+class SynthesisPolicy:
+    """
+    Decides per request whether an answer needs LLM synthesis or can be rendered from a template.
+    `mode` forces either side; in auto, the LLM is used only when the question asks for judgement
+    (long or with COMPLEX_PATTERN cues), there are several hits to weigh, and the LLM's recent p50
+    fits the latency budget. Tracks how often each path ran, to estimate the LLM time saved.
+    """
+
+    def __init__(self, budget_ms: float = 1500.0, max_simple_words: int = 8):
+        self.budget_ms = budget_ms
+        self.max_simple_words = max_simple_words
+        self._counts: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def decide(self, intent: str, query: str, hits: int = 0, mode: str = "auto",
+               llm_p50_ms: Optional[float] = None, llm_available: bool = True) -> Tuple[bool, str]:
+        """(use_llm, reason)"""
+        if not llm_available:
+            return False, "no_llm"
+        if mode == "template":
+            return False, "forced"
+        if mode == "llm":
+            return True, "forced"
+        if intent == "scout" and hits <= 1:
+            return False, "few_hits"
+        complex_query = len(query.split()) > self.max_simple_words or COMPLEX_PATTERN.search(query) is not None
+        if not complex_query:
+            return False, "simple_query"
+        if llm_p50_ms is not None and llm_p50_ms > self.budget_ms:
+            return False, "over_budget"
+        return True, "complex_query"
+
+    def record(self, intent: str, used_llm: bool, reason: str):
+        with self._lock:
+            key = (intent, f"{'llm' if used_llm else 'template'}:{reason}")
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def stats(self, llm_p50_ms: Optional[Dict[str, float]] = None) -> dict:
+        """Paths taken per intent; with the LLM's observed p50 per intent, the LLM time templates saved."""
+        with self._lock:
+            out: Dict[str, dict] = {}
+            for (intent, path), count in self._counts.items():
+                entry = out.setdefault(intent, {"paths": {}, "templated": 0})
+                entry["paths"][path] = count
+                if path.startswith("template:") and not path.endswith(":no_llm"):
+                    entry["templated"] += count
+        for intent, entry in out.items():
+            p50 = (llm_p50_ms or {}).get(intent)
+            if p50 is not None:
+                entry["llm_ms_saved_est"] = round(entry["templated"] * p50, 1)
+        return out
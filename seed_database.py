@@ -1,80 +1,285 @@
 import os
 import json
 import time
-from pymongo import MongoClient
+import hashlib
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pymongo import MongoClient, UpdateOne
 from langchain_voyageai import VoyageAIEmbeddings
-from langchain_mongodb import MongoDBAtlasVectorSearch
 from dotenv import load_dotenv
-from langchain_core.documents import Document
+from spatial_index import geo_point, ensure_geo_index
+from embedding_providers import embedding_hash
 
 load_dotenv()
 
 # Configuration
 MONGO_URI = os.getenv("MONGO_URI")
 VOYAGE_API_KEY = os.getenv("VOYAGE_API_KEY")
-DB_NAME = "LayoverOS"
+DB_NAME = "layover_os"  # Same DB agent_graph.py reads from
 COLLECTION_NAME = "amenities"
+EMBEDDING_MODEL = "voyage-3-large"
+EMBEDDING_FIELD = "embedding"
+CHECKPOINT_PATH = ".seed_checkpoint.json"
+MAX_ATTEMPTS = 4
 
-def seed_data():
+# --- LAZY READERS ---
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yields the elements of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buf = buf[pos:] + chunk
+        pos = 0
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in chars:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    fill()
+    skip(" \t\r\n")
+    if buf[pos:pos + 1] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+
+    while True:
+        skip(" \t\r\n,")
+        if pos >= len(buf):
+            raise ValueError("Unterminated JSON array")
+        if buf[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        yield item
+        pos = end
+
+
+def iter_records(path):
+    """JSONL is read line by line; a .json array is streamed element by element."""
+    with open(path, "r") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+# --- DOCUMENT SHAPE ---
+# Matches what agent_graph.py / vector_index.py read: name, description_for_embedding,
+# terminal_id, airport_code, metadata.{is_open_now, wait_time_minutes, last_updated_ts}.
+
+def _sha1(*parts):
+    return hashlib.sha1("\x00".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+
+def to_document(item, default_airport):
+    airport = item.get("airport_code", default_airport)
+    terminal = item.get("terminal_id", item.get("terminal", "General Area"))
+    where = terminal if terminal == "General Area" or str(terminal).startswith("Terminal") else f"Terminal {terminal}"
+    description = f"{item['name']} ({item['type']}). Located in {where}. {item.get('desc', '')}".strip()
+    doc = {
+        # Stable identity of the place: re-seeding an edited (or moved) record updates it in place.
+        # OSM's element id when the extractor has one, else the name within its airport.
+        "source_id": _sha1(airport, "osm", item["osm_id"]) if item.get("osm_id") else _sha1(airport, item["name"]),
+        # What the embedding depends on: if this is unchanged, the stored vector is reused.
+        "embedding_hash": embedding_hash(EMBEDDING_MODEL, description),
+        "name": item["name"],
+        "type": item["type"],
+        "airport_code": airport,
+        "terminal_id": terminal,
+        "description_for_embedding": description,
+        "lat": item["lat"],
+        "lon": item["lon"],
+        "location": geo_point(item["lat"], item["lon"]),  # GeoJSON for the optional 2dsphere index
+    }
+    # Every field we write: if this is unchanged, the document is skipped entirely.
+    doc["content_hash"] = _sha1(json.dumps(doc, sort_keys=True, default=str))
+    return doc
+
+def _legacy_source_id(doc):
+    # Identity before it moved to osm_id / name: included coordinates, so a moved place forked
+    return _sha1(doc["airport_code"], doc["name"], round(doc["lat"], 6), round(doc["lon"], 6))
+
+# --- CHECKPOINTING ---
+
+class Checkpoint:
+    """Number of input records fully written, so a crashed run resumes where it stopped."""
+
+    def __init__(self, path, input_path, restart=False):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.input_size = os.path.getsize(input_path)
+        self.records_done = 0
+        if not restart and os.path.exists(path):
+            with open(path, "r") as f:
+                state = json.load(f)
+            if state.get("input") == self.input_path and state.get("size") == self.input_size:
+                self.records_done = state["records_done"]
+            else:
+                print("⚠️  Checkpoint belongs to a different input file. Starting from the top.")
+
+    def save(self, records_done):
+        self.records_done = records_done
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"input": self.input_path, "size": self.input_size, "records_done": records_done}, f)
+        os.replace(tmp, self.path)  # Atomic: a crash never leaves a half-written checkpoint
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+# --- PIPELINE ---
+
+def with_retries(fn, *args, what="operation", **kwargs):
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            delay = 2 ** attempt
+            print(f"⚠️  {what} failed ({e}). Retry {attempt}/{MAX_ATTEMPTS - 1} in {delay}s...")
+            time.sleep(delay)
+
+
+def process_batch(collection, embeddings, docs):
+    """
+    Upserts only the documents whose content changed (any written field, location included),
+    and re-embeds only those whose description changed. Returns (written, skipped).
+    """
+    ids = {d["source_id"]: [d["source_id"], _legacy_source_id(d)] for d in docs}
+    found = {
+        d["source_id"]: d
+        for d in collection.find({"source_id": {"$in": [i for pair in ids.values() for i in pair]}},
+                                 {"source_id": 1, "content_hash": 1, "embedding_hash": 1})
+    }
+    existing = {sid: next((found[i] for i in pair if i in found), {}) for sid, pair in ids.items()}
+    changed = [d for d in docs if existing[d["source_id"]].get("content_hash") != d["content_hash"]
+               or existing[d["source_id"]].get("source_id") != d["source_id"]]
+    if not changed:
+        return 0, len(docs)
+
+    stale = [d for d in changed if existing[d["source_id"]].get("embedding_hash") != d["embedding_hash"]]
+    vectors = {}
+    if stale:
+        embedded = with_retries(embeddings.embed_documents, [d["description_for_embedding"] for d in stale],
+                                what="Embedding batch")
+        vectors = {d["source_id"]: vector for d, vector in zip(stale, embedded)}
+    now = time.time()
+    ops = [
+        UpdateOne(
+            {"source_id": {"$in": ids[doc["source_id"]]}},  # Adopts a document keyed the old way
+            {
+                "$set": dict(doc, **{EMBEDDING_FIELD: vectors[doc["source_id"]]}) if doc["source_id"] in vectors else doc,
+                # Live status belongs to the simulator / feed: only seed it for new documents.
+                "$setOnInsert": {"metadata": {"is_open_now": True, "wait_time_minutes": 5, "last_updated_ts": now}},
+            },
+            upsert=True,
+        )
+        for doc in changed
+    ]
+    with_retries(collection.bulk_write, ops, ordered=False, what="bulk_write")
+    return len(changed), len(docs) - len(changed)
+
+
+def seed_data(input_path="sfo_amenities.jsonl", default_airport="SFO", batch_size=64, concurrency=4,
+              checkpoint_path=CHECKPOINT_PATH, restart=False):
     if not MONGO_URI or not VOYAGE_API_KEY:
         print("❌ Error: MONGO_URI or VOYAGE_API_KEY not found in .env")
         return
 
+    if not os.path.exists(input_path):
+        print(f"❌ {input_path} not found! Run get_sfo_data.py first.")
+        return
+
     print("🔌 Connecting to MongoDB...")
     try:
         client = MongoClient(MONGO_URI)
         collection = client[DB_NAME][COLLECTION_NAME]
+        collection.create_index("source_id", unique=True, sparse=True)
+        ensure_geo_index(collection)
         print("✅ Connected!")
     except Exception as e:
         print(f"❌ Connection failed: {e}")
         return
 
-    # Load Data
-    try:
-        with open("sfo_amenities.json", "r") as f:
-            raw_data = json.load(f)
-    except FileNotFoundError:
-        print("❌ sfo_amenities.json not found! Run get_sfo_data.py first.")
-        return
-
-    print(f"📦 Loaded {len(raw_data)} amenities from JSON.")
-
-    # Convert to LangChain Documents
-    docs = []
-    for item in raw_data:
-        # Create a rich description for embedding
-        page_content = f"{item['name']} ({item['type']}). Located in {item['terminal']}. {item.get('desc', '')}"
-        
-        metadata = {
-            "name": item["name"],
-            "type": item["type"],
-            "terminal": item["terminal"],
-            "status": "OPEN", # Default status for simulation
-            "wait_time": "5 mins",
-            "lat": item["lat"],
-            "lon": item["lon"]
-        }
-        docs.append(Document(page_content=page_content, metadata=metadata))
-
     # Initialize Embedding Model
     print("🧠 Initializing Voyage AI Embeddings...")
-    embeddings = VoyageAIEmbeddings(
-        model="voyage-3-large", 
-        voyage_api_key=VOYAGE_API_KEY
-    )
+    embeddings = VoyageAIEmbeddings(model=EMBEDDING_MODEL, voyage_api_key=VOYAGE_API_KEY, batch_size=batch_size)
 
-    # Ingest into MongoDB
-    print("🚀 Ingesting data into MongoDB Atlas Vector Store...")
-    # This automatically generates embeddings and inserts docs
-    MongoDBAtlasVectorSearch.from_documents(
-        documents=docs,
-        embedding=embeddings,
-        collection=collection,
-        index_name="vector_index" 
+    checkpoint = Checkpoint(checkpoint_path, input_path, restart=restart)
+    if checkpoint.records_done:
+        print(f"⏩ Resuming after {checkpoint.records_done} records")
+
+    records = islice(iter_records(input_path), checkpoint.records_done, None)
+    batches = (
+        (i, [to_document(item, default_airport) for item in batch])
+        for i, batch in enumerate(batched(records, batch_size))
     )
 
-    print("✅ Success! Database seeded.")
-    print("\n⚠️  IMPORTANT: Now go to Atlas UI -> Search -> Create Index (JSON Editor) and paste this:")
+    print(f"🚀 Ingesting in batches of {batch_size} with {concurrency} in flight...")
+    written = skipped = 0
+    start = time.time()
+    in_flight = {}
+    finished = {}       # batch index -> record count, for batches that completed out of order
+    next_to_commit = 0
+    records_done = checkpoint.records_done
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        def drain(block_until):
+            nonlocal written, skipped, next_to_commit, records_done
+            done, _ = wait(list(in_flight), return_when=block_until)
+            for future in done:
+                index, size = in_flight.pop(future)
+                w, s = future.result()  # Re-raises after retries are exhausted: checkpoint stays put
+                written += w
+                skipped += s
+                finished[index] = size
+            # Only advance the checkpoint over a contiguous prefix of finished batches.
+            while next_to_commit in finished:
+                records_done += finished.pop(next_to_commit)
+                next_to_commit += 1
+            checkpoint.save(records_done)
+            print(f"   📦 {records_done} records | {written} written | {skipped} unchanged")
+
+        for index, docs in batches:
+            in_flight[pool.submit(process_batch, collection, embeddings, docs)] = (index, len(docs))
+            if len(in_flight) >= concurrency:
+                drain(FIRST_COMPLETED)
+        while in_flight:
+            drain(FIRST_COMPLETED)
+
+    checkpoint.clear()
+    print(f"✅ Success! Database seeded in {time.time() - start:.1f}s ({written} written, {skipped} unchanged).")
+    print("\n⚠️  IMPORTANT: If the index doesn't exist yet, go to Atlas UI -> Search -> Create Index (JSON Editor) and paste this:")
     print("-" * 50)
     print("""
 {
@@ -87,11 +292,11 @@ def seed_data():
     },
     {
       "type": "filter",
-      "path": "status"
+      "path": "airport_code"
     },
     {
       "type": "filter",
-      "path": "terminal"
+      "path": "terminal_id"
     }
   ]
 }
@@ -99,4 +304,12 @@ def seed_data():
     print("-" * 50)
 
 if __name__ == "__main__":
-    seed_data()
+    parser = argparse.ArgumentParser(description="Streaming, resumable amenity ingestion.")
+    parser.add_argument("--input", default="sfo_amenities.jsonl", help=".json array or .jsonl file")
+    parser.add_argument("--airport", default="SFO", help="airport_code for records that don't carry one")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4, help="Batches embedded/written in parallel")
+    parser.add_argument("--checkpoint", default=CHECKPOINT_PATH)
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint")
+    args = parser.parse_args()
+    seed_data(args.input, args.airport, args.batch_size, args.concurrency, args.checkpoint, args.restart)
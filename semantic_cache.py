@@ -0,0 +1,177 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+
+class _Entry:
+    __slots__ = ("key", "query", "vector", "answer", "amenity_ts", "created_at")
+
+    def __init__(self, key: tuple, query: str, vector: np.ndarray, answer: str, amenity_ts: Dict, created_at: float):
+        self.key = key                 # Bucket it lives in
+        self.query = query
+        self.vector = vector
+        self.answer = answer
+        self.amenity_ts = amenity_ts   # amenity _id -> metadata.last_updated_ts when the answer was made
+        self.created_at = created_at
+
+
+class _Bucket:
+    """Entries for one (airport, terminal) plus a lazily rebuilt matrix for one-shot similarity."""
+
+    def __init__(self):
+        self.entries: List[_Entry] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.stack([e.vector for e in self.entries])
+        return self._matrix
+
+    def changed(self):
+        self._matrix = None
+
+
+class SemanticResponseCache:
+    """
+    Reuses a synthesized scout answer when a new query for the same airport/terminal is
+    within `threshold` cosine similarity of an earlier one AND none of the amenities that
+    answer was built from has a newer `metadata.last_updated_ts` (i.e. the simulator or a
+    live feed hasn't touched them since).
+
+    `ts_lookup(ids)` / `ats_lookup(ids)` return {amenity_id: last_updated_ts} for the current data.
+    """
+
+    def __init__(self, threshold: float = 0.9, max_entries_per_bucket: int = 256,
+                 ttl_seconds: float = 3600, ts_lookup=None, ats_lookup=None):
+        self.threshold = threshold
+        self.max_entries_per_bucket = max_entries_per_bucket
+        self.ttl_seconds = ttl_seconds
+        self.ts_lookup = ts_lookup
+        self.ats_lookup = ats_lookup
+        self._buckets: Dict[tuple, _Bucket] = {}
+        self._by_amenity: Dict[object, Set[_Entry]] = {}  # amenity _id -> entries built from it
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.stores = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _key(airport_code: str, terminal: Optional[str]) -> tuple:
+        return (airport_code, str(terminal) if terminal else "*")
+
+    def _best_match(self, airport_code: str, terminal: Optional[str], query_vector) -> Optional[_Entry]:
+        with self._lock:
+            bucket = self._buckets.get(self._key(airport_code, terminal))
+            if bucket is None or not bucket.entries:
+                return None
+            query = np.asarray(query_vector, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            scores = bucket.matrix() @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            entry = bucket.entries[best]
+            if self.ttl_seconds and time.time() - entry.created_at > self.ttl_seconds:
+                self._remove(bucket, entry)
+                return None
+            return entry
+
+    def _remove(self, bucket: _Bucket, entry: _Entry):
+        if entry in bucket.entries:
+            bucket.entries.remove(entry)
+            bucket.changed()
+            self._unindex(entry)
+
+    def _unindex(self, entry: _Entry):
+        for amenity_id in entry.amenity_ts:
+            entries = self._by_amenity.get(amenity_id)
+            if entries is not None:
+                entries.discard(entry)
+                if not entries:
+                    del self._by_amenity[amenity_id]
+
+    def _validate(self, airport_code: str, terminal: Optional[str], entry: _Entry, current: Dict) -> Optional[str]:
+        if all(current.get(amenity_id) == ts for amenity_id, ts in entry.amenity_ts.items()):
+            self.hits += 1
+            return entry.answer
+        # Something it was built from changed (status flip, new wait time): drop it for good.
+        self.stale += 1
+        self.misses += 1
+        with self._lock:
+            bucket = self._buckets.get(self._key(airport_code, terminal))
+            if bucket is not None:
+                self._remove(bucket, entry)
+        return None
+
+    def lookup(self, airport_code: str, terminal: Optional[str], query_vector) -> Optional[str]:
+        entry = self._best_match(airport_code, terminal, query_vector)
+        if entry is None:
+            self.misses += 1
+            return None
+        current = self.ts_lookup(list(entry.amenity_ts)) if self.ts_lookup else {}
+        return self._validate(airport_code, terminal, entry, current)
+
+    async def alookup(self, airport_code: str, terminal: Optional[str], query_vector) -> Optional[str]:
+        entry = self._best_match(airport_code, terminal, query_vector)
+        if entry is None:
+            self.misses += 1
+            return None
+        current = await self.ats_lookup(list(entry.amenity_ts)) if self.ats_lookup else {}
+        return self._validate(airport_code, terminal, entry, current)
+
+    def store(self, airport_code: str, terminal: Optional[str], query: str, query_vector,
+              answer: str, docs: Iterable[dict]):
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        amenity_ts = {d["_id"]: (d.get("metadata") or {}).get("last_updated_ts") for d in docs}
+        key = self._key(airport_code, terminal)
+        entry = _Entry(key, query, vector, answer, amenity_ts, time.time())
+        with self._lock:
+            bucket = self._buckets.setdefault(key, _Bucket())
+            bucket.entries.append(entry)
+            for amenity_id in amenity_ts:
+                self._by_amenity.setdefault(amenity_id, set()).add(entry)
+            if len(bucket.entries) > self.max_entries_per_bucket:
+                self._unindex(bucket.entries.pop(0))  # Oldest first
+            bucket.changed()
+        self.stores += 1
+
+    def invalidate_amenities(self, amenity_ids: Iterable) -> int:
+        """Drops every cached answer that mentions one of these amenities. Returns how many."""
+        with self._lock:
+            # The reverse index finds them directly; only the buckets they live in are touched.
+            doomed: Dict[tuple, Set[_Entry]] = {}
+            for amenity_id in set(amenity_ids):
+                for entry in self._by_amenity.get(amenity_id, ()):
+                    doomed.setdefault(entry.key, set()).add(entry)
+            dropped = 0
+            for key, entries in doomed.items():
+                bucket = self._buckets[key]
+                bucket.entries = [e for e in bucket.entries if e not in entries]
+                bucket.changed()
+                for entry in entries:
+                    self._unindex(entry)
+                dropped += len(entries)
+        self.invalidations += dropped
+        return dropped
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._by_amenity.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(len(b.entries) for b in self._buckets.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "stores": self.stores,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
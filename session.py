@@ -0,0 +1,98 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+# Per-thread context the agent needs before it can answer anything useful.
+SESSION_FIELDS = ("airport_code", "user_location", "flight_number")
+
+# Values clients send when they don't actually know (e.g. the old user_location="SFO" default)
+PLACEHOLDER_LOCATIONS = {"", "unknown", "none", "null", "n/a"}
+AIRPORT_CODE_PATTERN = re.compile(r"^[A-Za-z]{3}$")
+FLIGHT_NUMBER_PATTERN = re.compile(r"^[A-Za-z]{2}\d{3,4}$")
+
+
+def request_context(airport_code: Optional[str] = None, user_location: Optional[str] = None,
+                    terminal: Optional[str] = None, flight_number: Optional[str] = None) -> Dict[str, str]:
+    """Normalizes what a request says about the session; fields it doesn't really know are left out."""
+    context = {}
+    if airport_code and AIRPORT_CODE_PATTERN.match(airport_code.strip()):
+        context["airport_code"] = airport_code.strip().upper()
+    location = (user_location or "").strip()
+    if AIRPORT_CODE_PATTERN.match(location) and location.isupper():
+        # "SFO" as a location only tells us the airport
+        context.setdefault("airport_code", location)
+        location = ""
+    if location.lower() in PLACEHOLDER_LOCATIONS and terminal:
+        location = f"Terminal {terminal.strip()}"
+    if location.lower() not in PLACEHOLDER_LOCATIONS:
+        context["user_location"] = location
+    if flight_number and FLIGHT_NUMBER_PATTERN.match(flight_number.strip()):
+        context["flight_number"] = flight_number.strip().upper()
+    return context
+
+
+class SessionStore:
+    """
+    In-memory context per thread, in front of the checkpointer: known before the
+    checkpoint loads, and still there if the checkpoint expired or was never flushed.
+
+    Merge rule: the latest explicit signal wins. A request field only overrides the
+    session when the client changed it since its previous request, so a client that
+    always sends airport_code="SFO" doesn't undo "I'm at JFK" said in the chat.
+    """
+
+    def __init__(self, max_sessions: int = 50000, ttl_seconds: Optional[float] = 24 * 3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, thread_id: str) -> dict:
+        entry = self._sessions.get(thread_id)
+        if entry is not None and self._expired(entry):
+            entry = None
+        if entry is None:
+            entry = {"context": {}, "client": {}, "updated_at": time.time()}
+            self._sessions[thread_id] = entry
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(thread_id)
+        return entry
+
+    def _expired(self, entry: dict) -> bool:
+        return bool(self.ttl_seconds) and time.time() - entry["updated_at"] > self.ttl_seconds
+
+    def get(self, thread_id: str) -> Dict[str, str]:
+        with self._lock:
+            entry = self._sessions.get(thread_id)
+            return dict(entry["context"]) if entry and not self._expired(entry) else {}
+
+    def merge(self, thread_id: str, supplied: Dict[str, str]) -> Dict[str, str]:
+        """Applies request context; returns the thread's full known context for the initial state."""
+        with self._lock:
+            entry = self._entry(thread_id)
+            for field, value in supplied.items():
+                if entry["client"].get(field) != value:
+                    entry["client"][field] = value
+                    entry["context"][field] = value
+            entry["updated_at"] = time.time()
+            return dict(entry["context"])
+
+    def remember(self, thread_id: str, updates: Dict, fields: Iterable[str] = SESSION_FIELDS):
+        """Context the graph learned this turn (airport switch, flight number)."""
+        learned = {field: updates[field] for field in fields if field in updates and updates[field] is not None}
+        if not learned:
+            return
+        with self._lock:
+            entry = self._entry(thread_id)
+            for field, value in learned.items():
+                if value == "":
+                    entry["context"].pop(field, None)  # e.g. a flight number that turned out not to exist
+                else:
+                    entry["context"][field] = value
+            entry["updated_at"] = time.time()
+
+    def __len__(self):
+        return len(self._sessions)
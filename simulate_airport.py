@@ -1,7 +1,13 @@
+import argparse
+import json
+import math
 import time
 import random
 import os
-from pymongo import MongoClient
+import threading
+import uuid
+from collections import Counter, defaultdict
+from pymongo import MongoClient, UpdateOne, UpdateMany
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -10,8 +16,259 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI")
 DB_NAME = "layover_os"     # Updated to match screenshot (lowercase)
 COLLECTION_NAME = "amenities"
+FLIGHTS_COLLECTION = "flights"
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "airports.json")
 
-def simulate_airport_events():
+# --- EVENT MODEL ---
+# Share of each event kind in the feed
+EVENT_MIX = {"amenity": 0.85, "gate_change": 0.09, "flight_status": 0.05, "terminal": 0.01}
+# Off-peak typical wait (minutes) per amenity type; rush hours multiply it
+BASE_WAIT = {"cafe": 8, "coffee": 8, "restaurant": 15, "fast_food": 10, "food_court": 12, "bar": 6, "pub": 6,
+             "lounge": 5, "pharmacy": 4, "toilets": 3, "shop": 2, "convenience": 3}
+DEFAULT_WAIT = 5
+# (centre hour, width in hours, multiplier at the peak): morning bank, lunch, evening bank
+RUSH_PEAKS = [(7.5, 1.2, 2.5), (12.5, 1.0, 1.8), (17.5, 1.3, 2.2)]
+FLIGHT_STATUSES = ["On Time", "On Time", "On Time", "Delayed", "Boarding", "Gate Closed"]
+DESTINATIONS = ["Denver", "Chicago", "Seattle", "New York", "Boston", "Tokyo", "London", "Honolulu", "Dallas"]
+PROBE_WAIT_BASE = 150  # Probe markers (150m+) are outside anything the model generates
+
+
+def rush_factor(hour: float) -> float:
+    return 1 + sum((peak - 1) * math.exp(-((hour - centre) / width) ** 2) for centre, width, peak in RUSH_PEAKS)
+
+
+class SimClock:
+    """Airport local time for the wait model; `time_scale` > 1 fast-forwards through the day's rushes."""
+
+    def __init__(self, start_hour: float = None, time_scale: float = 1.0):
+        now = time.localtime()
+        self.start_hour = start_hour if start_hour is not None else now.tm_hour + now.tm_min / 60
+        self.time_scale = time_scale
+        self.started_at = time.time()
+
+    def hour(self) -> float:
+        return (self.start_hour + (time.time() - self.started_at) * self.time_scale / 3600) % 24
+
+
+def gate_areas_from_registry(path: str = REGISTRY_PATH) -> dict:
+    """airport -> gate area letters from the walkways in airports.json."""
+    try:
+        with open(path) as f:
+            airports = json.load(f)["airports"]
+    except (OSError, KeyError, ValueError):
+        return {}
+    return {
+        a["code"]: sorted({n["id"] for n in a.get("walkways", {}).get("nodes", []) if n.get("kind") == "gates"})
+        for a in airports
+    }
+
+
+class EventModel:
+    """
+    Turns a seeded RNG into feed events as (collection, write op, kind):
+    gamma-distributed waits scaled by the rush-hour curve, occasional terminal-wide
+    closures (amenities stay closed until the terminal reopens), gate and status changes.
+    """
+
+    def __init__(self, rng: random.Random, amenities, flights, gate_areas: dict, clock: SimClock, reserved_ids=()):
+        self.rng = rng
+        self.amenities = amenities
+        self.flights = flights
+        self.gate_areas = gate_areas
+        self.clock = clock
+        self.reserved_ids = list(reserved_ids)  # Probe targets: never touched by the model
+        self.terminals = sorted({(a["airport_code"], str(a.get("terminal_id"))) for a in amenities})
+        self.closed = set()
+        self.kinds, self.weights = zip(*EVENT_MIX.items())
+
+    def next(self):
+        kind = self.rng.choices(self.kinds, self.weights)[0]
+        if kind in ("gate_change", "flight_status") and not self.flights:
+            kind = "amenity"
+        if kind == "terminal" and not self.terminals:
+            kind = "amenity"
+        return getattr(self, f"_{kind}")()
+
+    def _amenity(self):
+        doc = self.rng.choice(self.amenities)
+        closed = (doc["airport_code"], str(doc.get("terminal_id"))) in self.closed
+        is_open = not closed and self.rng.random() > 0.04
+        mean = BASE_WAIT.get(doc.get("type"), DEFAULT_WAIT) * rush_factor(self.clock.hour())
+        wait = round(self.rng.gammavariate(2.0, mean / 2.0)) if is_open else 0
+        op = UpdateOne({"_id": doc["_id"]}, {"$set": {
+            "metadata.is_open_now": is_open,
+            "metadata.wait_time_minutes": wait,
+            "metadata.last_updated_ts": time.time(),
+        }})
+        return COLLECTION_NAME, op, "amenity", (doc.get("name", "Unknown"), is_open, wait)
+
+    def _terminal(self):
+        airport, terminal = self.rng.choice(self.terminals)
+        reopen = (airport, terminal) in self.closed
+        (self.closed.discard if reopen else self.closed.add)((airport, terminal))
+        op = UpdateMany(
+            {"airport_code": airport, "terminal_id": terminal, "_id": {"$nin": self.reserved_ids}},
+            {"$set": {"metadata.is_open_now": reopen, "metadata.wait_time_minutes": DEFAULT_WAIT if reopen else 0,
+                      "metadata.last_updated_ts": time.time()}},
+        )
+        return COLLECTION_NAME, op, "terminal", (f"{airport} Terminal {terminal}", reopen, 0)
+
+    def _gate_change(self):
+        flight = self.rng.choice(self.flights)
+        areas = self.gate_areas.get(flight.get("airport_code")) or ["A", "B", "C", "D", "E", "F", "G"]
+        gate = f"{self.rng.choice(areas)}{self.rng.randint(1, 40)}"
+        op = UpdateOne({"flight_number": flight["flight_number"]},
+                       {"$set": {"gate": gate, "gate_changed_at": time.time()}})
+        return FLIGHTS_COLLECTION, op, "gate_change", (flight["flight_number"], True, gate)
+
+    def _flight_status(self):
+        flight = self.rng.choice(self.flights)
+        status = self.rng.choice(FLIGHT_STATUSES)
+        update = {"status": status}
+        if status == "Delayed":
+            update["boarding_time"] = time.time() + self.rng.randint(30, 180) * 60
+        op = UpdateOne({"flight_number": flight["flight_number"]}, {"$set": update})
+        return FLIGHTS_COLLECTION, op, "flight_status", (flight["flight_number"], True, status)
+
+
+def seed_flights(collection, airports, per_airport: int, gate_areas: dict, rng: random.Random):
+    """Upserts `per_airport` synthetic departures per airport (same seed, same flights)."""
+    ops = []
+    for airport in airports:
+        areas = gate_areas.get(airport) or ["A", "B", "C"]
+        for i in range(per_airport):
+            number = f"{rng.choice(['UA', 'AA', 'DL', 'AS', 'B6'])}{1000 + rng.randint(0, 8999)}"
+            ops.append(UpdateOne({"flight_number": number}, {"$set": {
+                "flight_number": number, "airport_code": airport, "destination": rng.choice(DESTINATIONS),
+                "status": "On Time", "gate": f"{rng.choice(areas)}{rng.randint(1, 40)}",
+                "boarding_time": time.time() + rng.randint(20, 360) * 60,
+            }}, upsert=True))
+    if ops:
+        collection.bulk_write(ops, ordered=False)
+    print(f"🛫 Seeded {len(ops)} flights across {len(airports)} airports")
+
+# --- BATCHED WRITES ---
+
+class BatchWriter:
+    """Buffers ops per collection; one unordered bulk_write per collection per flush (or per full batch)."""
+
+    def __init__(self, collections: dict, batch_size: int):
+        self.collections = collections
+        self.batch_size = batch_size
+        self.pending = defaultdict(list)
+        self.writes = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = []
+
+    def add(self, name: str, op):
+        self.pending[name].append(op)
+        if len(self.pending[name]) >= self.batch_size:
+            self.flush(name)
+
+    def flush(self, name: str = None):
+        for target in ([name] if name else list(self.pending)):
+            ops = self.pending.pop(target, [])
+            if not ops:
+                continue
+            start = time.perf_counter()
+            try:
+                self.collections[target].bulk_write(ops, ordered=False)
+                self.writes += len(ops)
+            except Exception as e:
+                self.errors += 1
+                print(f"⚠️  bulk_write to {target} failed ({len(ops)} ops): {e}")
+            self.batches += 1
+            self.latencies.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+# --- STALENESS PROBE ---
+
+class StalenessProbe(threading.Thread):
+    """
+    End-to-end freshness: writes a marker (an impossible wait time, or a new gate) to a reserved
+    amenity/flight, then polls /chat until the answer shows it. Staleness = write -> first answer
+    containing it (an upper bound: it includes one /chat round-trip).
+    """
+
+    def __init__(self, url, amenities_col, flights_col, amenities, flights, rng, every, timeout):
+        super().__init__(daemon=True)
+        self.url = url
+        self.amenities_col = amenities_col
+        self.flights_col = flights_col
+        self.amenities = amenities
+        self.flights = flights
+        self.rng = rng
+        self.every = every
+        self.timeout = timeout
+        self.results = defaultdict(list)  # kind -> staleness seconds
+        self.misses = Counter()
+        self.stop_event = threading.Event()
+
+    def _ask(self, message, airport):
+        import requests
+        response = requests.post(self.url, params={"synthesis": "template"}, timeout=self.timeout, json={
+            "message": message, "thread_id": f"probe_{uuid.uuid4().hex[:8]}", "airport_code": airport,
+        })
+        return response.json().get("response", "") if response.status_code == 200 else ""
+
+    def _wait_visible(self, kind, written_at, message, airport, expected):
+        while time.time() - written_at < self.timeout and not self.stop_event.is_set():
+            try:
+                if all(part in self._ask(message, airport) for part in expected):
+                    self.results[kind].append(time.time() - written_at)
+                    return
+            except Exception as e:
+                print(f"⚠️  Probe request failed: {e}")
+            time.sleep(0.25)
+        self.misses[kind] += 1
+
+    def probe_amenity(self, n):
+        doc = self.rng.choice(self.amenities)
+        marker = PROBE_WAIT_BASE + n % 50
+        written_at = time.time()
+        self.amenities_col.update_one({"_id": doc["_id"]}, {"$set": {
+            "metadata.is_open_now": True, "metadata.wait_time_minutes": marker, "metadata.last_updated_ts": written_at,
+        }})
+        self._wait_visible("amenity", written_at, doc["name"], doc["airport_code"],
+                           [f"**{doc['name']}**", f"Wait: {marker}m"])
+
+    def probe_gate(self, n):
+        flight = self.rng.choice(self.flights)
+        gate = f"Z{n % 90 + 10}"  # No real gate area is Z
+        written_at = time.time()
+        self.flights_col.update_one({"flight_number": flight["flight_number"]}, {"$set": {"gate": gate}})
+        self._wait_visible("gate", written_at, f"Status of flight {flight['flight_number']}",
+                           flight.get("airport_code", "SFO"), [f"Gate: {gate}"])
+
+    def run(self):
+        n = 0
+        while not self.stop_event.wait(self.every):
+            if self.amenities:
+                self.probe_amenity(n)
+            if self.flights:
+                self.probe_gate(n)
+            n += 1
+
+    def report(self) -> str:
+        parts = []
+        for kind in sorted(set(self.results) | set(self.misses)):
+            seen = self.results[kind]
+            parts.append(f"{kind}: p50 {percentile(seen, 0.5):.2f}s p95 {percentile(seen, 0.95):.2f}s "
+                         f"max {max(seen, default=float('nan')):.2f}s ({len(seen)} seen, {self.misses[kind]} timed out)")
+        return " | ".join(parts) or "no probes yet"
+
+# --- MAIN LOOP ---
+
+def simulate_airport_events(rate=1.0, airports=None, batch_size=500, flush_ms=100, seed=42, duration=0,
+                            flights_per_airport=0, start_hour=None, time_scale=1.0, probe_url=None,
+                            probe_every=5.0, probe_timeout=30.0, probe_pool=3, report_every=5.0):
     if not MONGO_URI:
         print("⚠️  MONGO_URI not found. Please set it in .env")
         exit(1)
@@ -19,7 +276,8 @@ def simulate_airport_events():
     print("🔌 Connecting to MongoDB Atlas...")
     client = MongoClient(MONGO_URI, tlsAllowInvalidCertificates=True)
     collection = client[DB_NAME][COLLECTION_NAME]
-    
+    flights_collection = client[DB_NAME][FLIGHTS_COLLECTION]
+
     # Check if connected
     try:
         count = collection.count_documents({})
@@ -28,45 +286,99 @@ def simulate_airport_events():
         print(f"❌ Connection Error: {e}")
         exit(1)
 
-    print("\n✈️  LAYOVER OS: SFO DIGITAL TWIN STARTED")
-    print("   Broadcasting real-time status updates...")
-    print("-" * 60)
-    
-    # We update these fields based on the screenshot schema:
-    # metadata.is_open_now (boolean)
-    # metadata.wait_time_minutes (int)
-    
-    amenities = list(collection.find({}, {"_id": 1, "name": 1}))
-    
+    rng = random.Random(seed)
+    airports = airports or sorted(a for a in collection.distinct("airport_code") if a)
+    gate_areas = gate_areas_from_registry()
+    if flights_per_airport:
+        seed_flights(flights_collection, airports, flights_per_airport, gate_areas, rng)
+
+    # Sorted by _id: the same seed replays the same event sequence
+    amenities = list(collection.find({"airport_code": {"$in": airports}},
+                                     {"_id": 1, "name": 1, "type": 1, "airport_code": 1, "terminal_id": 1}).sort("_id", 1))
+    flights = list(flights_collection.find({}, {"_id": 0, "flight_number": 1, "airport_code": 1}).sort("flight_number", 1))
     if not amenities:
         print("❌ No amenities found!")
         exit(1)
 
-    while True:
-        # Pick a random place
-        target = random.choice(amenities)
-        name = target.get("name", "Unknown")
-        
-        # New randomized state
-        is_open = random.choice([True, True, True, False]) # Mostly open
-        wait_time = random.randint(5, 60) if is_open else 0
-        
-        # Update MongoDB
-        collection.update_one(
-            {"_id": target["_id"]},
-            {"$set": {
-                "metadata.is_open_now": is_open,
-                "metadata.wait_time_minutes": wait_time,
-                "metadata.last_updated_ts": time.time()
-            }}
-        )
-        
-        status_str = "OPEN" if is_open else "CLOSED"
-        timestamp = time.strftime("%H:%M:%S")
-        
-        print(f"[{timestamp}] 🔄 {name:<30} | {status_str:<6} | Wait: {wait_time}m")
-        
-        time.sleep(random.randint(2, 4)) # Fast updates for demo
+    # Probe targets are set aside so simulated events never overwrite a marker before it's seen
+    probe = None
+    if probe_url:
+        probe_amenities = [amenities.pop(rng.randrange(len(amenities))) for _ in range(min(probe_pool, len(amenities) - 1))]
+        probe_flights = [flights.pop(rng.randrange(len(flights))) for _ in range(min(probe_pool, max(len(flights) - 1, 0)))]
+        probe = StalenessProbe(probe_url, collection, flights_collection, probe_amenities, probe_flights,
+                               random.Random(seed + 1), probe_every, probe_timeout)
+    model = EventModel(rng, amenities, flights, gate_areas, SimClock(start_hour, time_scale),
+                       reserved_ids=[a["_id"] for a in (probe.amenities if probe else [])])
+    writer = BatchWriter({COLLECTION_NAME: collection, FLIGHTS_COLLECTION: flights_collection}, batch_size)
+    verbose = rate <= 2  # Demo speed: show every event like the original digital twin
+
+    print(f"\n✈️  LAYOVER OS: DIGITAL TWIN STARTED ({', '.join(airports)})")
+    print(f"   {rate:g} events/s target | {len(amenities)} amenities | {len(flights)} flights | seed {seed}")
+    print("-" * 60)
+    if probe:
+        probe.start()
+
+    kinds = Counter()
+    tick = flush_ms / 1000
+    started = last_report = time.perf_counter()
+    generated = 0
+    try:
+        while not duration or time.perf_counter() - started < duration:
+            # Open-loop pacing: generate whatever is due, so a slow write shows up as lag, not a lower rate
+            due = int((time.perf_counter() - started) * rate) - generated
+            for _ in range(min(due, max(1, int(rate * tick * 10)))):
+                name, op, kind, detail = model.next()
+                writer.add(name, op)
+                kinds[kind] += 1
+                generated += 1
+                if verbose:
+                    label, ok, value = detail
+                    state = ("OPEN" if ok else "CLOSED") if kind in ("amenity", "terminal") else kind
+                    print(f"[{time.strftime('%H:%M:%S')}] 🔄 {label:<30} | {state:<11} | {value}")
+            writer.flush()
+
+            now = time.perf_counter()
+            if not verbose and now - last_report >= report_every:
+                elapsed = now - started
+                lag = int(elapsed * rate) - generated
+                print(f"📈 {generated / elapsed:8.1f} events/s ({writer.writes / elapsed:8.1f} writes/s) | "
+                      f"bulk_write p50 {percentile(writer.latencies[-1000:], 0.5):.1f}ms "
+                      f"p95 {percentile(writer.latencies[-1000:], 0.95):.1f}ms | lag {max(lag, 0)} events"
+                      + (f" | staleness {probe.report()}" if probe else ""))
+                last_report = now
+            time.sleep(max(0.0, tick - (time.perf_counter() - now)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.flush()
+        if probe:
+            probe.stop_event.set()
+
+    elapsed = time.perf_counter() - started
+    print("-" * 60)
+    print(f"✅ {generated} events in {elapsed:.1f}s: {generated / elapsed:.1f} events/s "
+          f"(target {rate:g}), {writer.writes} writes in {writer.batches} bulk_writes, {writer.errors} failed")
+    print(f"   Mix: {dict(kinds)}")
+    print(f"   bulk_write p50 {percentile(writer.latencies, 0.5):.1f}ms p95 {percentile(writer.latencies, 0.95):.1f}ms")
+    if probe:
+        print(f"   Staleness (update -> visible in /chat): {probe.report()}")
 
 if __name__ == "__main__":
-    simulate_airport_events()
+    parser = argparse.ArgumentParser(description="Airport event feed: amenity status, closures, gate changes.")
+    parser.add_argument("--rate", type=float, default=0.33, help="Events per second (default: demo speed)")
+    parser.add_argument("--airports", nargs="+", help="airport_code values (default: all in the collection)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Max ops per bulk_write")
+    parser.add_argument("--flush-ms", type=float, default=100, help="Max time an event waits for its batch")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--duration", type=float, default=0, help="Seconds to run (0: until Ctrl-C)")
+    parser.add_argument("--seed-flights", type=int, default=0, help="Upsert N synthetic flights per airport first")
+    parser.add_argument("--start-hour", type=float, help="Simulated local hour at start (default: now)")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="Simulated seconds per real second")
+    parser.add_argument("--probe-url", help="e.g. http://localhost:8000/chat: measure update -> visible staleness")
+    parser.add_argument("--probe-every", type=float, default=5.0)
+    parser.add_argument("--probe-timeout", type=float, default=30.0)
+    parser.add_argument("--report-every", type=float, default=5.0)
+    args = parser.parse_args()
+    simulate_airport_events(args.rate, args.airports, args.batch_size, args.flush_ms, args.seed, args.duration,
+                            args.seed_flights, args.start_hour, args.time_scale, args.probe_url, args.probe_every,
+                            args.probe_timeout, report_every=args.report_every)
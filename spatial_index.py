@@ -0,0 +1,190 @@
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from telemetry import log
+
+EARTH_RADIUS_M = 6371000
+WALK_SPEED_M_PER_MIN = 80   # Unhurried walk with a carry-on
+DETOUR_FACTOR = 1.3         # Corridors aren't straight lines
+PROXIMITY_DECAY_MIN = 5.0   # Proximity score halves roughly every 3.5 minutes of walking
+RELEVANCE_FLOOR = 0.75      # Only matches at least this similar (relative to the best) get re-ranked by distance
+
+LATLON_PATTERN = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$')
+TERMINAL_PATTERN = re.compile(r'^\s*(?:Terminal\s+)?(\w+)\s*$', re.IGNORECASE)
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    # Equirectangular is plenty at airport scale.
+    x = math.radians(lon2 - lon1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return EARTH_RADIUS_M * math.hypot(x, y)
+
+
+def walk_minutes(distance_m):
+    """Straight-line metres -> estimated walking minutes (works on scalars and arrays)."""
+    return distance_m * DETOUR_FACTOR / WALK_SPEED_M_PER_MIN
+
+
+def proximity(distances_m):
+    """1.0 right here, decaying with walking time; unknown distances (NaN) count as far (0.0)."""
+    score = np.exp(-walk_minutes(np.asarray(distances_m, dtype=np.float64)) / PROXIMITY_DECAY_MIN)
+    return np.nan_to_num(score, nan=0.0)
+
+
+def hybrid_scores(similarities, distances_m, weight: float):
+    """
+    similarity * (1 + weight * proximity): being close can lift a match by at most (1 + weight),
+    so distance reorders comparably relevant places but never lets a restroom beat the coffee.
+    """
+    return np.asarray(similarities, dtype=np.float64) * (1.0 + weight * proximity(distances_m))
+
+
+def relevance_cutoff(best_similarity: float, floor: float = RELEVANCE_FLOOR) -> float:
+    """Similarity a match needs to be considered for distance re-ranking at all."""
+    return floor * best_similarity if best_similarity > 0 else -np.inf
+
+
+class GridIndex:
+    """
+    Uniform grid over one airport's POIs. Coordinates are projected once to local metres
+    (equirectangular around the centroid, exact enough at airport scale), and each cell holds
+    the rows inside it, so a radius query only touches the few cells it overlaps.
+    Rows without coordinates are simply not indexed.
+    """
+
+    def __init__(self, lats, lons, cell_m: float = 100.0):
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        self.cell_m = cell_m
+        valid = np.isfinite(lats) & np.isfinite(lons)
+        self.size = len(lats)
+        self.lat0 = float(lats[valid].mean()) if valid.any() else 0.0
+        self.lon0 = float(lons[valid].mean()) if valid.any() else 0.0
+        self._ky = math.radians(1) * EARTH_RADIUS_M
+        self._kx = self._ky * math.cos(math.radians(self.lat0))
+
+        self.xy = np.full((len(lats), 2), np.nan)
+        self.xy[:, 0] = (lons - self.lon0) * self._kx
+        self.xy[:, 1] = (lats - self.lat0) * self._ky
+
+        rows = np.flatnonzero(valid)
+        self._cells: Dict[Tuple[int, int], np.ndarray] = {}
+        if len(rows):
+            cells = np.floor(self.xy[rows] / cell_m).astype(np.int64)
+            order = np.lexsort((cells[:, 1], cells[:, 0]))
+            cells, rows = cells[order], rows[order]
+            breaks = np.flatnonzero(np.any(np.diff(cells, axis=0) != 0, axis=1)) + 1
+            for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(rows)]):
+                self._cells[(int(cells[start, 0]), int(cells[start, 1]))] = rows[start:end]
+            self._min_xy = self.xy[valid].min(axis=0)
+            self._max_xy = self.xy[valid].max(axis=0)
+        else:
+            self._min_xy = self._max_xy = np.zeros(2)
+
+    def __len__(self):
+        return sum(len(r) for r in self._cells.values())
+
+    def project(self, lat: float, lon: float) -> np.ndarray:
+        return np.array([(lon - self.lon0) * self._kx, (lat - self.lat0) * self._ky])
+
+    def distances(self, lat: float, lon: float, rows=None) -> np.ndarray:
+        """Metres from (lat, lon) to the given rows (all rows by default); NaN where unknown."""
+        xy = self.xy if rows is None else self.xy[rows]
+        return np.hypot(*(xy - self.project(lat, lon)).T)
+
+    def within(self, lat: float, lon: float, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, distances) of every indexed point within radius_m, unsorted."""
+        x, y = self.project(lat, lon)
+        c = self.cell_m
+        x0, x1 = int(math.floor((x - radius_m) / c)), int(math.floor((x + radius_m) / c))
+        y0, y1 = int(math.floor((y - radius_m) / c)), int(math.floor((y + radius_m) / c))
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(self._cells):
+            # Radius bigger than the populated area: walking the dict beats enumerating empty cells
+            buckets = [r for (cx, cy), r in self._cells.items() if x0 <= cx <= x1 and y0 <= cy <= y1]
+        else:
+            cells = self._cells
+            buckets = [cells[(cx, cy)] for cx in range(x0, x1 + 1) for cy in range(y0, y1 + 1) if (cx, cy) in cells]
+        if not buckets:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        rows = np.concatenate(buckets)
+        dist = np.hypot(self.xy[rows, 0] - x, self.xy[rows, 1] - y)
+        keep = dist <= radius_m
+        return rows[keep], dist[keep]
+
+    def max_reach(self, lat: float, lon: float) -> float:
+        """A radius around (lat, lon) that covers every indexed point."""
+        p = self.project(lat, lon)
+        corners = np.array([self._min_xy, self._max_xy])
+        return float(np.hypot(*np.abs(corners - p).max(axis=0))) + self.cell_m
+
+    def nearest(self, lat: float, lon: float, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """k nearest rows as (row, metres), nearest first. Grows the search radius until k are found."""
+        reach = self.max_reach(lat, lon)
+        radius = self.cell_m
+        while True:
+            rows, dist = self.within(lat, lon, radius)
+            if mask is not None:
+                keep = mask[rows]
+                rows, dist = rows[keep], dist[keep]
+            # Everything within `radius` is in hand, so once k are found the top k are exact.
+            if len(rows) >= k or radius >= reach:
+                top = np.argsort(dist)[:k]
+                return [(int(rows[i]), float(dist[i])) for i in top]
+            radius *= 2
+
+
+# --- USER LOCATION ---
+
+def polygon_centroid(polygon: List[List[float]]) -> Tuple[float, float]:
+    lats = [p[0] for p in polygon]
+    lons = [p[1] for p in polygon]
+    return sum(lats) / len(lats), sum(lons) / len(lons)
+
+
+class LocationResolver:
+    """
+    Turns AgentState.user_location into a coordinate: either "lat,lon" or a terminal
+    ("Terminal 2" / "2") looked up in the airport registry (airports.json). Anything else
+    (e.g. just the airport code) resolves to None and ranking stays purely semantic.
+    """
+
+    def __init__(self, registry: Dict[str, dict]):
+        self._terminals: Dict[Tuple[str, str], Tuple[float, float]] = {}
+        for code, airport in registry.items():
+            for terminal in airport.get("terminals", []):
+                self._terminals[(code.upper(), str(terminal["id"]).upper())] = polygon_centroid(terminal["polygon"])
+
+    @classmethod
+    def from_registry_file(cls, path: Optional[str] = None) -> "LocationResolver":
+        from airport_extractor import load_registry, REGISTRY_PATH
+        try:
+            return cls(load_registry(path or REGISTRY_PATH))
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("⚠️ Could not load airport registry, location-aware ranking disabled", extra={"error": str(e)})
+            return cls({})
+
+    def resolve(self, airport_code: str, location: Optional[str]) -> Optional[Tuple[float, float]]:
+        if not location:
+            return None
+        match = LATLON_PATTERN.match(location)
+        if match:
+            return float(match.group(1)), float(match.group(2))
+        match = TERMINAL_PATTERN.match(location)
+        if match:
+            return self._terminals.get(((airport_code or "").upper(), match.group(1).upper()))
+        return None
+
+
+# --- GEOJSON ---
+# seed_database.py stores a GeoJSON `location` next to lat/lon, with a 2dsphere index, so the data
+# can be queried with $geoNear in Atlas. The agent itself ranks by distance with GridIndex only.
+
+def geo_point(lat: float, lon: float) -> dict:
+    return {"type": "Point", "coordinates": [lon, lat]}
+
+
+def ensure_geo_index(collection, field: str = "location"):
+    collection.create_index([(field, "2dsphere")])
@@ -0,0 +1,176 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from telemetry import log
+
+# The live fields simulate_airport.py (or a real feed) writes under `metadata`.
+STATUS_FIELDS = ("is_open_now", "wait_time_minutes", "last_updated_ts")
+
+
+class LocalStatusBus:
+    """
+    In-process stand-in for a MongoDB change stream. Publishers call publish(); every
+    subscriber gets (amenity_id, metadata_fields) synchronously. Handy for running the
+    status table (and everything listening to it) without Atlas.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable] = []
+
+    def subscribe(self, callback: Callable):
+        self._subscribers.append(callback)
+
+    def publish(self, amenity_id, fields: dict):
+        for callback in list(self._subscribers):
+            callback(amenity_id, fields)
+
+
+class AmenityStatusTable:
+    """
+    Process-local copy of every amenity's live status, keyed by `_id`.
+    Bootstrapped with one bulk read and kept current by a change stream (watch() does both),
+    or bootstrap() + a LocalStatusBus (attach()). Readers never touch the database.
+    """
+
+    def __init__(self):
+        self._status: Dict = {}
+        self._lock = threading.Lock()
+        self._listeners: List[Callable] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.updates = 0
+        self.last_event_at: Optional[float] = None
+
+    def __len__(self):
+        return len(self._status)
+
+    def __contains__(self, amenity_id):
+        return amenity_id in self._status
+
+    # --- READS ---
+
+    def get(self, amenity_id) -> Optional[dict]:
+        return self._status.get(amenity_id)
+
+    def get_many(self, amenity_ids: Iterable) -> Dict:
+        status = self._status
+        return {i: status[i] for i in amenity_ids if i in status}
+
+    def timestamps(self, amenity_ids: Iterable) -> Dict:
+        status = self._status
+        return {i: status[i].get("last_updated_ts") for i in amenity_ids if i in status}
+
+    # --- WRITES ---
+
+    def on_change(self, callback: Callable):
+        """callback(amenity_id, new_status) after every applied update (e.g. cache invalidation)."""
+        self._listeners.append(callback)
+
+    def apply(self, amenity_id, fields: dict):
+        fields = {k: v for k, v in fields.items() if k in STATUS_FIELDS}
+        if not fields:
+            return
+        with self._lock:
+            # Copy-on-write so readers holding the old dict never see a half-applied update.
+            merged = dict(self._status.get(amenity_id, {}), **fields)
+            self._status[amenity_id] = merged
+            self.updates += 1
+            self.last_event_at = time.time()
+        for callback in self._listeners:
+            try:
+                callback(amenity_id, merged)
+            except Exception as e:
+                log.warning("⚠️ Status listener failed", extra={"amenity_id": str(amenity_id), "error": str(e)})
+
+    def bootstrap(self, collection, query: Optional[dict] = None) -> int:
+        projection = {f"metadata.{field}": 1 for field in STATUS_FIELDS}
+        fresh = {
+            doc["_id"]: {k: v for k, v in (doc.get("metadata") or {}).items() if k in STATUS_FIELDS}
+            for doc in collection.find(query or {}, projection)
+        }
+        with self._lock:
+            self._status = fresh
+        return len(fresh)
+
+    def attach(self, bus: LocalStatusBus):
+        bus.subscribe(self.apply)
+
+    # --- CHANGE STREAM ---
+
+    def _apply_change(self, change: dict):
+        amenity_id = change["documentKey"]["_id"]
+        if change["operationType"] == "delete":
+            with self._lock:
+                self._status.pop(amenity_id, None)
+            return
+        if change["operationType"] == "update":
+            # updatedFields uses dotted paths: {"metadata.is_open_now": False, ...}
+            updated = change.get("updateDescription", {}).get("updatedFields", {})
+            fields = {k.split(".", 1)[1]: v for k, v in updated.items() if k.startswith("metadata.")}
+            fields.update(updated.get("metadata") or {})
+        else:  # insert / replace carry the whole document
+            fields = (change.get("fullDocument") or {}).get("metadata") or {}
+        self.apply(amenity_id, fields)
+
+    def _open_synced(self, collection, pipeline, query: Optional[dict] = None):
+        """Opens the change stream, THEN takes the snapshot: anything written in between comes through the stream."""
+        stream = collection.watch(pipeline)
+        try:
+            self.bootstrap(collection, query)
+        except Exception:
+            stream.close()
+            raise
+        return stream
+
+    def watch(self, collection, retry_seconds: float = 5.0) -> int:
+        """
+        Bootstraps the table and follows the collection's change stream on a daemon thread; returns
+        how many amenities were loaded. The stream is opened before the snapshot is read, so an update
+        racing the bulk read is still delivered (re-applying one is harmless). After an error the
+        stream resumes from its last token, or re-syncs the same way if it can't.
+        """
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        try:
+            stream = self._open_synced(collection, pipeline)
+        except Exception as e:
+            log.warning("⚠️ Amenity change stream unavailable, serving a snapshot", extra={"error": str(e), "retry_seconds": retry_seconds})
+            stream = None
+            self.bootstrap(collection)
+
+        def run():
+            current, resume_token = stream, None
+            while not self._stop.is_set():
+                try:
+                    if current is None:
+                        current = (collection.watch(pipeline, resume_after=resume_token) if resume_token is not None
+                                   else self._open_synced(collection, pipeline))
+                    with current:
+                        for change in current:
+                            self._apply_change(change)
+                            resume_token = current.resume_token
+                            if self._stop.is_set():
+                                return
+                    current = None
+                except Exception as e:
+                    if current is None:
+                        resume_token = None  # Couldn't (re)open from the token: next attempt re-syncs
+                    current = None
+                    log.warning("⚠️ Amenity change stream interrupted, reconnecting", extra={"error": str(e), "retry_seconds": retry_seconds})
+                    if self._stop.wait(retry_seconds):
+                        return
+
+        self._watcher = threading.Thread(target=run, name="amenity-status-watch", daemon=True)
+        self._watcher.start()
+        return len(self)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self) -> dict:
+        return {
+            "amenities": len(self._status),
+            "updates": self.updates,
+            "seconds_since_last_event": round(time.time() - self.last_event_at, 1) if self.last_event_at else None,
+            "watching": bool(self._watcher and self._watcher.is_alive()),
+        }
@@ -0,0 +1,275 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    from opentelemetry import trace as otel_trace  # Optional: spans also go to OpenTelemetry when enabled
+except ImportError:
+    otel_trace = None
+
+# In-process metrics for the graph: span timings (nodes and external calls) as histograms,
+# counters (routes, ...), and the stats() of every cache/gateway, rendered for Prometheus at
+# /metrics. With TRACING=otel each span is also an OpenTelemetry span. Logging helpers at the end.
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram (Prometheus semantics), ms."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)  # Last slot: +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, ms: float):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += ms
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation (coarse, like histogram_quantile)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(LATENCY_BUCKETS_MS + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Span:
+    __slots__ = ("name", "attributes", "elapsed_ms", "error")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.elapsed_ms = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+
+class Telemetry:
+    """
+    span("llm.invoke", node="scout"): times the block into a histogram keyed by span name
+    (attributes go to OpenTelemetry only, so Prometheus cardinality stays bounded).
+    count("route", intent="scout"): labelled counter.
+    add_source("semantic_cache", cache.stats): numeric fields exported as gauges at scrape time.
+    """
+
+    def __init__(self, namespace: str = "layover", enabled: bool = True, tracer=None):
+        self.namespace = namespace
+        self.enabled = enabled
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._errors: Dict[str, int] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._sources: Dict[str, Callable[[], dict]] = {}
+        self.started_at = time.time()
+
+    @classmethod
+    def from_env(cls) -> "Telemetry":
+        """METRICS=on|off, TRACING=off|otel (needs opentelemetry-api; exporters are configured the usual OTel way)."""
+        tracer = None
+        if os.getenv("TRACING", "off").lower() == "otel":
+            if otel_trace is None:
+                log.warning("⚠️ TRACING=otel but opentelemetry is not installed (`pip install opentelemetry-sdk`)")
+            else:
+                _install_otel_sdk()
+                tracer = otel_trace.get_tracer("layover_os")
+        return cls(enabled=os.getenv("METRICS", "on").lower() != "off", tracer=tracer)
+
+    # --- RECORDING ---
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = Span(name, attributes)
+        otel_span = self.tracer.start_as_current_span(name, attributes=attributes) if self.tracer else None
+        current = otel_span.__enter__() if otel_span else None
+        start, failure = time.perf_counter(), None
+        try:
+            yield span
+        except asyncio.CancelledError:
+            raise  # Abandoned work (e.g. an unused prefetch) is not a failure
+        except BaseException as e:
+            span.error, failure = type(e).__name__, e
+            raise
+        finally:
+            span.elapsed_ms = (time.perf_counter() - start) * 1000
+            if self.enabled:
+                self.observe(name, span.elapsed_ms, error=span.error is not None)
+            if otel_span:
+                if span.attributes:
+                    current.set_attributes(span.attributes)
+                otel_span.__exit__(type(failure) if failure else None, failure,
+                                   failure.__traceback__ if failure else None)
+
+    def observe(self, name: str, ms: float, error: bool = False):
+        """Records a duration measured elsewhere (e.g. a node timed by the graph wrapper)."""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(ms)
+            if error:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    def count(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def add_source(self, name: str, stats: Callable[[], dict]):
+        self._sources[name] = stats
+
+    # --- EXPORT ---
+
+    def snapshot(self) -> dict:
+        """JSON view: per-span count/mean/p50/p95/p99 (bucket bounds), counters."""
+        with self._lock:
+            spans = {
+                name: {"count": h.count, "errors": self._errors.get(name, 0),
+                       "mean_ms": round(h.total / h.count, 2) if h.count else None,
+                       "p50_ms": h.quantile(0.5), "p95_ms": h.quantile(0.95), "p99_ms": h.quantile(0.99)}
+                for name, h in sorted(self._histograms.items())
+            }
+            counters: Dict[str, dict] = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels) or "total"] = value
+        return {"uptime_seconds": round(time.time() - self.started_at, 1), "spans": spans, "counters": counters}
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        ns = self.namespace
+        lines = [f"# TYPE {ns}_span_duration_ms histogram"]
+        with self._lock:
+            histograms = [(name, list(h.counts), h.total, h.count) for name, h in sorted(self._histograms.items())]
+            errors = dict(self._errors)
+            counters = sorted(self._counters.items())
+        for name, counts, total, count in histograms:
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS_MS + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f'{ns}_span_duration_ms_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{ns}_span_duration_ms_sum{{span="{name}"}} {total:.3f}')
+            lines.append(f'{ns}_span_duration_ms_count{{span="{name}"}} {count}')
+        lines.append(f"# TYPE {ns}_span_errors_total counter")
+        lines += [f'{ns}_span_errors_total{{span="{name}"}} {n}' for name, n in sorted(errors.items())]
+        declared = set()
+        for (name, labels), value in counters:
+            if name not in declared:
+                lines.append(f"# TYPE {ns}_{name}_total counter")
+                declared.add(name)
+            lines.append(f"{ns}_{name}_total{_labels(labels)} {value:g}")
+        for source, stats in list(self._sources.items()):
+            try:
+                values = stats()
+            except Exception as e:  # A broken source must not break the scrape
+                log.warning("⚠️ Metrics source failed", extra={"source": source, "error": str(e)})
+                continue
+            lines += _gauges(f"{ns}_{source}", values)
+        lines.append(f"{ns}_uptime_seconds {time.time() - self.started_at:.1f}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _metric(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _gauges(prefix: str, values: dict, labels=()) -> list:
+    """
+    Numeric fields become gauges. A dict of dicts (per node / per intent) adds a `key` label;
+    a dict of numbers inside that (e.g. synthesis paths) adds a `name` label.
+    """
+    lines = []
+    for field, value in sorted(values.items(), key=lambda item: str(item[0])):
+        if isinstance(value, bool):
+            value = int(value)
+        if isinstance(value, (int, float)):
+            lines.append(f"{_metric(f'{prefix}_{field}')}{_labels(labels)} {value:g}")
+        elif isinstance(value, dict) and not labels:
+            lines += _gauges(prefix, value, (("key", field),))
+        elif isinstance(value, dict):
+            lines += [f"{_metric(f'{prefix}_{field}')}{_labels(labels + (('name', name),))} {n:g}"
+                      for name, n in sorted(value.items()) if isinstance(n, (int, float))]
+    return lines
+
+
+def _install_otel_sdk():
+    """Sets up an OTLP exporter if the SDK is installed and nothing else configured a provider."""
+    try:
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+    except ImportError:
+        return  # API only: spans are no-ops unless the host (e.g. opentelemetry-instrument) installs a provider
+    if isinstance(otel_trace.get_tracer_provider(), TracerProvider):
+        return
+    provider = TracerProvider()
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))  # OTEL_EXPORTER_OTLP_* env vars apply
+    otel_trace.set_tracer_provider(provider)
+
+
+# --- LOGGING ---
+# Request-path messages go through `log` (logger "layover_os") instead of print():
+# LOG_LEVEL=WARNING silences them entirely, LOG_FORMAT=json emits one JSON object per line
+# with the `extra` fields as keys.
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", None, None).__dict__) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {"ts": round(record.created, 3), "level": record.levelname.lower(), "logger": record.name,
+                 "msg": record.getMessage()}
+        entry.update({k: v for k, v in record.__dict__.items() if k not in _RESERVED})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The message as before, then the structured fields as key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in record.__dict__.items() if k not in _RESERVED)
+        text = record.getMessage() + (f"  [{fields}]" if fields else "")
+        if record.exc_info:
+            text += "\n" + self.formatException(record.exc_info)
+        return text
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> logging.Logger:
+    logger = logging.getLogger("layover_os")
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if (fmt or os.getenv("LOG_FORMAT", "text")).lower() == "json"
+                         else TextFormatter())
+    logger.handlers[:] = [handler]
+    logger.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    logger.propagate = False
+    return logger
+
+
+log = configure_logging()
+telemetry = Telemetry.from_env()  # After `log`: from_env() may warn
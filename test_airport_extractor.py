@@ -0,0 +1,60 @@
+import json
+import os
+import shutil
+
+import pytest
+
+from airport_extractor import (DEFAULT_TERMINAL, OverpassClient, TerminalLocator, build_query, extract_all,
+                               iter_amenities, load_registry, main, output_path)
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "overpass", "sfo.json")
+SQUARE = [[0.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, 0.0]]
+NOTCH = [[0.0, 0.0], [0.0, 3.0], [3.0, 3.0], [3.0, 2.0], [1.0, 2.0], [1.0, 1.0], [3.0, 1.0], [3.0, 0.0]]  # A "C"
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    """An Overpass cache holding the SFO fixture under the key the real query maps to."""
+    client = OverpassClient(cache_dir=str(tmp_path / "cache"), offline=True)
+    shutil.copy(FIXTURE, client.cache_path("SFO", build_query(load_registry()["SFO"])))
+    return client.cache_dir
+
+
+def test_locate_uses_the_polygon_not_just_its_bounding_box():
+    locator = TerminalLocator([{"id": "C", "polygon": NOTCH}, {"id": "S", "polygon": SQUARE}])
+    assert locator.locate(0.5, 2.5) == "C"
+    assert locator.locate(2.0, 1.5) == DEFAULT_TERMINAL  # Inside the C's bounding box, in its notch
+    assert locator.locate(0.5, 0.5) == "C"  # First terminal listed wins where they overlap
+    assert locator.locate(-1.0, 0.5) == DEFAULT_TERMINAL
+
+
+def test_nodes_and_ways_of_one_place_are_deduplicated():
+    with open(FIXTURE) as f:
+        records = list(iter_amenities(load_registry()["SFO"], json.load(f)))
+    assert [(r["name"], r["terminal_id"], r["osm_id"]) for r in records] == [
+        ("Peet's Coffee", "2", "node/101"),        # The way 30 m away and the repeated node are the same café
+        ("Peet's Coffee", "1", "node/102"),        # Same name, another terminal: another café
+        ("Books Inc", "1", "node/103"),
+        ("Sankaku", "3", "node/104"),
+        ("Airport ATM", DEFAULT_TERMINAL, "node/105"),
+    ]  # Unnamed elements and ways without a center are skipped
+    assert records[2]["type"] == "books" and records[4]["desc"].endswith("in the general area at SFO airport.")
+
+
+def test_offline_extraction_writes_jsonl_from_the_cache(cache_dir, tmp_path):
+    out_dir = str(tmp_path / "out")
+    client = OverpassClient(cache_dir=cache_dir, offline=True)
+    assert extract_all(["sfo"], out_dir=out_dir, client=client) == {"SFO": 5}
+    with open(output_path(out_dir, "SFO")) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 5 and lines[0]["osm_id"] == "node/101"
+    assert not [name for name in os.listdir(out_dir) if name.endswith(".tmp")]
+
+
+def test_exit_status_is_non_zero_when_an_airport_fails(cache_dir, tmp_path):
+    args = ["--offline", "--cache-dir", cache_dir, "--out-dir", str(tmp_path / "out"), "--min-interval", "0"]
+    assert main(args + ["SFO"]) == 0
+    assert main(args + ["SFO", "JFK"]) == 1  # JFK isn't cached and offline mode can't fetch it
+    assert os.path.exists(output_path(str(tmp_path / "out"), "SFO"))
+    with pytest.raises(ValueError, match="XYZ"):
+        main(args + ["XYZ"])
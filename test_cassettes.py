@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+
+from cassettes import Cassette, CassetteChatModel, CassetteEmbeddings, CassetteMongoClient  # noqa: E402
+from fakes import FakeChatModel, FakeEmbeddings, Latency, mongo_clients  # noqa: E402
+
+DOCS = [{"name": name, "airport_code": "SFO", "type": kind}
+        for name, kind in [("Peet's Coffee", "cafe"), ("Books Inc", "shop"), ("Sankaku", "fast_food"),
+                           ("Blue Bottle", "cafe")]]
+PIPELINE = [{"$match": {"type": "cafe"}}, {"$group": {"_id": "$type", "n": {"$sum": 1}}}]
+
+
+def session(cassette, sync, asynchronous, embedder=None, llm=None):
+    """The calls a chat turn makes, through the cassette wrappers."""
+    amenities = CassetteMongoClient(sync, cassette)["layover_os"]["amenities"]
+    aamenities = CassetteMongoClient(asynchronous, cassette, asynchronous=True)["layover_os"]["amenities"]
+
+    async def aggregate():
+        return await (await aamenities.aggregate(PIPELINE)).to_list(None)
+
+    return {
+        "first_two": list(amenities.find({"airport_code": "SFO"}, {"_id": 0, "name": 1}).sort("name", 1).limit(2)),
+        "one": amenities.find_one({"name": "Sankaku"}, {"_id": 0}),
+        "cafes": asyncio.run(aggregate()),
+        "vector": CassetteEmbeddings(embedder, cassette).embed_query("coffee"),
+        "answer": asyncio.run(CassetteChatModel(inner=llm, cassette=cassette).ainvoke([HumanMessage("Hi")])).content,
+    }
+
+
+def record(path):
+    sync, asynchronous = mongo_clients(Latency(0))
+    sync["layover_os"]["amenities"].insert_many([dict(d) for d in DOCS])
+    cassette = Cassette(path, "record")
+    live = session(cassette, sync, asynchronous, FakeEmbeddings(Latency(0), dim=8), FakeChatModel(latency=Latency(0)))
+    cassette.close()
+    return live
+
+
+def test_replay_returns_what_was_recorded_without_any_backend(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    live = record(path)
+    assert [d["name"] for d in live["first_two"]] == ["Blue Bottle", "Books Inc"]
+    assert live["cafes"] == [{"_id": "cafe", "n": 2}]
+
+    cassette = Cassette(path, "replay")
+    assert session(cassette, None, None) == live  # No Mongo, no embedder, no LLM
+    assert cassette.stats()["misses"] == {}
+    # Writes are dropped on replay
+    assert CassetteMongoClient(None, cassette)["layover_os"]["amenities"].insert_one({"name": "New"}) is None
+
+
+def test_misses_are_lenient_unless_strict(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    record(path)
+
+    lenient = Cassette(path, "replay")
+    amenities = CassetteMongoClient(None, lenient)["layover_os"]["amenities"]
+    assert list(amenities.find({"airport_code": "JFK"})) == []
+    assert amenities.find_one({"name": "Nobody"}) is None
+    # sort/limit are part of the key: another limit is another request
+    assert list(amenities.find({"airport_code": "SFO"}, {"_id": 0, "name": 1}).sort("name", 1).limit(3)) == []
+    assert lenient.stats()["misses"] == {"mongo": 3}
+    with pytest.raises(LookupError):
+        CassetteEmbeddings(None, lenient).embed_query("tea")  # No harmless stand-in for a vector
+
+    strict = Cassette(path, "replay", strict=True)
+    with pytest.raises(LookupError, match="mongo"):
+        CassetteMongoClient(None, strict)["layover_os"]["amenities"].find_one({"name": "Nobody"})
+
+
+def test_recording_again_replaces_the_previous_session(tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    record(path)
+    cassette = Cassette(path, "record")
+    cassette.record("llm", "invoke", "k", "only this", 1.0)
+    cassette.close()
+    with open(path) as f:
+        assert len(f.readlines()) == 1
+    assert Cassette(path, "replay").replay("llm", "k") == "only this"
@@ -0,0 +1,176 @@
+import asyncio
+import threading
+from typing import Annotated, List, TypedDict
+
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Overwrite
+
+from checkpointing import CoalescingSaver, MemoryCheckpointStore, SQLiteCheckpointStore, fold_summary, windowed
+
+WINDOW = 4
+CONFIG = {"configurable": {"thread_id": "t1"}}
+
+
+class CountingStore(MemoryCheckpointStore):
+    """MemoryCheckpointStore that records every save() and the thread each load() ran on."""
+
+    def __init__(self):
+        super().__init__()
+        self.saves = []
+        self.load_threads = []
+
+    def load(self, thread_id, ns):
+        self.load_threads.append(threading.current_thread())
+        return super().load(thread_id, ns)
+
+    def save(self, thread_id, ns, row, changed, removed):
+        self.saves.append((thread_id, sorted(changed), list(removed)))
+        super().save(thread_id, ns, row, changed, removed)
+
+
+def build_graph(checkpointer):
+    """agent_graph's shape: supervisor -> answer -> compact, several checkpoints per turn."""
+
+    class State(TypedDict):
+        messages: Annotated[List[str], windowed(WINDOW * 4)]
+        summary: str
+        next_step: str
+
+    def compact(state):
+        messages = state["messages"]
+        if len(messages) <= WINDOW:
+            return {}
+        return {"messages": Overwrite(messages[-WINDOW:]),
+                "summary": fold_summary(state.get("summary", ""), messages[:-WINDOW])}
+
+    builder = StateGraph(State)
+    builder.add_node("supervisor", lambda state: {"next_step": "scout"})
+    builder.add_node("scout", lambda state: {"messages": [f"answer to {state['messages'][-1]}"]})
+    builder.add_node("compact", compact)
+    builder.add_edge(START, "supervisor")
+    builder.add_edge("supervisor", "scout")
+    builder.add_edge("scout", "compact")
+    builder.add_edge("compact", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_turns_coalesce_into_one_store_write_per_flush():
+    store = CountingStore()
+    saver = CoalescingSaver(store)
+    graph = build_graph(saver)
+    for turn in range(3):
+        graph.invoke({"messages": [f"q{turn}"]}, CONFIG)
+    assert saver.puts > 3 and store.saves == []  # Puts only touch memory
+    assert saver.flush() == 1
+    assert len(store.saves) == 1
+    assert saver.flush() == 0  # Nothing changed since
+
+
+def test_flush_writes_only_changed_channels():
+    store = CountingStore()
+    saver = CoalescingSaver(store)
+    graph = build_graph(saver)
+    graph.invoke({"messages": ["q0"]}, CONFIG)
+    saver.flush()
+    graph.update_state(CONFIG, {"next_step": "planner"})
+    saver.flush()
+    assert "messages" in store.saves[0][1]
+    assert store.saves[1][1] == ["next_step"]
+
+
+def test_latest_checkpoint_survives_a_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    saver = CoalescingSaver(SQLiteCheckpointStore(path))
+    graph = build_graph(saver)
+    for turn in range(5):
+        graph.invoke({"messages": [f"q{turn}"]}, CONFIG)
+    saver.close()  # Shutdown flush
+
+    restarted = CoalescingSaver(SQLiteCheckpointStore(path))
+    latest = restarted.get_tuple(CONFIG)
+    assert latest.checkpoint["channel_values"]["messages"] == ["q3", "answer to q3", "q4", "answer to q4"]
+    # An older checkpoint id isn't kept
+    old = {"configurable": {"thread_id": "t1", "checkpoint_ns": "", "checkpoint_id": latest.parent_config["configurable"]["checkpoint_id"]}}
+    assert restarted.get_tuple(old) is None
+    # ...and the next turn continues the same thread
+    build_graph(restarted).invoke({"messages": ["q5"]}, CONFIG)
+    assert restarted.get_tuple(CONFIG).checkpoint["channel_values"]["messages"][-1] == "answer to q5"
+
+
+def test_close_flushes_pending_turns():
+    store = CountingStore()
+    saver = CoalescingSaver(store, flush_seconds=3600).start()
+    build_graph(saver).invoke({"messages": ["q0"]}, CONFIG)
+    assert store.saves == []
+    saver.close()
+    assert [thread for thread, _, _ in store.saves] == ["t1"]
+
+
+def test_async_first_load_runs_off_the_event_loop():
+    store = CountingStore()
+    seed = CoalescingSaver(store)
+    build_graph(seed).invoke({"messages": ["q0"]}, CONFIG)
+    seed.flush()
+
+    saver = CoalescingSaver(store)
+
+    async def scenario():
+        loop_thread = threading.current_thread()
+        latest = await saver.aget_tuple(CONFIG)
+        return loop_thread, latest
+
+    loop_thread, latest = asyncio.run(scenario())
+    assert latest.checkpoint["channel_values"]["messages"] == ["q0", "answer to q0"]
+    assert store.load_threads[-1] is not loop_thread
+    loads = len(store.load_threads)
+    asyncio.run(saver.aget_tuple(CONFIG))
+    assert len(store.load_threads) == loads  # Now served from memory
+
+
+def test_evicts_only_flushed_threads():
+    saver = CoalescingSaver(MemoryCheckpointStore(), max_threads=2)
+    graph = build_graph(saver)
+    for thread in ("a", "b", "c"):
+        graph.invoke({"messages": ["hi"]}, {"configurable": {"thread_id": thread}})
+    assert saver.stats()["threads_in_memory"] == 3  # All dirty: nothing may be dropped yet
+    saver.flush()
+    graph.invoke({"messages": ["hi"]}, {"configurable": {"thread_id": "d"}})
+    assert saver.stats()["threads_in_memory"] == 2
+    assert saver.get_tuple({"configurable": {"thread_id": "a"}}) is not None  # Reloaded from the store
+
+
+def test_dropped_messages_fold_into_the_summary_across_restarts(tmp_path):
+    path = str(tmp_path / "cp.sqlite3")
+    saver = CoalescingSaver(SQLiteCheckpointStore(path))
+    graph = build_graph(saver)
+    for turn in range(5):
+        graph.invoke({"messages": [f"q{turn}"]}, CONFIG)
+    saver.close()
+
+    state = build_graph(CoalescingSaver(SQLiteCheckpointStore(path))).get_state(CONFIG).values
+    assert len(state["messages"]) == WINDOW
+    assert state["summary"].splitlines()[:2] == ["- q0", "- answer to q0"]
+    assert "- q3" not in state["summary"]  # Still in the window
+
+
+def test_fold_summary_is_bounded_oldest_first():
+    summary = ""
+    for turn in range(100):
+        summary = fold_summary(summary, [f"turn {turn} " + "x" * 200], max_chars=300, line_chars=40)
+    lines = summary.splitlines()
+    assert len(summary) <= 300 and all(len(line) <= 42 for line in lines)
+    assert lines[-1].startswith("- turn 99 ") and lines[-1].endswith("…")
+
+
+def test_agent_prompts_carry_the_summary_and_earlier_turns():
+    import agent_graph
+
+    messages = [f"m{i}" for i in range(agent_graph.MESSAGE_WINDOW + 3)]
+    update = asyncio.run(agent_graph.compact_node({"messages": messages, "summary": "- m-1"}))
+    assert update["messages"].value == messages[3:]
+    assert update["summary"] == "- m-1\n- m0\n- m1\n- m2"
+
+    prompt = agent_graph.with_history("sys", {"messages": ["q1", "a1", "q2"], "summary": "- old"}).content
+    assert prompt.startswith("sys") and "- old\n- q1\n- a1" in prompt
+    assert "q2" not in prompt  # The current question goes in the human message
+    assert agent_graph.with_history("sys", {"messages": ["q1"], "summary": ""}).content == "sys"
@@ -0,0 +1,74 @@
+import asyncio
+import threading
+
+from embedding_cache import CachedEmbeddings
+
+
+class SlowEmbeddings:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return [float(len(text)), 1.0]
+
+
+class BlockingStore:
+    """put() blocks until released, so a synchronous write would stall the caller."""
+
+    def __init__(self):
+        self.vectors = {}
+        self.release = threading.Event()
+
+    def get(self, key, ttl_seconds):
+        return self.vectors.get(key)
+
+    def put(self, key, model_name, vector):
+        self.release.wait(5)
+        self.vectors[key] = vector
+
+
+def test_concurrent_misses_share_one_embed_call():
+    embedder = SlowEmbeddings()
+    cache = CachedEmbeddings(embedder, "test")
+
+    async def run():
+        return await asyncio.gather(*[cache.aembed_query(q) for q in ["Coffee?", "coffee", " COFFEE "] * 3])
+
+    vectors = asyncio.run(run())
+    assert embedder.calls == 1
+    assert all(v == vectors[0] for v in vectors)
+    assert cache.misses == 1 and cache.coalesced == 8
+
+
+def test_cancelled_owner_does_not_fail_waiters():
+    embedder = SlowEmbeddings()
+    cache = CachedEmbeddings(embedder, "test")
+
+    async def run():
+        owner = asyncio.create_task(cache.aembed_query("coffee"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.aembed_query("coffee"))
+        await asyncio.sleep(0)
+        owner.cancel()
+        return await waiter
+
+    assert asyncio.run(run()) == [6.0, 1.0]
+    assert embedder.calls == 2
+
+
+def test_persistent_write_happens_in_the_background():
+    store = BlockingStore()
+    cache = CachedEmbeddings(SlowEmbeddings(delay=0), "test", store=store)
+
+    async def run():
+        vector = await asyncio.wait_for(cache.aembed_query("coffee"), timeout=1)  # Not held up by put()
+        assert store.vectors == {}
+        store.release.set()
+        await cache.aflush()
+        return vector
+
+    vector = asyncio.run(run())
+    assert list(store.vectors.values()) == [vector]
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from embedding_providers import HashedTfidfEmbeddings, build_embeddings
+
+CORPUS = [
+    "Peet's Coffee (cafe). Located in Terminal 2. Espresso and pastries.",
+    "Sankaku (restaurant). Located in Terminal 3. Sushi and ramen.",
+    "Bank of America (atm). Located in the General Area.",
+]
+
+
+def test_vectors_are_identical_across_processes():
+    """crc32 buckets, not hash(): another interpreter with another hash seed gets the same vector."""
+    script = ("import json; from embedding_providers import HashedTfidfEmbeddings; "
+              f"print(json.dumps(HashedTfidfEmbeddings(dim=64).embed_query({CORPUS[0]!r})))")
+    env = dict(os.environ, PYTHONHASHSEED="12345")
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, env=env, check=True,
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert json.loads(out.stdout) == HashedTfidfEmbeddings(dim=64).embed_query(CORPUS[0])
+
+
+def test_vectors_are_normalized_and_lexical():
+    embedder = HashedTfidfEmbeddings(dim=256)
+    query, coffee, atm = map(np.array, embedder.embed_documents(["coffee espresso", CORPUS[0], CORPUS[2]]))
+    assert np.linalg.norm(coffee) == pytest.approx(1.0, abs=1e-6)
+    assert query @ coffee > query @ atm
+    assert embedder.embed_query("") == [0.0] * 256
+
+
+def test_idf_round_trips_and_checks_the_dimension(tmp_path):
+    path = str(tmp_path / "idf.json")
+    fitted = HashedTfidfEmbeddings(dim=64).fit(CORPUS)
+    fitted.save_idf(path)
+
+    loaded = HashedTfidfEmbeddings(dim=64, idf_path=path)
+    np.testing.assert_array_equal(loaded.idf, fitted.idf)
+    assert loaded.embed_query("sushi") == fitted.embed_query("sushi")
+    assert loaded.model_name == fitted.model_name
+    with pytest.raises(ValueError, match="dim=64"):
+        HashedTfidfEmbeddings(dim=128, idf_path=path)
+
+
+def test_model_name_changes_with_the_idf():
+    plain = HashedTfidfEmbeddings(dim=64)
+    fitted = HashedTfidfEmbeddings(dim=64).fit(CORPUS)
+    refitted = HashedTfidfEmbeddings(dim=64).fit(CORPUS[:2])
+    assert len({plain.model_name, fitted.model_name, refitted.model_name}) == 3
+    assert HashedTfidfEmbeddings(dim=128).model_name != plain.model_name
+    assert HashedTfidfEmbeddings(dim=64).fit(CORPUS).model_name == fitted.model_name
+
+
+def test_build_embeddings_names_the_hashed_model(tmp_path):
+    path = str(tmp_path / "idf.json")
+    HashedTfidfEmbeddings(dim=32).fit(CORPUS).save_idf(path)
+    embedder, model_name = build_embeddings("hashed", dim=32, idf_path=path)
+    assert model_name == embedder.model_name and embedder.dim == 32
+    with pytest.raises(ValueError, match="Unknown embedding provider"):
+        build_embeddings("word2vec")
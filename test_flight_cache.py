@@ -0,0 +1,112 @@
+import asyncio
+
+from flight_cache import FlightStatusCache
+
+
+class Flights:
+    """Just enough of a collection: find_one / find by flight_number, counting queries."""
+
+    def __init__(self, docs):
+        self.docs = {d["flight_number"]: d for d in docs}
+        self.queries = 0
+
+    async def find_one(self, query):
+        self.queries += 1
+        return self.docs.get(query["flight_number"])
+
+    def find(self, query):
+        self.queries += 1
+        return [self.docs[n] for n in query["flight_number"]["$in"] if n in self.docs]
+
+
+def update(doc):
+    return {"operationType": "update", "documentKey": {"_id": doc["_id"]}, "fullDocument": doc}
+
+
+def test_change_stream_only_refreshes_flights_on_the_board():
+    flights = Flights([{"_id": 1, "flight_number": "UA400", "gate": "G1"}])
+    cache = FlightStatusCache()
+    asyncio.run(cache.aget("UA400", flights))
+    cache._apply_change(update({"_id": 1, "flight_number": "UA400", "gate": "G9"}))
+    cache._apply_change(update({"_id": 2, "flight_number": "DL300", "gate": "B2"}))  # Nobody asked
+    assert cache.get("UA400") == (True, {"_id": 1, "flight_number": "UA400", "gate": "G9"})
+    assert cache.get("DL300") == (False, None)
+    assert len(cache) == 1 and cache.updates == 1
+
+
+def test_board_is_bounded_least_recently_asked_first():
+    flights = Flights([{"_id": i, "flight_number": f"UA{i}00"} for i in range(1, 5)])
+    cache = FlightStatusCache(max_entries=2)
+
+    async def ask(*numbers):
+        for number in numbers:
+            await cache.aget(number, flights)
+
+    asyncio.run(ask("UA100", "UA200", "UA100", "UA300"))
+    assert set(cache._entries) == {"UA100", "UA300"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_refresh_sweeps_expired_entries():
+    flights = Flights([{"_id": 1, "flight_number": "UA400"}])
+    cache = FlightStatusCache(ttl_seconds=60, miss_ttl_seconds=10, active_seconds=0)
+    asyncio.run(cache.aget("UA400", flights))
+    asyncio.run(cache.aget("XX999", flights))  # Typo: remembered as "not found" briefly
+    cache._entries["XX999"] = (None, 0.0)  # ...and that was long ago
+    cache.refresh(flights)
+    assert list(cache._entries) == ["UA400"]
+
+
+class DroppingStream:
+    """Yields its events, then drops the connection."""
+
+    def __init__(self, events):
+        self.events = events
+        self.resume_token = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def __iter__(self):
+        for i, event in enumerate(self.events):
+            self.resume_token = {"_data": i}
+            yield event
+        raise ConnectionError("stream dropped")
+
+
+class FlakyFlights(Flights):
+    """watch(): unavailable once, then a stream that drops after one change, then whatever resumes."""
+
+    def __init__(self, docs, cache):
+        super().__init__(docs)
+        self.cache = cache
+        self.watches = []
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        self.watches.append((resume_after, self.queries))
+        if len(self.watches) == 1:
+            raise ConnectionError("no replica set yet")
+        if len(self.watches) == 2:
+            return DroppingStream([update({"_id": 1, "flight_number": "UA400", "gate": "G9"})])
+        self.cache.stop()
+        return DroppingStream([])
+
+
+def test_change_stream_retries_with_backoff_and_resumes_from_its_token(monkeypatch):
+    cache = FlightStatusCache()
+    flights = FlakyFlights([{"_id": 1, "flight_number": "UA400", "gate": "G1"}], cache)
+    asyncio.run(cache.aget("UA400", flights))
+    waits = []
+    monkeypatch.setattr(cache._stop, "wait", lambda seconds: waits.append(seconds) or cache._stop.is_set())
+
+    cache._watch(flights, retry_seconds=1.0)  # Returns once stop() is called
+    # Unavailable: retried after 1s, and that fresh stream re-pulled the board (one find)
+    assert [token for token, _ in flights.watches] == [None, None, {"_data": 0}]
+    assert flights.watches[2][1] == flights.watches[1][1] + 1
+    # The change came through and the drop after it resumed from its token
+    assert cache.get("UA400") == (True, {"_id": 1, "flight_number": "UA400", "gate": "G9"})
+    # Backoff: reset by the change, doubled by the drop that brought no change
+    assert waits == [1.0, 1.0, 2.0] and cache.stats()["stream_errors"] == 3
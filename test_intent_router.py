@@ -0,0 +1,98 @@
+from intent_router import IntentRouter, load_airport_codes, load_intent_table
+
+TABLE = load_intent_table("intents.json")
+
+
+def router(airports=("SFO", "JFK", "DEN")):
+    return IntentRouter(TABLE, airports)
+
+
+class Airports:
+    """Just enough of a collection: distinct("airport_code")."""
+
+    def __init__(self, codes):
+        self.codes = codes
+
+    def distinct(self, field):
+        assert field == "airport_code"
+        return self.codes
+
+
+def test_priority_planner_then_flight_tracker_then_bursar_then_scout():
+    r = router()
+    assert r.classify("I have a 2 hour layover, can I book a flight?").intent == "planner"
+    assert r.classify("Can I book a flight?").intent == "flight_tracker"
+    assert r.classify("Can I book a lounge?").intent == "bursar"
+    assert r.classify("Where is the nearest coffee?").intent == "scout"
+
+
+def test_flight_code_is_matched_before_words():
+    decision = router().classify("Plan around TO1234")
+    assert decision.flight_code == "TO1234"
+    assert decision.signals == ["code:TO1234"]  # Not the word "to" (which would fire plan+to)
+    assert decision.confidence == 0.95
+
+
+def test_flight_code_with_punctuation_and_inside_longer_words():
+    assert router().classify("Status of UA400?").flight_code == "UA400"
+    assert router().classify("(dl1234), please").flight_code == "DL1234"
+    assert router().classify("My booking ref is ABC12345").flight_code is None  # Not a whole-word code
+
+
+def test_keywords_match_whole_words_and_inflections():
+    r = router()
+    assert r.classify("Any flights to Denver?").intent == "flight_tracker"
+    assert r.classify("Still purchasing a pass").intent == "bursar"
+    assert r.classify("Is there a bookstore?").intent == "scout"  # "book" only as a whole word
+
+
+def test_airports_are_whole_words_first_mention_wins():
+    r = router()
+    assert r.classify("Is there a garden?").airport_code is None  # Not DEN
+    assert r.classify("I'm at SFO.").airport_code == "SFO"
+    assert r.classify("From JFK, connecting at SFO").airport_code == "JFK"
+
+
+def test_phrases_and_compound_rules():
+    r = router()
+    decision = r.classify("How can I kill time here?")
+    assert decision.intent == "planner" and "kw:kill time" in decision.signals
+    assert r.classify("I have 3 hours").intent == "planner"
+    assert r.classify("I have 20 minutes").intent == "planner"
+    assert r.classify("Plan my trip to JFK").intent == "flight_tracker"
+    assert r.classify("I have a question").intent == "scout"  # Only one of have+hour
+
+
+def test_layover_alone_is_not_a_plan():
+    r = router()
+    assert r.classify("Where to eat on my layover?").intent == "scout"
+    assert r.classify("Best lounge during my layover").intent == "scout"
+    assert r.classify("Coffee on my layover").intent == "scout"
+    assert r.classify("Can I book a lounge on my layover?").intent == "bursar"
+    # ...but a layover with a time budget is one
+    decision = r.classify("What can I do on a 3 hour layover?")
+    assert decision.intent == "planner" and "all_of:hour+layover" in decision.signals
+    assert r.classify("45 minute layover, anything nearby?").intent == "planner"
+    assert r.classify("My layovers are 90 minutes").intent == "planner"
+
+
+def test_corroborating_signals_raise_confidence_capped():
+    r = router()
+    assert r.classify("buy").confidence == 0.8
+    assert r.classify("buy or pay").confidence == 0.85
+    assert r.classify("flight UA400 boarding").confidence == 0.99
+
+
+def test_airport_codes_union_database_and_table():
+    assert load_airport_codes(Airports(["sfo", "LAX", None]), TABLE["airports"]) == ["DEN", "JFK", "LAX", "SFO"]
+    r = IntentRouter.from_file("intents.json", collection=Airports(["LAX"]))
+    assert r.classify("landing at LAX").airport_code == "LAX"
+    assert r.classify("landing at DEN").airport_code == "DEN"  # In the table, not seeded yet
+
+
+def test_airport_codes_fall_back_to_table_when_database_fails():
+    class Broken:
+        def distinct(self, field):
+            raise RuntimeError("no db")
+
+    assert load_airport_codes(Broken(), ["sfo"]) == ["SFO"]
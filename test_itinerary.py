@@ -0,0 +1,139 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import agent_graph
+from itinerary import Stop, plan_itinerary, travel_matrix
+from prefetch import PrefetchRegistry
+from walking_graph import WalkingGraph
+
+NODES = [{"id": "T1", "kind": "terminal", "terminal": "1", "lat": 37.6, "lon": -122.4},
+         {"id": "F", "kind": "gates", "terminal": "1", "lat": 37.6, "lon": -122.4},
+         {"id": "G", "kind": "gates", "terminal": "2", "lat": 37.6, "lon": -122.4}]  # No walkway reaches G
+
+
+class Graphs:
+    def __init__(self, graph):
+        self.graph = graph
+
+    async def aget(self, airport):
+        return self.graph
+
+
+class Flights:
+    def __init__(self, doc):
+        self.doc = doc
+
+    async def aget(self, flight_number, collection):
+        return self.doc
+
+
+def plan(monkeypatch, query, gate, boarding_in_min):
+    boarding = (datetime.now(timezone.utc) + timedelta(minutes=boarding_in_min)).isoformat()
+    services = vars(agent_graph)  # setitem, not setattr: reading a missing service would init() them all
+    monkeypatch.setitem(services, "prefetcher", PrefetchRegistry(lambda run, message: None))
+    monkeypatch.setitem(services, "walking_graphs", Graphs(WalkingGraph("SFO", NODES, [{"a": "T1", "b": "F", "minutes": 8}])))
+    monkeypatch.setitem(services, "flight_cache", Flights({"gate": gate, "boarding_time": boarding}))
+    monkeypatch.setitem(services, "aflights_collection", None)
+    state = {"messages": [query], "airport_code": "SFO", "user_location": "Terminal 1", "summary": ""}
+    update = asyncio.run(agent_graph.planner_node(state, {"configurable": {"thread_id": "t"}}))
+    return update["messages"][0], update.get("flight_number")
+
+
+def test_planner_says_when_the_gate_is_unreachable(monkeypatch):
+    response, flight = plan(monkeypatch, "Plan my time before UA400", gate="G7", boarding_in_min=90)
+    assert "can't find a walking route" in response and "gate G7" in response
+    assert "inf" not in response
+    assert flight == "UA400"
+
+
+def test_planner_says_when_boarding_has_passed(monkeypatch):
+    response, _ = plan(monkeypatch, "Plan my time before UA400", gate="F3", boarding_in_min=-20)
+    assert "Boarding is due now or has passed" in response and "~8 min walk" in response
+    # Inside the boarding buffer counts too
+    response, _ = plan(monkeypatch, "Plan my time before UA400", gate="F3", boarding_in_min=5)
+    assert "Boarding is due now or has passed" in response
+
+
+# --- SOLVER ---
+
+def random_instance(rng, stops=8):
+    """A connected walkway graph with amenities anchored near its nodes."""
+    nodes = [{"id": f"n{i}", "kind": "gates", "terminal": "1", "lat": 37.6 + 0.002 * i, "lon": -122.4 + 0.001 * (i % 3)}
+             for i in range(6)]
+    edges = [{"a": f"n{i}", "b": f"n{i + 1}", "minutes": float(rng.integers(2, 12))} for i in range(5)]
+    edges += [{"a": f"n{i}", "b": f"n{j}", "minutes": float(rng.integers(2, 20))}
+              for i, j in rng.choice(6, size=(3, 2)) if i != j]
+    graph = WalkingGraph("SYN", nodes, edges)
+    docs = [{"_id": f"a{k}", "lat": 37.6 + 0.002 * rng.uniform(0, 5), "lon": -122.4 + 0.002 * rng.uniform(0, 1)}
+            for k in range(stops)]
+    graph.attach_amenities(docs)
+    picks = [Stop(d["_id"], d["_id"], float(rng.uniform(0.1, 1.0)), float(rng.integers(3, 40))) for d in docs]
+    return graph, picks
+
+
+def exact_value(times, values, dwell, budget):
+    """Held-Karp over (visited set, last stop): the earliest arrival, then the best set that still reaches the end."""
+    m = len(values)
+    start, end = m, m + 1
+    inf = float("inf")
+    arrive = [[inf] * m for _ in range(1 << m)]
+    for j in range(m):
+        arrive[1 << j][j] = times[start][j] + dwell[j]
+    best = 0.0 if times[start][end] <= budget else None
+    for mask in range(1, 1 << m):
+        for last in range(m):
+            t = arrive[mask][last]
+            if t == inf:
+                continue
+            if t + times[last][end] <= budget + 1e-6:
+                best = max(best, sum(values[j] for j in range(m) if mask >> j & 1))
+            for j in range(m):
+                if not mask >> j & 1:
+                    nxt = mask | 1 << j
+                    arrive[nxt][j] = min(arrive[nxt][j], t + times[last][j] + dwell[j])
+    return best
+
+
+def assert_feasible(graph, plan, start, end, budget):
+    times = travel_matrix(graph, start, end, [s.id for s in plan.stops])
+    m = len(plan.stops)
+    points = [m] + list(range(m)) + [m + 1]
+    assert plan.legs == pytest.approx([times[a][b] for a, b in zip(points, points[1:])])
+    assert plan.total_minutes <= budget + 0.05  # total is rounded to 0.1 min
+    assert plan.total_minutes == pytest.approx(sum(plan.legs) + sum(s.dwell_minutes for s in plan.stops), abs=0.05)
+
+
+def test_plan_matches_an_exact_dp_on_small_instances():
+    rng = np.random.default_rng(7)
+    for _ in range(40):
+        graph, stops = random_instance(rng)
+        start, end = "n0", f"n{rng.integers(0, 6)}"
+        budget = float(rng.uniform(20, 150))
+        times = travel_matrix(graph, start, end, [s.id for s in stops])
+        expected = exact_value(times, [s.value for s in stops], [s.dwell_minutes for s in stops], budget)
+
+        plan = plan_itinerary(graph, start, end, stops, budget, deadline_ms=5000)
+        if expected is None:
+            assert plan is None  # Not even the direct walk fits
+            continue
+        assert plan.optimal
+        assert plan.value == pytest.approx(expected)
+        assert_feasible(graph, plan, start, end, budget)
+    # Less time than the direct walk to the gate: no plan at all
+    assert plan_itinerary(graph, "n0", "n5", stops, graph.minutes("n0", "n5") - 1) is None
+
+
+def test_deadline_returns_a_feasible_anytime_plan():
+    rng = np.random.default_rng(11)
+    graph, stops = random_instance(rng, stops=22)
+    stops = [s._replace(dwell_minutes=2.0) for s in stops]  # Short stops: a huge search space
+    budget = 100.0  # Room for about half of them
+    started = time.perf_counter()
+    plan = plan_itinerary(graph, "n0", "n5", stops, budget, deadline_ms=20)
+    assert time.perf_counter() - started < 1.0
+    assert not plan.optimal and plan.stops
+    assert_feasible(graph, plan, "n0", "n5", budget)
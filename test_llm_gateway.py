@@ -0,0 +1,127 @@
+import asyncio
+from types import SimpleNamespace
+
+from llm_gateway import LLMGateway, prompt_key
+
+
+class ScriptedLLM:
+    """ainvoke() sleeps for the next scripted delay (the last one repeats) and records how each call ended."""
+
+    def __init__(self, *delays):
+        self.delays = list(delays) or [0.01]
+        self.calls = 0
+        self.cancelled = []
+
+    async def ainvoke(self, messages):
+        delay = self.delays[min(self.calls, len(self.delays) - 1)]
+        self.calls += 1
+        call = self.calls
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled.append(call)
+            raise
+        return SimpleNamespace(content=f"answer {call}")
+
+
+def gateway(llm, **kwargs):
+    kwargs.setdefault("hedge_after_ms", None)
+    return LLMGateway(llm, **kwargs)
+
+
+def test_identical_prompts_share_one_upstream_call():
+    llm = ScriptedLLM(0.05)
+    gw = gateway(llm)
+
+    async def run():
+        return await asyncio.gather(*[gw.ainvoke("Where is coffee?", node="scout") for _ in range(5)])
+
+    assert asyncio.run(run()) == ["answer 1"] * 5
+    assert llm.calls == 1
+    assert gw.stats()["scout"]["coalesced"] == 4
+
+
+def test_cacheable_answers_expire_after_the_ttl():
+    llm = ScriptedLLM()
+    gw = gateway(llm, cache_ttl=60)
+
+    async def run():
+        first = await gw.ainvoke("Hello", cacheable=True)
+        second = await gw.ainvoke("Hello", cacheable=True)
+        text, created_at = gw._cache[prompt_key("Hello")]
+        gw._cache[prompt_key("Hello")] = (text, created_at - 61)  # ...and a minute passes
+        third = await gw.ainvoke("Hello", cacheable=True)
+        return first, second, third
+
+    assert asyncio.run(run()) == ("answer 1", "answer 1", "answer 2")
+    assert llm.calls == 2 and gw.stats()["default"]["cache_hits"] == 1
+    assert asyncio.run(gw.ainvoke("Hello")) == "answer 3"  # Not cacheable: always asks
+
+
+def test_hedge_fires_after_the_delay_and_the_loser_is_cancelled():
+    llm = ScriptedLLM(1.0, 0.01)  # The primary stalls, the hedge is quick
+    gw = gateway(llm, hedge_after_ms=30)
+
+    async def run():
+        text = await gw.ainvoke("Plan my layover", node="planner")
+        await asyncio.sleep(0)  # Let the cancellation land
+        return text
+
+    assert asyncio.run(run()) == "answer 2"
+    assert llm.cancelled == [1]
+    stats = gw.stats()["planner"]
+    assert stats["hedges"] == 1 and stats["hedge_wins"] == 1 and stats["llm_calls"] == 2
+
+
+def test_no_hedge_when_the_primary_is_fast():
+    llm = ScriptedLLM(0.01)
+    gw = gateway(llm, hedge_after_ms=200)
+    assert asyncio.run(gw.ainvoke("Quick")) == "answer 1"
+    assert llm.calls == 1 and gw.stats()["default"]["hedges"] == 0
+
+
+def test_budget_timeout_returns_the_fallback():
+    llm = ScriptedLLM(0.5)
+    gw = gateway(llm, budget_ms=50)
+    assert asyncio.run(gw.ainvoke("Slow", fallback="template")) == "template"
+    stats = gw.stats()["default"]
+    assert stats["fallbacks"] == 1 and stats["errors"] == 1
+    assert stats["p50_ms"] < 400  # Gave up at the budget, not when the LLM finished
+
+
+def test_zero_budget_is_honoured_not_replaced_by_the_default():
+    gw = gateway(ScriptedLLM(0.2), budget_ms=5000)
+    assert asyncio.run(gw.ainvoke("Now", fallback="template", budget_ms=0)) == "template"
+
+
+def test_shedding_under_the_rate_limit_returns_the_fallback():
+    llm = ScriptedLLM(0.01)
+    gw = gateway(llm, rate_per_second=0.1, burst=1, budget_ms=100)
+
+    async def run():
+        return [await gw.ainvoke(f"Question {i}", fallback="template") for i in range(2)]
+
+    assert asyncio.run(run()) == ["answer 1", "template"]
+    assert llm.calls == 1 and gw.stats()["default"]["shed"] == 1
+
+
+def test_cancelled_leader_does_not_fail_its_followers():
+    llm = ScriptedLLM(0.1)
+    gw = gateway(llm)
+
+    async def run():
+        leader = asyncio.create_task(gw.ainvoke("Coffee?"))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(gw.ainvoke("Coffee?", fallback="template")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()  # e.g. that client disconnected
+        return await asyncio.gather(*followers)
+
+    # One follower takes over the call, the others follow it
+    assert asyncio.run(run()) == ["answer 2"] * 3
+    assert llm.calls == 2 and llm.cancelled == [1]
+    assert gw.stats()["default"]["fallbacks"] == 0
+
+
+def test_no_llm_means_fallback():
+    assert asyncio.run(LLMGateway(None).ainvoke("Hi", fallback="template")) == "template"
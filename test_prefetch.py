@@ -0,0 +1,39 @@
+import asyncio
+
+from prefetch import PrefetchRegistry
+
+
+def test_concurrent_requests_keep_their_own_prefetch():
+    async def scenario():
+        started = []
+
+        def launcher(run, message):
+            started.append(message)
+            run.launch("embed", asyncio.sleep(0.01, result=f"vector for {message}"))
+
+        registry = PrefetchRegistry(launcher)
+        first = registry.start("request-1", "coffee?")
+        second = registry.start("request-2", "coffee?")  # Same thread, same text, different request
+        assert first is not second and started == ["coffee?", "coffee?"]
+        assert registry.start("request-1", "coffee?") is first  # Nodes joining the request reuse it
+        results = await asyncio.gather(first.take("embed"), second.take("embed"))
+        return results, registry.finish("request-1"), registry.finish("request-2"), registry.finish("request-1")
+
+    results, first_timings, second_timings, again = asyncio.run(scenario())
+    assert results == ["vector for coffee?", "vector for coffee?"]
+    assert "embed" in first_timings and "embed" in second_timings
+    assert again == {}
+
+
+def test_finish_cancels_unused_work():
+    async def scenario():
+        registry = PrefetchRegistry(lambda run, message: run.launch("flight", asyncio.sleep(10)))
+        run = registry.start("request-1", "UA400?")
+        task = run.tasks["flight"]
+        await asyncio.sleep(0)  # Let it start
+        timings = registry.finish("request-1")
+        await asyncio.sleep(0)
+        return task, timings
+
+    task, timings = asyncio.run(scenario())
+    assert task.cancelled() and timings["flight_cancelled"] == 1.0
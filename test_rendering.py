@@ -0,0 +1,34 @@
+import string
+
+from rendering import TEMPLATES, SynthesisPolicy, Template, render
+
+
+def test_template_renders_like_str_format():
+    source = "{name!r} waits {wait:>3}m at {where}, {{literal}}"
+    fields = {"name": "Peet's", "wait": 5, "where": "Terminal 2"}
+    assert Template(source).render(**fields) == source.format(**fields)
+    for name, template in TEMPLATES.items():
+        fields = {f: f"<{f}>" for _, f, _, _ in string.Formatter().parse(template.source) if f}
+        assert render(name, **fields) == template.source.format(**fields)
+
+
+def test_policy_calls_the_llm_only_for_judgement_within_budget():
+    policy = SynthesisPolicy(budget_ms=1000)
+    assert policy.decide("scout", "which is best for a quiet nap?", hits=3) == (True, "complex_query")
+    assert policy.decide("scout", "which is best?", hits=1) == (False, "few_hits")
+    assert policy.decide("scout", "coffee", hits=5) == (False, "simple_query")
+    assert policy.decide("scout", "why this one?", hits=5, llm_p50_ms=2000) == (False, "over_budget")
+    assert policy.decide("scout", "coffee", hits=5, mode="llm") == (True, "forced")
+    assert policy.decide("scout", "why?", hits=5, mode="template") == (False, "forced")
+    assert policy.decide("scout", "why?", hits=5, llm_available=False) == (False, "no_llm")
+
+
+def test_stats_estimate_llm_time_saved_by_templates():
+    policy = SynthesisPolicy()
+    policy.record("scout", False, "simple_query")
+    policy.record("scout", False, "simple_query")
+    policy.record("scout", False, "no_llm")  # Not a saving: there was no LLM to call
+    policy.record("scout", True, "complex_query")
+    stats = policy.stats({"scout": 800.0})["scout"]
+    assert stats["templated"] == 2 and stats["llm_ms_saved_est"] == 1600.0
+    assert stats["paths"] == {"template:simple_query": 2, "template:no_llm": 1, "llm:complex_query": 1}
@@ -0,0 +1,96 @@
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from seed_database import _legacy_source_id, process_batch, to_document  # noqa: E402
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+class Amenities:
+    """mongomock collection whose bulk_write applies UpdateOne ops one by one (its own doesn't take them)."""
+
+    def __init__(self):
+        self.collection = mongomock.MongoClient().db.amenities
+
+    def find(self, *args):
+        return self.collection.find(*args)
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self.collection.update_one(op._filter, op._doc, upsert=op._upsert)
+
+
+ITEM = {"name": "Peet's Coffee", "type": "cafe", "lat": 37.6160001, "lon": -122.3860001, "terminal_id": "2"}
+
+
+def seeded():
+    collection = Amenities()
+    embeddings = CountingEmbeddings()
+    assert process_batch(collection, embeddings, [to_document(ITEM, "SFO")]) == (1, 0)
+    return collection, embeddings
+
+
+def test_unchanged_record_is_skipped():
+    collection, embeddings = seeded()
+    assert process_batch(collection, embeddings, [to_document(ITEM, "SFO")]) == (0, 1)
+    assert len(embeddings.texts) == 1
+
+
+def test_moved_amenity_is_updated_in_place_without_re_embedding():
+    collection, embeddings = seeded()
+    moved = dict(ITEM, lat=ITEM["lat"] + 0.0005, lon=ITEM["lon"] - 0.0005)  # ~70 m away
+    assert process_batch(collection, embeddings, [to_document(moved, "SFO")]) == (1, 0)
+    assert collection.collection.count_documents({}) == 1
+    doc = collection.collection.find_one()
+    assert doc["lat"] == moved["lat"] and doc["location"]["coordinates"] == [moved["lon"], moved["lat"]]
+    assert doc["embedding"] and len(embeddings.texts) == 1
+
+
+def test_identity_is_the_osm_id_when_present():
+    with_osm = dict(ITEM, osm_id="node/42")
+    assert to_document(with_osm, "SFO")["source_id"] == to_document(dict(with_osm, name="Peet's"), "SFO")["source_id"]
+    assert to_document(with_osm, "SFO")["source_id"] != to_document(dict(ITEM, osm_id="node/43"), "SFO")["source_id"]
+    assert to_document(ITEM, "SFO")["source_id"] == to_document(dict(ITEM, lat=0.0, lon=0.0), "SFO")["source_id"]
+
+
+def test_description_change_is_re_embedded():
+    collection, embeddings = seeded()
+    assert process_batch(collection, embeddings, [to_document(dict(ITEM, desc="Now with oat milk."), "SFO")]) == (1, 0)
+    assert len(embeddings.texts) == 2
+    assert collection.collection.count_documents({}) == 1
+
+
+def test_document_keyed_the_old_way_is_adopted_not_duplicated():
+    collection, embeddings = seeded()
+    doc = to_document(ITEM, "SFO")
+    collection.collection.update_one({}, {"$set": {"source_id": _legacy_source_id(doc)}})
+    assert process_batch(collection, embeddings, [doc]) == (1, 0)  # Re-keyed, same vector
+    moved = to_document(dict(ITEM, lat=ITEM["lat"] + 0.001), "SFO")
+    assert process_batch(collection, embeddings, [moved]) == (1, 0)
+    assert [d["source_id"] for d in collection.collection.find()] == [moved["source_id"]]
+    assert len(embeddings.texts) == 1
+
+
+def test_edited_description_makes_parallel_fields_pending_again(tmp_path):
+    from migrate_embeddings import iter_pending, migrate
+
+    collection, embeddings = seeded()
+    idf_path = str(tmp_path / "idf.json")
+    field, model_name, _ = migrate(collection, "hashed", idf_path=idf_path, dim=64)
+    assert list(iter_pending(collection, field, model_name)) == []  # A rerun has nothing to do
+    before = collection.collection.find_one()[field]
+
+    process_batch(collection, embeddings, [to_document(dict(ITEM, desc="Now with oat milk."), "SFO")])
+    assert [len(batch) for batch in iter_pending(collection, field, model_name)] == [1]
+    migrate(collection, "hashed", idf_path=idf_path, dim=64)
+    doc = collection.collection.find_one()
+    assert doc[field] != before and list(iter_pending(collection, field, model_name)) == []
+    assert list(iter_pending(collection, "embedding", "voyage-3-large")) == []  # seed_database's own hash
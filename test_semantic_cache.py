@@ -0,0 +1,43 @@
+from semantic_cache import SemanticResponseCache
+
+
+def doc(amenity_id, ts=1.0):
+    return {"_id": amenity_id, "metadata": {"last_updated_ts": ts}}
+
+
+def filled():
+    cache = SemanticResponseCache(threshold=0.99, ttl_seconds=0, ts_lookup=lambda ids: {i: 1.0 for i in ids})
+    cache.store("SFO", "2", "coffee", [1.0, 0.0, 0.0], "Go to Peet's", [doc("peets"), doc("blue")])
+    cache.store("SFO", "3", "bar", [0.0, 1.0, 0.0], "Try the Lounge", [doc("lounge")])
+    cache.store("JFK", None, "coffee", [1.0, 0.0, 0.0], "Go to Blue", [doc("blue")])
+    return cache
+
+
+def test_invalidate_drops_only_answers_built_from_those_amenities():
+    cache = filled()
+    assert cache.invalidate_amenities(["blue", "nowhere"]) == 2
+    assert cache.lookup("SFO", "2", [1.0, 0.0, 0.0]) is None
+    assert cache.lookup("JFK", None, [1.0, 0.0, 0.0]) is None
+    assert cache.lookup("SFO", "3", [0.0, 1.0, 0.0]) == "Try the Lounge"
+    assert cache.stats()["entries"] == 1 and cache.invalidations == 2
+
+
+def test_reverse_index_follows_every_removal():
+    cache = filled()
+    cache.invalidate_amenities(["peets"])
+    assert set(cache._by_amenity) == {"blue", "lounge"}  # peets' entry (and its blue link) is gone
+    assert cache.invalidate_amenities(["blue"]) == 1
+
+    cache = SemanticResponseCache(max_entries_per_bucket=1, ttl_seconds=0)
+    cache.store("SFO", "2", "coffee", [1.0, 0.0], "old", [doc("a")])
+    cache.store("SFO", "2", "tea", [0.0, 1.0], "new", [doc("b")])  # Evicts "old"
+    assert set(cache._by_amenity) == {"b"}
+    cache.clear()
+    assert cache._by_amenity == {}
+
+
+def test_stale_entry_is_unindexed():
+    cache = SemanticResponseCache(threshold=0.99, ttl_seconds=0, ts_lookup=lambda ids: {i: 2.0 for i in ids})
+    cache.store("SFO", "2", "coffee", [1.0, 0.0], "Go to Peet's", [doc("peets", ts=1.0)])
+    assert cache.lookup("SFO", "2", [1.0, 0.0]) is None  # Peet's changed since
+    assert cache._by_amenity == {} and cache.stale == 1
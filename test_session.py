@@ -0,0 +1,60 @@
+from session import SessionStore, request_context
+
+
+def test_request_context_normalizes_what_the_client_knows():
+    assert request_context(" sfo ", "Gate F12", flight_number=" ua400 ") == {
+        "airport_code": "SFO", "user_location": "Gate F12", "flight_number": "UA400"}
+    assert request_context("San Francisco", flight_number="400") == {}  # Neither looks like a code
+
+
+def test_terminal_shorthand_fills_a_placeholder_location():
+    assert request_context(user_location="unknown", terminal=" 2 ") == {"user_location": "Terminal 2"}
+    assert request_context(user_location="", terminal="3") == {"user_location": "Terminal 3"}
+    assert request_context(user_location="Gate F12", terminal="2") == {"user_location": "Gate F12"}  # Location wins
+    assert request_context(user_location="N/A") == {}
+
+
+def test_coordinates_are_kept_as_the_location():
+    assert request_context("SFO", " 37.6159,-122.3861 ") == {"airport_code": "SFO", "user_location": "37.6159,-122.3861"}
+
+
+def test_an_airport_code_as_location_only_sets_the_airport():
+    assert request_context(user_location="JFK") == {"airport_code": "JFK"}
+    assert request_context("SFO", "JFK") == {"airport_code": "SFO"}  # The explicit airport wins
+    assert request_context(user_location="JFK", terminal="4") == {"airport_code": "JFK", "user_location": "Terminal 4"}
+
+
+def test_unchanged_client_field_does_not_override_what_the_chat_learned():
+    store = SessionStore()
+    assert store.merge("t", {"airport_code": "SFO"}) == {"airport_code": "SFO"}
+    store.remember("t", {"airport_code": "JFK"})  # "I'm at JFK now"
+    assert store.merge("t", {"airport_code": "SFO"}) == {"airport_code": "JFK"}  # Same default as before
+    assert store.merge("t", {"airport_code": "DEN"}) == {"airport_code": "DEN"}  # The client changed it
+
+
+def test_remember_ignores_none_and_an_empty_flight_number_clears_it():
+    store = SessionStore()
+    store.remember("t", {"flight_number": "UA400", "user_location": None, "messages": ["ignored"]})
+    assert store.get("t") == {"flight_number": "UA400"}
+    store.remember("t", {"flight_number": ""})  # Turned out not to exist
+    assert store.get("t") == {}
+
+
+def test_sessions_expire_after_the_ttl():
+    store = SessionStore(ttl_seconds=60)
+    store.merge("t", {"airport_code": "SFO", "user_location": "Terminal 2"})
+    store._sessions["t"]["updated_at"] -= 61
+    assert store.get("t") == {}
+    # A client repeating the same fields after expiry is a new session, not "unchanged"
+    assert store.merge("t", {"airport_code": "SFO"}) == {"airport_code": "SFO"}
+
+
+def test_least_recently_used_sessions_are_evicted_first():
+    store = SessionStore(max_sessions=2)
+    store.merge("a", {"airport_code": "SFO"})
+    store.merge("b", {"airport_code": "JFK"})
+    store.remember("a", {"flight_number": "UA400"})  # Touches "a"
+    store.merge("c", {"airport_code": "DEN"})
+    assert len(store) == 2
+    assert store.get("b") == {}
+    assert store.get("a") == {"airport_code": "SFO", "flight_number": "UA400"}
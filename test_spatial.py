@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from spatial_index import LocationResolver, hybrid_scores
+from vector_index import AtlasRetriever, LocalVectorIndex
+
+mongomock = pytest.importorskip("mongomock")
+from fakes import FakeEmbeddings, Latency, seed  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def airport():
+    embedder = FakeEmbeddings(Latency(0))
+    db = mongomock.MongoClient()["layover_os"]
+    seed(db, embedder)
+    index = LocalVectorIndex.from_collection(db["amenities"], "SFO")
+    origin = LocationResolver.from_registry_file().resolve("SFO", "Terminal 2")
+    return index, embedder, origin
+
+
+def top_types(airport, query: str, weight: float, k: int = 3):
+    index, embedder, origin = airport
+    hits = index.hybrid_search(embedder.embed_query(query), k, origin, weight)
+    return [index.payloads[row]["type"] for row, _, _ in hits]
+
+
+@pytest.mark.parametrize("weight", [0.3, 0.6])
+def test_nearest_coffee_is_a_coffee_place(airport, weight):
+    assert top_types(airport, "Where is the nearest coffee?", weight) == ["cafe"] * 3
+
+
+@pytest.mark.parametrize("weight", [0.3, 0.6])
+def test_closer_restrooms_never_outrank_the_bar_asked_for(airport, weight):
+    assert top_types(airport, "which bar is best", weight)[0] == "bar"
+
+
+def test_hybrid_search_matches_brute_force(airport):
+    index, embedder, origin = airport
+    for query in ["Where is the nearest coffee?", "quiet lounge with wifi", "nearest restroom", "phone charger"]:
+        vector = embedder.embed_query(query)
+        got = index.hybrid_search(vector, 3, origin, 0.6, candidates=4)
+        want = index.hybrid_brute_force(vector, 3, origin, 0.6)
+        assert [row for row, _, _ in got] == [row for row, _, _ in want]
+
+
+def test_proximity_boost_is_bounded():
+    # Right next to you vs. unknown distance: at most a (1 + weight) lift
+    scores = hybrid_scores([0.5, 0.5], [0.0, np.nan], 0.6)
+    assert scores[0] == pytest.approx(0.8)
+    assert scores[1] == pytest.approx(0.5)
+
+
+def test_atlas_rerank_keeps_irrelevant_hits_below_relevant_ones():
+    origin = (37.6160, -122.3840)
+    docs = [
+        {"_id": 1, "name": "Peet's Coffee", "score": 0.80, "lat": 37.6190, "lon": -122.3840},  # ~330 m away
+        {"_id": 2, "name": "Restrooms", "score": 0.62, "lat": 37.6160, "lon": -122.3840},      # right here
+    ]
+    ranked = AtlasRetriever._rerank(docs, 2, origin, 0.6)
+    assert [d["name"] for d in ranked] == ["Peet's Coffee", "Restrooms"]
@@ -0,0 +1,78 @@
+import threading
+import time
+
+from status_cache import AmenityStatusTable
+
+
+class ScriptedStream:
+    """A change stream that yields the events queued on it, then blocks until closed."""
+
+    def __init__(self, events, fail_after=False):
+        self.events = events
+        self.fail_after = fail_after
+        self.resume_token = None
+        self.closed = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __iter__(self):
+        for i, event in enumerate(self.events):
+            self.resume_token = {"_data": i}
+            yield event
+        if self.fail_after:
+            raise ConnectionError("stream dropped")
+        self.closed.wait()
+
+    def close(self):
+        self.closed.set()
+
+
+class RacingCollection:
+    """The update to amenity 1 lands after the stream opens but before the snapshot is read."""
+
+    def __init__(self):
+        self.calls = []
+        self.docs = {1: {"is_open_now": True, "wait_time_minutes": 5}}
+        self.streams = []
+
+    def watch(self, pipeline, resume_after=None):
+        self.calls.append(("watch", resume_after))
+        events = []
+        if len(self.streams) == 0:
+            self.docs[1] = {"is_open_now": False, "wait_time_minutes": 5}  # ...written right now
+            events = [{"operationType": "update", "documentKey": {"_id": 1},
+                       "updateDescription": {"updatedFields": {"metadata.is_open_now": False}}}]
+        stream = ScriptedStream(events, fail_after=len(self.streams) == 0)
+        self.streams.append(stream)
+        return stream
+
+    def find(self, query, projection):
+        self.calls.append(("find", None))
+        return [{"_id": i, "metadata": dict(m)} for i, m in self.docs.items()]
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_stream_opens_before_snapshot_and_resumes_after_error():
+    collection = RacingCollection()
+    table = AmenityStatusTable()
+    try:
+        assert table.watch(collection, retry_seconds=0.01) == 1
+        assert collection.calls[:2] == [("watch", None), ("find", None)]
+        assert table.get(1)["is_open_now"] is False
+        # The first stream drops after its event: reopen from its resume token, no full re-sync
+        assert wait_for(lambda: len(collection.calls) >= 3)
+        assert collection.calls[2] == ("watch", {"_data": 0})
+    finally:
+        table.stop()
+        for stream in collection.streams:
+            stream.close()
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from transcripts import MemoryTranscriptStore, MongoTranscriptStore, decode_cursor, encode_cursor
+
+mongomock = pytest.importorskip("mongomock")
+from fakes import Latency, mongo_clients  # noqa: E402
+
+
+def mongo_store(clients=None) -> MongoTranscriptStore:
+    sync, asynchronous = clients or mongo_clients(Latency(0))
+    db, adb = sync["layover_os"], asynchronous["layover_os"]
+    return MongoTranscriptStore(db["transcripts"], adb["transcripts"], db["transcript_counters"],
+                                adb["transcript_counters"])
+
+
+@pytest.fixture(params=["memory", "mongo"])
+def store(request):
+    return MemoryTranscriptStore() if request.param == "memory" else mongo_store()
+
+
+async def fill(store, thread_id: str, turns: int):
+    for turn in range(turns):
+        await store.append(thread_id, [("user", f"q{turn}"), ("assistant", f"a{turn}")])
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(42)) == 42
+    assert decode_cursor(None) is None and decode_cursor("") is None
+    for bad in ("abc", "-1"):
+        with pytest.raises(ValueError):
+            decode_cursor(bad)
+
+
+def test_append_numbers_messages_per_thread(store):
+    async def scenario():
+        first = await store.append("t1", [("user", "hi"), ("assistant", "hello")])
+        other = await store.append("t2", [("user", "yo")])
+        second = await store.append("t1", [("user", "coffee?")])
+        return first, other, second
+
+    first, other, second = asyncio.run(scenario())
+    assert [r["seq"] for r in first] == [1, 2]
+    assert [r["seq"] for r in other] == [1]
+    assert [r["seq"] for r in second] == [3]
+
+
+def test_latest_page_then_scroll_back(store):
+    async def scenario():
+        await fill(store, "t", 6)  # seq 1..12
+        latest, more = await store.page("t", limit=5)
+        older, more_older = await store.page("t", before=latest[0]["seq"], limit=5)
+        oldest, more_oldest = await store.page("t", before=older[0]["seq"], limit=5)
+        return latest, more, older, more_older, oldest, more_oldest
+
+    latest, more, older, more_older, oldest, more_oldest = asyncio.run(scenario())
+    assert [r["seq"] for r in latest] == [8, 9, 10, 11, 12] and more
+    assert [r["seq"] for r in older] == [3, 4, 5, 6, 7] and more_older
+    assert [r["seq"] for r in oldest] == [1, 2] and not more_oldest
+
+
+def test_catch_up_after_cursor(store):
+    async def scenario():
+        await fill(store, "t", 3)  # seq 1..6
+        newer, more = await store.page("t", after=2, limit=3)
+        rest, more_rest = await store.page("t", after=newer[-1]["seq"], limit=3)
+        return newer, more, rest, more_rest
+
+    newer, more, rest, more_rest = asyncio.run(scenario())
+    assert [r["seq"] for r in newer] == [3, 4, 5] and more
+    assert [r["seq"] for r in rest] == [6] and not more_rest
+
+
+def test_workers_sharing_a_thread_never_reuse_a_seq():
+    clients = mongo_clients(Latency(0))
+    workers = [mongo_store(clients), mongo_store(clients)]
+
+    async def scenario():
+        await asyncio.gather(*(workers[i % 2].append("shared", [("user", f"m{i}")]) for i in range(20)))
+        return await workers[0].page("shared", limit=50)
+
+    rows, more = asyncio.run(scenario())
+    assert [r["seq"] for r in rows] == list(range(1, 21)) and not more
+
+
+def test_counter_resumes_after_rows_logged_without_one():
+    clients = mongo_clients(Latency(0))
+    sync = clients[0]["layover_os"]
+    sync["transcripts"].insert_many([{"thread_id": "old", "seq": s, "role": "user", "text": "x", "ts": 0}
+                                     for s in (1, 2, 3)])
+    new = asyncio.run(mongo_store(clients).append("old", [("user", "again")]))
+    assert new[0]["seq"] == 4
+
+
+def test_failed_write_raises():
+    class FailingInserts:
+        def __init__(self, inner):
+            self.inner = inner
+
+        def __getattr__(self, name):
+            return getattr(self.inner, name)
+
+        async def insert_many(self, docs, **kwargs):
+            raise ConnectionError("primary stepped down")
+
+    store = mongo_store()
+    store.acollection = FailingInserts(store.acollection)
+    with pytest.raises(ConnectionError):
+        asyncio.run(store.append("t", [("user", "lost?")]))
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+hnswlib = pytest.importorskip("hnswlib")
+
+from vector_index import LocalVectorIndex, _synthetic_index, recall_at_k  # noqa: E402
+
+RECALL_THRESHOLD = 0.9
+
+
+@pytest.fixture(scope="module")
+def index():
+    return _synthetic_index(3000, 32, terminals=4, seed=7)
+
+
+@pytest.fixture(scope="module")
+def queries(index):
+    # Jittered copies of stored vectors, as in the recall CLI
+    rng = np.random.default_rng(11)
+    sample = index.vectors[rng.integers(0, len(index), 50)]
+    return sample + rng.normal(0, 0.05, sample.shape).astype(np.float32)
+
+
+def test_hnsw_recall_matches_brute_force(index, queries):
+    assert index.hnsw is not None
+    assert recall_at_k(index, queries, k=10) >= RECALL_THRESHOLD
+
+
+def test_terminal_filter_only_returns_that_terminal(index, queries):
+    assert recall_at_k(index, queries, k=10, terminal="2") >= RECALL_THRESHOLD
+    for query in queries[:10]:
+        for method in (index.search, index.brute_force):
+            rows = [row for row, _ in method(query, 10, "2")]
+            assert len(rows) == 10
+            assert {index.payloads[row]["terminal_id"] for row in rows} == {"2"}
+
+
+def test_unknown_terminal_returns_nothing(index, queries):
+    assert index.search(queries[0], 5, "9") == []
+    assert index.brute_force(queries[0], 5, "9") == []
+
+
+def test_filter_narrower_than_k_returns_what_there_is():
+    vectors = np.eye(4, dtype=np.float32)
+    payloads = [{"name": str(i), "terminal_id": t} for i, t in enumerate("1112")]
+    small = LocalVectorIndex("SYN", list(range(4)), vectors, payloads, use_hnsw=True)
+    assert [row for row, _ in small.search(vectors[3], 3, "2")] == [3]
+    assert [row for row, _ in small.search(vectors[0], 5)][0] == 0
@@ -0,0 +1,57 @@
+import numpy as np
+
+from walking_graph import WalkingGraph
+
+
+def synthetic(size=40, seed=3):
+    rng = np.random.default_rng(seed)
+    nodes = [{"id": f"n{i}", "lat": 37.6, "lon": -122.4} for i in range(size)]
+    edges = [{"a": f"n{i}", "b": f"n{j}", "minutes": float(rng.integers(1, 10))}
+             for i in range(size) for j in rng.choice(size, 2, replace=False) if i != j]
+    return WalkingGraph("SYN", nodes, edges), rng
+
+
+def rebuilt(graph):
+    """A full Floyd–Warshall build over the graph's current edges."""
+    edges = [{"a": graph.ids[i], "b": graph.ids[j], "minutes": w}
+             for i, neighbours in enumerate(graph._adj) for j, w in neighbours.items() if i < j]
+    return WalkingGraph(graph.airport_code, graph.nodes, edges)
+
+
+def assert_matches_full_rebuild(graph):
+    np.testing.assert_allclose(graph.dist, rebuilt(graph).dist, rtol=1e-5)
+    for a in graph.ids[:10]:
+        for b in graph.ids[-10:]:
+            path = graph.path(a, b)
+            if not np.isfinite(graph.minutes(a, b)):
+                assert path == []
+                continue
+            assert path[0] == a and path[-1] == b
+            walked = sum(graph._adj[graph.index[u]][graph.index[v]] for u, v in zip(path, path[1:]))
+            assert abs(walked - graph.minutes(a, b)) < 1e-3
+
+
+def test_edge_closures_and_retimes_match_a_full_rebuild():
+    graph, rng = synthetic()
+    edges = [(graph.ids[i], graph.ids[j]) for i, nb in enumerate(graph._adj) for j in nb if i < j]
+    for step in range(30):
+        a, b = edges[int(rng.integers(len(edges)))]
+        action = step % 3
+        if action == 0:
+            graph.set_edge(a, b, None)                              # Closure
+        elif action == 1:
+            graph.set_edge(a, b, float(rng.integers(10, 30)))      # Slower
+        else:
+            graph.set_edge(a, b, float(rng.integers(1, 3)) / 2)    # Faster (or reopened)
+        assert_matches_full_rebuild(graph)
+
+
+def test_close_and_reopen_node_round_trips():
+    graph, _ = synthetic(seed=5)
+    before = graph.dist.copy()
+    graph.close_node("n3")
+    assert not np.isfinite(graph.minutes("n0", "n3"))
+    assert "n3" not in graph.path("n1", "n2")
+    assert_matches_full_rebuild(graph)
+    graph.reopen_node("n3")
+    np.testing.assert_allclose(graph.dist, before, rtol=1e-5)
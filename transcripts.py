@@ -0,0 +1,118 @@
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+# Full conversation log, kept apart from the agent state (which only holds a window, see
+# checkpointing.py). Every message gets a per-thread sequence number; clients page with it.
+
+
+def encode_cursor(seq: int) -> str:
+    return str(seq)
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if cursor is None or cursor == "":
+        return None
+    try:
+        seq = int(cursor)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if seq < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return seq
+
+
+def _page(rows: List[dict], before: Optional[int], after: Optional[int], limit: int) -> Tuple[List[dict], bool]:
+    """rows ascending by seq -> (page ascending, more beyond it in the paging direction)."""
+    if after is not None:
+        newer = [r for r in rows if r["seq"] > after]
+        return newer[:limit], len(newer) > limit
+    older = [r for r in rows if before is None or r["seq"] < before]
+    return older[-limit:], len(older) > limit
+
+
+class MemoryTranscriptStore:
+    """Per-process transcript log for tests and local runs."""
+
+    def __init__(self):
+        self._rows: Dict[str, List[dict]] = {}
+
+    async def append(self, thread_id: str, messages: List[Tuple[str, str]]) -> List[dict]:
+        rows = self._rows.setdefault(thread_id, [])
+        start = rows[-1]["seq"] + 1 if rows else 1
+        new = [{"seq": start + i, "role": role, "text": text, "ts": time.time()}
+               for i, (role, text) in enumerate(messages)]
+        rows.extend(new)
+        return new
+
+    async def page(self, thread_id: str, before: Optional[int] = None, after: Optional[int] = None,
+                   limit: int = 50) -> Tuple[List[dict], bool]:
+        return _page(self._rows.get(thread_id, []), before, after, limit)
+
+
+class MongoTranscriptStore:
+    """
+    One document per message in Mongo, indexed on (thread_id, seq), expiring with the thread.
+    Sequence numbers come from a per-thread counter document bumped atomically with $inc, so
+    any number of workers can append to the same thread without colliding on the unique index.
+    """
+
+    def __init__(self, collection, acollection, counters, acounters, ttl_seconds: Optional[float] = None):
+        self.acollection = acollection
+        self.acounters = acounters
+        collection.create_index([("thread_id", 1), ("seq", 1)], unique=True)
+        if ttl_seconds:
+            collection.create_index("created_at", expireAfterSeconds=int(ttl_seconds))
+            counters.create_index("updated_at", expireAfterSeconds=int(ttl_seconds))
+
+    async def _bump(self, thread_id: str, count: int) -> Optional[dict]:
+        # $currentDate keeps the request free of client timestamps (and replayable from a cassette)
+        return await self.acounters.find_one_and_update(
+            {"_id": thread_id}, {"$inc": {"seq": count}, "$currentDate": {"updated_at": True}},
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _reserve(self, thread_id: str, count: int) -> int:
+        counter = await self._bump(thread_id, count)
+        if counter is None:
+            # First append for this thread (or one logged before counters existed): start the
+            # counter at the highest stored seq. $max makes racing workers agree.
+            last = await self.acollection.find_one({"thread_id": thread_id}, {"seq": 1}, sort=[("seq", -1)])
+            await self.acounters.update_one({"_id": thread_id}, {"$max": {"seq": last["seq"] if last else 0}},
+                                            upsert=True)
+            counter = await self._bump(thread_id, count)
+            if counter is None:
+                raise RuntimeError(f"Could not allocate transcript sequence numbers for {thread_id}")
+        return counter["seq"] - count + 1
+
+    async def append(self, thread_id: str, messages: List[Tuple[str, str]]) -> List[dict]:
+        """Raises if the messages could not be stored: /chat must not hand out cursors to lost rows."""
+        start = await self._reserve(thread_id, len(messages))
+        now = datetime.now(timezone.utc)
+        new = [{"seq": start + i, "role": role, "text": text, "ts": now.timestamp()}
+               for i, (role, text) in enumerate(messages)]
+        await self.acollection.insert_many([dict(row, thread_id=thread_id, created_at=now) for row in new])
+        return new
+
+    async def page(self, thread_id: str, before: Optional[int] = None, after: Optional[int] = None,
+                   limit: int = 50) -> Tuple[List[dict], bool]:
+        query = {"thread_id": thread_id}
+        projection = {"_id": 0, "seq": 1, "role": 1, "text": 1, "ts": 1}
+        if after is not None:
+            query["seq"] = {"$gt": after}
+            rows = await self.acollection.find(query, projection).sort("seq", 1).limit(limit + 1).to_list(None)
+            return rows[:limit], len(rows) > limit
+        if before is not None:
+            query["seq"] = {"$lt": before}
+        rows = await self.acollection.find(query, projection).sort("seq", -1).limit(limit + 1).to_list(None)
+        return rows[:limit][::-1], len(rows) > limit
+
+
+def build_transcript_store(kind: str, db=None, adb=None, ttl_seconds: Optional[float] = None):
+    """kind: mongo | memory"""
+    if (kind or "mongo").lower() == "memory" or db is None:
+        return MemoryTranscriptStore()
+    return MongoTranscriptStore(db["transcripts"], adb["transcripts"], db["transcript_counters"],
+                                adb["transcript_counters"], ttl_seconds=ttl_seconds)
@@ -0,0 +1,483 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+try:
+    import hnswlib  # Optional: only worth it once an airport has thousands of amenities
+except ImportError:
+    hnswlib = None
+
+from telemetry import log, telemetry
+from spatial_index import GridIndex, distance_m, hybrid_scores, relevance_cutoff, walk_minutes
+
+# Fields we keep in memory next to each vector. Live status (metadata) is NOT cached here;
+# it changes every few seconds, so it is hydrated per query.
+STATIC_FIELDS = ["name", "type", "description_for_embedding", "terminal_id", "airport_code", "lat", "lon"]
+HNSW_MIN_SIZE = 5000
+HYBRID_CANDIDATES = 50  # Semantic shortlist size for location-aware ranking
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class LocalVectorIndex:
+    """
+    In-process cosine index over one airport's amenities.
+    Vectors live in a single contiguous float32 matrix (rows L2-normalized), so a search
+    is one matrix-vector product plus an argpartition.
+    """
+
+    def __init__(self, airport_code: str, ids: list, vectors: np.ndarray, payloads: List[dict],
+                 use_hnsw: Optional[bool] = None):
+        self.airport_code = airport_code
+        self.ids = ids
+        self.vectors = np.ascontiguousarray(_normalize_rows(vectors.astype(np.float32, copy=False)))
+        self.payloads = payloads
+        self.loaded_at = time.time()
+
+        # Precompute one boolean mask per terminal so filtering is a cheap vector op.
+        terminals = np.array([str(p.get("terminal_id")) for p in payloads], dtype=object)
+        self.terminal_masks: Dict[str, np.ndarray] = {
+            t: terminals == t for t in set(terminals.tolist())
+        }
+        # Where each amenity physically is, for "nearest to my gate" ranking.
+        self.spatial = GridIndex(
+            [p["lat"] if p.get("lat") is not None else np.nan for p in payloads],
+            [p["lon"] if p.get("lon") is not None else np.nan for p in payloads],
+        )
+
+        if use_hnsw is None:
+            use_hnsw = hnswlib is not None and len(ids) >= HNSW_MIN_SIZE
+        self.hnsw = self._build_hnsw() if use_hnsw and len(ids) else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_collection(cls, collection, airport_code: str, embedding_field: str = "embedding", **kwargs):
+        projection = {field: 1 for field in STATIC_FIELDS}
+        projection[embedding_field] = 1
+        ids, vectors, payloads = [], [], []
+        for doc in collection.find({"airport_code": airport_code, embedding_field: {"$exists": True}}, projection):
+            ids.append(doc["_id"])
+            vectors.append(doc[embedding_field])
+            payloads.append({field: doc.get(field) for field in STATIC_FIELDS})
+        matrix = np.asarray(vectors, dtype=np.float32) if vectors else np.zeros((0, 1), dtype=np.float32)
+        return cls(airport_code, ids, matrix, payloads, **kwargs)
+
+    def _build_hnsw(self):
+        index = hnswlib.Index(space="ip", dim=self.vectors.shape[1])
+        index.init_index(max_elements=len(self.ids), ef_construction=200, M=16)
+        index.add_items(self.vectors, np.arange(len(self.ids)))
+        index.set_ef(128)
+        return index
+
+    def _mask(self, terminal: Optional[str]) -> Optional[np.ndarray]:
+        if terminal is None:
+            return None
+        return self.terminal_masks.get(str(terminal), np.zeros(len(self.ids), dtype=bool))
+
+    def brute_force(self, query_vector, k: int, terminal: Optional[str] = None):
+        """Exact top-k as (row, score) pairs. Also the ground truth for recall checks."""
+        if not len(self.ids):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self.vectors @ query
+        mask = self._mask(terminal)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top if scores[i] != -np.inf]
+
+    def search(self, query_vector, k: int, terminal: Optional[str] = None):
+        if self.hnsw is None:
+            return self.brute_force(query_vector, k, terminal)
+        mask = self._mask(terminal)
+        available = len(self.ids) if mask is None else int(mask.sum())
+        k = min(k, available)
+        if k == 0:
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        flt = None if mask is None else (lambda label: bool(mask[label]))
+        labels, distances = self.hnsw.knn_query(query, k=k, filter=flt)
+        # hnswlib's "ip" space returns 1 - dot product
+        return [(int(i), float(1.0 - d)) for i, d in zip(labels[0], distances[0])]
+
+    def _hybrid_rank(self, query_vector, rows: np.ndarray, k: int, origin, weight: float):
+        query = np.asarray(query_vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        dist = self.spatial.distances(*origin, rows)
+        scores = hybrid_scores(self.vectors[rows] @ query, dist, weight)
+        top = np.argsort(-scores)[:k]
+        return [(int(rows[i]), float(scores[i]), float(dist[i])) for i in top]
+
+    def _ranked_then_rest(self, query_vector, relevant: np.ndarray, rest, k: int, origin, weight: float):
+        """Relevant rows re-ranked by distance, then (only if short of k) the rest in similarity order, unboosted."""
+        ranked = self._hybrid_rank(query_vector, relevant, k, origin, weight) if len(relevant) else []
+        filler = [row for row, _ in rest[:k - len(ranked)]]
+        if filler:
+            dist = self.spatial.distances(*origin, filler)
+            ranked += [(row, score, float(m)) for (row, score), m in zip(rest, dist)]
+        return ranked
+
+    def hybrid_search(self, query_vector, k: int, origin, weight: float, terminal: Optional[str] = None,
+                      candidates: int = HYBRID_CANDIDATES):
+        """
+        Top-k by similarity boosted by proximity to `origin` (lat, lon) as (row, score, metres).
+
+        Only the semantic shortlist above the relevance cutoff is re-ranked; amenities that merely
+        happen to be close are never considered. The shortlist grows until it reaches below the
+        cutoff, so every relevant amenity is scored and the answer matches hybrid_brute_force.
+        """
+        while True:
+            semantic = self.search(query_vector, candidates, terminal)
+            if not semantic:
+                return []
+            cutoff = relevance_cutoff(semantic[0][1])
+            if len(semantic) < candidates or semantic[-1][1] < cutoff:
+                break
+            candidates *= 4
+        relevant = np.array([row for row, score in semantic if score >= cutoff], dtype=np.int64)
+        return self._ranked_then_rest(query_vector, relevant, semantic[len(relevant):], k, origin, weight)
+
+    def hybrid_brute_force(self, query_vector, k: int, origin, weight: float, terminal: Optional[str] = None):
+        """Exact hybrid top-k over every row; ground truth for the shortlist approximation."""
+        mask = self._mask(terminal)
+        rows = np.arange(len(self.ids)) if mask is None else np.flatnonzero(mask)
+        if not len(rows):
+            return []
+        query = np.asarray(query_vector, dtype=np.float32)
+        similarity = self.vectors[rows] @ (query / (np.linalg.norm(query) or 1.0))
+        keep = similarity >= relevance_cutoff(float(similarity.max()))
+        order = np.argsort(-similarity[~keep])[:k]
+        rest = [(int(row), float(score)) for row, score in zip(rows[~keep][order], similarity[~keep][order])]
+        return self._ranked_then_rest(query_vector, rows[keep], rest, k, origin, weight)
+
+
+# --- RETRIEVAL BACKENDS ---
+# Both backends return the same shape as the old $vectorSearch + $project pipeline:
+# dicts with _id, name, type, description_for_embedding, metadata, terminal_id, airport_code, lat, lon, score.
+# With an `origin` (user's lat, lon) and a spatial_weight > 0, hits are ranked by similarity
+# blended with proximity, and carry distance_m / walk_minutes.
+
+def _annotate_distance(doc: dict, metres: float) -> dict:
+    if not np.isnan(metres):
+        doc["distance_m"] = round(float(metres))
+        doc["walk_minutes"] = round(float(walk_minutes(metres)), 1)
+    return doc
+
+
+class _LiveStatusJoin:
+    """
+    Fills `metadata` (live status) on retrieved hits. With an AmenityStatusTable this is a
+    pure in-memory join; only ids the table doesn't know yet cost one find() by _id.
+    """
+
+    collection = None
+    acollection = None
+    status_table = None
+
+    def _join_from_table(self, docs: List[dict]) -> List[dict]:
+        if self.status_table is None:
+            return docs
+        missing = []
+        for d in docs:
+            status = self.status_table.get(d["_id"])
+            if status is None:
+                missing.append(d)
+            else:
+                d["metadata"] = status
+        return missing
+
+    @staticmethod
+    def _merge_live(docs: List[dict], live_docs) -> List[dict]:
+        live = {d["_id"]: d.get("metadata", {}) for d in live_docs}
+        for d in docs:
+            d["metadata"] = live.get(d["_id"], {})
+        return docs
+
+    def hydrate(self, docs: List[dict]) -> List[dict]:
+        missing = self._join_from_table(docs)
+        if missing:
+            query = {"_id": {"$in": [d["_id"] for d in missing]}}
+            with telemetry.span("mongo.find", collection="amenities", purpose="live_status"):
+                self._merge_live(missing, list(self.collection.find(query, {"metadata": 1})))
+        return docs
+
+    async def ahydrate(self, docs: List[dict]) -> List[dict]:
+        missing = self._join_from_table(docs)
+        if missing:
+            query = {"_id": {"$in": [d["_id"] for d in missing]}}
+            with telemetry.span("mongo.find", collection="amenities", purpose="live_status"):
+                if self.acollection is None:
+                    live_docs = await asyncio.to_thread(lambda: list(self.collection.find(query, {"metadata": 1})))
+                else:
+                    live_docs = await self.acollection.find(query, {"metadata": 1}).to_list(None)
+            self._merge_live(missing, live_docs)
+        return docs
+
+
+class AtlasRetriever(_LiveStatusJoin):
+    def __init__(self, collection, index_name: str = "vector_index", embedding_field: str = "embedding",
+                 num_candidates: int = 100, acollection=None, status_table=None):
+        self.collection = collection
+        self.acollection = acollection
+        self.status_table = status_table
+        self.index_name = index_name
+        self.embedding_field = embedding_field
+        self.num_candidates = num_candidates
+
+    def _pipeline(self, query_vector, airport_code: str, terminal: Optional[str], limit: int):
+        search_filter = {"airport_code": {"$eq": airport_code}}
+        if terminal:
+            search_filter["terminal_id"] = {"$eq": terminal}
+        projection = {
+            "name": 1,
+            "type": 1,
+            "description_for_embedding": 1,
+            "terminal_id": 1,
+            "airport_code": 1,
+            "lat": 1,
+            "lon": 1,
+            "score": {"$meta": "vectorSearchScore"}
+        }
+        if self.status_table is None:
+            # No local status table: ship the live fields back with the hits
+            projection["metadata"] = 1
+        return [
+            {
+                "$vectorSearch": {
+                    "index": self.index_name,
+                    "path": self.embedding_field,
+                    "queryVector": query_vector,
+                    "numCandidates": self.num_candidates,
+                    "limit": max(limit, 10),
+                    "filter": search_filter
+                }
+            },
+            {"$limit": limit},
+            {"$project": projection}
+        ]
+
+    @staticmethod
+    def _rerank(docs: List[dict], limit: int, origin, spatial_weight: float) -> List[dict]:
+        # $vectorSearch can't take a location into account: over-fetch, then rerank the relevant hits here.
+        if not origin or not spatial_weight or not docs:
+            return docs[:limit]
+        # Atlas reports cosine scores as (1 + cos) / 2; compare relevance on the cosine itself.
+        similarity = np.array([2 * d.get("score", 0.0) - 1 for d in docs])
+        cutoff = relevance_cutoff(float(similarity.max()))
+        relevant = [(d, s) for d, s in zip(docs, similarity) if s >= cutoff]
+        dist = np.array([
+            distance_m(origin[0], origin[1], d["lat"], d["lon"]) if d.get("lat") is not None else np.nan
+            for d, _ in relevant
+        ])
+        scores = hybrid_scores([s for _, s in relevant], dist, spatial_weight)
+        for (d, _), s, m in zip(relevant, scores, dist):
+            d["score"] = float(s)
+            _annotate_distance(d, m)
+        ranked = sorted((d for d, _ in relevant), key=lambda d: -d["score"])
+        return (ranked + [d for d, s in zip(docs, similarity) if s < cutoff])[:limit]
+
+    def warm(self, airport_code: str):
+        """Nothing to preload: the index lives in Atlas."""
+
+    def _fetch_size(self, limit: int, origin, spatial_weight: float) -> int:
+        return max(limit * 5, 20) if origin and spatial_weight else limit
+
+    def search(self, query_vector, airport_code: str, terminal: Optional[str] = None, limit: int = 3,
+               origin=None, spatial_weight: float = 0.0):
+        fetch = self._fetch_size(limit, origin, spatial_weight)
+        with telemetry.span("mongo.vector_search", airport=airport_code, index=self.index_name):
+            docs = list(self.collection.aggregate(self._pipeline(query_vector, airport_code, terminal, fetch)))
+        docs = self._rerank(docs, limit, origin, spatial_weight)
+        return self.hydrate(docs) if self.status_table is not None else docs
+
+    async def asearch(self, query_vector, airport_code: str, terminal: Optional[str] = None, limit: int = 3,
+                      origin=None, spatial_weight: float = 0.0):
+        if self.acollection is None:
+            return await asyncio.to_thread(self.search, query_vector, airport_code, terminal, limit,
+                                           origin, spatial_weight)
+        fetch = self._fetch_size(limit, origin, spatial_weight)
+        with telemetry.span("mongo.vector_search", airport=airport_code, index=self.index_name):
+            cursor = await self.acollection.aggregate(self._pipeline(query_vector, airport_code, terminal, fetch))
+            docs = await cursor.to_list(None)
+        docs = self._rerank(docs, limit, origin, spatial_weight)
+        return await self.ahydrate(docs) if self.status_table is not None else docs
+
+
+class LocalRetriever(_LiveStatusJoin):
+    """
+    Keeps one LocalVectorIndex per airport, loaded on first use and reloaded after
+    `refresh_seconds` so newly seeded amenities show up without a restart.
+    """
+
+    def __init__(self, collection, embedding_field: str = "embedding", refresh_seconds: float = 600,
+                 acollection=None, status_table=None):
+        self.collection = collection
+        self.acollection = acollection
+        self.status_table = status_table
+        self.embedding_field = embedding_field
+        self.refresh_seconds = refresh_seconds
+        self._indexes: Dict[str, LocalVectorIndex] = {}
+        self._lock = threading.Lock()
+
+    def _fresh_index(self, airport_code: str) -> Optional[LocalVectorIndex]:
+        index = self._indexes.get(airport_code)
+        if index is not None and time.time() - index.loaded_at < self.refresh_seconds:
+            return index
+        return None
+
+    def get_index(self, airport_code: str) -> LocalVectorIndex:
+        index = self._fresh_index(airport_code)
+        if index is not None:
+            return index
+        with self._lock:
+            index = self._indexes.get(airport_code)
+            if index is None or time.time() - index.loaded_at >= self.refresh_seconds:
+                with telemetry.span("vector_index.load", airport=airport_code):
+                    index = LocalVectorIndex.from_collection(self.collection, airport_code, self.embedding_field)
+                self._indexes[airport_code] = index
+        return index
+
+    def warm(self, airport_code: str):
+        """Loads the airport's index ahead of the first query (e.g. from /warmup)."""
+        self.get_index(airport_code)
+
+    @staticmethod
+    def _top_docs(index: LocalVectorIndex, query_vector, terminal: Optional[str], limit: int,
+                  origin=None, spatial_weight: float = 0.0) -> List[dict]:
+        if not len(index):
+            raise LookupError(f"No local embeddings loaded for {index.airport_code}")
+        if origin and spatial_weight:
+            return [
+                _annotate_distance(dict(index.payloads[row], _id=index.ids[row], score=score), metres)
+                for row, score, metres in index.hybrid_search(query_vector, limit, origin, spatial_weight, terminal)
+            ]
+        return [
+            dict(index.payloads[row], _id=index.ids[row], score=score)
+            for row, score in index.search(query_vector, limit, terminal)
+        ]
+
+    def search(self, query_vector, airport_code: str, terminal: Optional[str] = None, limit: int = 3,
+               origin=None, spatial_weight: float = 0.0):
+        index = self.get_index(airport_code)
+        with telemetry.span("vector_search.local", airport=airport_code):
+            docs = self._top_docs(index, query_vector, terminal, limit, origin, spatial_weight)
+        return self.hydrate(docs)
+
+    async def asearch(self, query_vector, airport_code: str, terminal: Optional[str] = None, limit: int = 3,
+                      origin=None, spatial_weight: float = 0.0):
+        index = self._fresh_index(airport_code)
+        if index is None:
+            # (Re)loading pulls every embedding for the airport; do it off the event loop.
+            index = await asyncio.to_thread(self.get_index, airport_code)
+        with telemetry.span("vector_search.local", airport=airport_code):
+            docs = self._top_docs(index, query_vector, terminal, limit, origin, spatial_weight)
+        return await self.ahydrate(docs)
+
+
+class FallbackRetriever:
+    """Tries the in-process index first and falls back to Atlas $vectorSearch on any failure."""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+
+    def warm(self, airport_code: str):
+        self.primary.warm(airport_code)
+
+    def search(self, query_vector, airport_code: str, terminal: Optional[str] = None, limit: int = 3,
+               origin=None, spatial_weight: float = 0.0):
+        try:
+            return self.primary.search(query_vector, airport_code, terminal, limit, origin, spatial_weight)
+        except Exception as e:
+            log.warning("⚠️ Local index unavailable, falling back to Atlas $vectorSearch", extra={"airport": airport_code, "error": str(e)})
+            return self.fallback.search(query_vector, airport_code, terminal, limit, origin, spatial_weight)
+
+    async def asearch(self, query_vector, airport_code: str, terminal: Optional[str] = None, limit: int = 3,
+                      origin=None, spatial_weight: float = 0.0):
+        try:
+            return await self.primary.asearch(query_vector, airport_code, terminal, limit, origin, spatial_weight)
+        except Exception as e:
+            log.warning("⚠️ Local index unavailable, falling back to Atlas $vectorSearch", extra={"airport": airport_code, "error": str(e)})
+            return await self.fallback.asearch(query_vector, airport_code, terminal, limit, origin, spatial_weight)
+
+
+def build_retriever(backend: str, collection, index_name: str = "vector_index", embedding_field: str = "embedding",
+                    acollection=None, status_table=None):
+    """Returns the retriever named by RETRIEVAL_BACKEND ('local' or 'atlas')."""
+    atlas = AtlasRetriever(collection, index_name=index_name, embedding_field=embedding_field,
+                           acollection=acollection, status_table=status_table)
+    if (backend or "local").lower() == "atlas":
+        return atlas
+    return FallbackRetriever(
+        LocalRetriever(collection, embedding_field=embedding_field, acollection=acollection,
+                       status_table=status_table),
+        atlas
+    )
+
+
+# --- RECALL CHECK ---
+
+def recall_at_k(index: LocalVectorIndex, queries: np.ndarray, k: int = 3, terminal: Optional[str] = None) -> float:
+    """Fraction of the exact top-k that index.search() also returns, averaged over queries."""
+    total, found = 0, 0
+    for query in queries:
+        truth = {row for row, _ in index.brute_force(query, k, terminal)}
+        got = {row for row, _ in index.search(query, k, terminal)}
+        total += len(truth)
+        found += len(truth & got)
+    return found / total if total else 1.0
+
+
+def _synthetic_index(n: int, dim: int, terminals: int, seed: int) -> LocalVectorIndex:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    payloads = [{"name": f"POI {i}", "terminal_id": str(i % terminals + 1)} for i in range(n)]
+    return LocalVectorIndex("SYN", list(range(n)), vectors, payloads, use_hnsw=hnswlib is not None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k of the local index against exact brute force.")
+    parser.add_argument("--airport", help="Load this airport from MongoDB (default: synthetic corpus)")
+    parser.add_argument("--size", type=int, default=20000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.airport:
+        from dotenv import load_dotenv
+        from pymongo import MongoClient
+        load_dotenv()
+        client = MongoClient(os.getenv("MONGO_URI"), tlsAllowInvalidCertificates=True)
+        index = LocalVectorIndex.from_collection(client["layover_os"]["amenities"], args.airport,
+                                                 use_hnsw=hnswlib is not None)
+    else:
+        index = _synthetic_index(args.size, args.dim, terminals=4, seed=7)
+
+    print(f"📦 Index: {len(index)} vectors ({'HNSW' if index.hnsw else 'brute force'})")
+    # Queries are jittered copies of stored vectors: close to real traffic, never exact duplicates.
+    rng = np.random.default_rng(11)
+    sample = index.vectors[rng.integers(0, len(index), args.queries)]
+    queries = sample + rng.normal(0, 0.05, sample.shape).astype(np.float32)
+
+    for terminal in [None] + sorted(index.terminal_masks)[:2]:
+        start = time.perf_counter()
+        recall = recall_at_k(index, queries, args.k, terminal)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        label = f"Terminal {terminal}" if terminal else "All terminals"
+        print(f"   {label:<16} recall@{args.k}: {recall:.3f}  ({elapsed_ms:.2f} ms/query incl. ground truth)")
@@ -1,8 +1,9 @@
 import os
-import time
 from dotenv import load_dotenv
 from pymongo import MongoClient
-from langchain_voyageai import VoyageAIEmbeddings
+from embedding_providers import PROVIDERS, build_embeddings
+from telemetry import telemetry
+from cassettes import CassetteEmbeddings, CassetteMongoClient, cassette_from_env
 
 # Load env variables
 load_dotenv()
@@ -11,55 +12,59 @@ MONGO_URI = os.getenv("MONGO_URI")
 VOYAGE_API_KEY = os.getenv("VOYAGE_API_KEY")
 DB_NAME = "layover_os"
 COLLECTION_NAME = "amenities"
-INDEX_NAME = "vector_index"
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "voyage").lower()  # voyage | hashed | sentence-transformers
+INDEX_NAME = os.getenv("INDEX_NAME") or PROVIDERS[EMBEDDING_PROVIDER]["index"]
+EMBEDDING_FIELD = os.getenv("EMBEDDING_FIELD") or PROVIDERS[EMBEDDING_PROVIDER]["field"]
 
 def verify_search():
-    print("🔍 [Verification] Connecting to MongoDB Atlas & Voyage AI...")
+    print(f"🔍 [Verification] Connecting to MongoDB Atlas ({EMBEDDING_PROVIDER} embeddings)...")
     
-    if not MONGO_URI or not VOYAGE_API_KEY:
+    cassette = cassette_from_env()  # CASSETTE_MODE=replay runs this without credentials
+    replaying = cassette is not None and cassette.replaying
+    if not replaying and (not MONGO_URI or (EMBEDDING_PROVIDER == "voyage" and not VOYAGE_API_KEY)):
         print("❌ Error: Missing credentials in .env")
         return
 
     try:
         # 1. Connect
-        client = MongoClient(MONGO_URI, tlsAllowInvalidCertificates=True)
+        client = None if replaying else MongoClient(MONGO_URI, tlsAllowInvalidCertificates=True)
+        embeddings = None if replaying else build_embeddings(
+            EMBEDDING_PROVIDER, api_key=VOYAGE_API_KEY, idf_path=os.getenv("EMBEDDING_IDF_PATH", "embedding_idf.json"))[0]
+        if cassette:
+            client = CassetteMongoClient(client, cassette)
+            embeddings = CassetteEmbeddings(embeddings, cassette)
         db = client[DB_NAME]
         collection = db[COLLECTION_NAME]
         
         # 2. Embed Query
-        embeddings = VoyageAIEmbeddings(model="voyage-3-large", voyage_api_key=VOYAGE_API_KEY)
         query = "Where can I get some coffee?"
         print(f"✨ Embedding Query: '{query}'")
         query_vector = embeddings.embed_query(query)
         
         # 3. Vector Search
         print("🚀 Executing $vectorSearch on Atlas...")
-        start_time = time.time()
-        
-        results = collection.aggregate([
-            {
-                "$vectorSearch": {
-                    "index": INDEX_NAME,
-                    "path": "embedding",
-                    "queryVector": query_vector,
-                    "numCandidates": 100,
-                    "limit": 5
-                }
-            },
-            {
-                "$project": {
-                    "name": 1, 
-                    "description_for_embedding": 1, 
-                    "score": {"$meta": "vectorSearchScore"}
+        with telemetry.span("mongo.vector_search", index=INDEX_NAME) as search:
+            items = list(collection.aggregate([
+                {
+                    "$vectorSearch": {
+                        "index": INDEX_NAME,
+                        "path": EMBEDDING_FIELD,
+                        "queryVector": query_vector,
+                        "numCandidates": 100,
+                        "limit": 5
+                    }
+                },
+                {
+                    "$project": {
+                        "name": 1, 
+                        "description_for_embedding": 1, 
+                        "score": {"$meta": "vectorSearchScore"}
+                    }
                 }
-            }
-        ])
-        
-        elapsed = time.time() - start_time
-        print(f"✅ Search Complete in {elapsed:.2f} seconds.")
+            ]))
+        print(f"✅ Search Complete in {search.elapsed_ms / 1000:.2f} seconds.")
         
         # 4. Print Results
-        items = list(results)
         if items:
             print(f"\n🎯 Found {len(items)} Matches:")
             for i, item in enumerate(items):
@@ -0,0 +1,341 @@
+import asyncio
+import heapq
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from spatial_index import distance_m, walk_minutes
+from telemetry import log
+
+GATE_PATTERN = re.compile(r'^\s*(?:Gate\s+)?([A-Z]+)\s*-?\s*\d+[A-Z]?\s*$', re.IGNORECASE)
+TERMINAL_PATTERN = re.compile(r'^\s*Terminal\s+(\w+)\s*$', re.IGNORECASE)
+NODE_PREFERENCE = ("terminal", "gates", "checkpoint", "airtrain")  # Which node stands for "Terminal X"
+
+
+class WalkingGraph:
+    """
+    Walking times (minutes) inside one airport.
+
+    Gates, checkpoints, AirTrain stations and terminal halls are graph nodes; all-pairs
+    shortest paths are precomputed into an n x n float32 matrix plus a next-hop matrix, so
+    minutes(a, b) and path(a, b) are array lookups. Amenities are not full nodes: each is
+    anchored to its nearest node with a short access walk, which keeps the tables at
+    "number of gates and checkpoints" size while amenity lookups stay O(1).
+
+    set_edge() / close_node() update the tables incrementally: a faster edge relaxes every
+    pair through it in one vectorized pass; a slower or closed edge only re-runs Dijkstra
+    from the sources whose shortest paths actually used it.
+    """
+
+    def __init__(self, airport_code: str, nodes: List[dict], edges: List[dict]):
+        self.airport_code = airport_code
+        self.nodes = nodes
+        self.ids = [n["id"] for n in nodes]
+        self.index = {node_id: i for i, node_id in enumerate(self.ids)}
+        n = len(nodes)
+        self._adj: List[Dict[int, float]] = [dict() for _ in range(n)]
+        self._closed: Dict[str, Dict[int, float]] = {}
+        for edge in edges:
+            a, b = self.index[edge["a"]], self.index[edge["b"]]
+            minutes = edge.get("minutes")
+            if minutes is None:
+                minutes = walk_minutes(distance_m(nodes[a]["lat"], nodes[a]["lon"], nodes[b]["lat"], nodes[b]["lon"]))
+            self._adj[a][b] = self._adj[b][a] = float(minutes)
+
+        # Compact tables: float32 minutes, int16 next hops (int32 past 32k nodes)
+        self._hop_dtype = np.int16 if n < 2 ** 15 else np.int32
+        self.dist = np.full((n, n), np.inf, dtype=np.float32)
+        self.next_hop = np.full((n, n), -1, dtype=self._hop_dtype)
+        self._floyd_warshall()
+
+        self.amenity_row: Dict = {}
+        self.amenity_anchor = np.zeros(0, dtype=self._hop_dtype)
+        self.amenity_access = np.zeros(0, dtype=np.float32)
+        self.built_at = time.time()
+
+    # --- CONSTRUCTION ---
+
+    @classmethod
+    def from_registry(cls, airport: dict) -> "WalkingGraph":
+        """Uses the airport's `walkways` if present, else terminal centroids fully connected."""
+        walkways = airport.get("walkways")
+        if walkways:
+            return cls(airport["code"].upper(), walkways["nodes"], walkways["edges"])
+        nodes = []
+        for t in airport.get("terminals", []):
+            lats = [p[0] for p in t["polygon"]]
+            lons = [p[1] for p in t["polygon"]]
+            nodes.append({"id": str(t["id"]), "kind": "terminal", "terminal": str(t["id"]),
+                          "lat": sum(lats) / len(lats), "lon": sum(lons) / len(lons)})
+        edges = [{"a": a["id"], "b": b["id"]} for i, a in enumerate(nodes) for b in nodes[i + 1:]]
+        return cls(airport["code"].upper(), nodes, edges)
+
+    def _floyd_warshall(self):
+        n = len(self.ids)
+        dist, hop = self.dist, self.next_hop
+        for i in range(n):
+            dist[i, i] = 0.0
+            hop[i, i] = i
+            for j, w in self._adj[i].items():
+                if w < dist[i, j]:
+                    dist[i, j] = w
+                    hop[i, j] = j
+        for k in range(n):
+            via = dist[:, k, None] + dist[None, k, :]
+            better = via < dist
+            if better.any():
+                dist[better] = via[better]
+                hop[better] = np.broadcast_to(hop[:, k, None], (n, n))[better]
+
+    def attach_amenities(self, docs: Iterable[dict]):
+        """Anchors each amenity (needs _id, lat, lon) to its nearest node, preferring its own terminal."""
+        coords = np.array([[n["lat"], n["lon"]] for n in self.nodes], dtype=np.float64)
+        terminals = np.array([str(n.get("terminal")) for n in self.nodes], dtype=object)
+        rows, anchors, access = {}, [], []
+        for doc in docs:
+            if doc.get("lat") is None or doc.get("lon") is None:
+                continue
+            metres = np.array([distance_m(doc["lat"], doc["lon"], lat, lon) for lat, lon in coords])
+            same_terminal = terminals == str(doc.get("terminal_id"))
+            candidates = np.flatnonzero(same_terminal) if same_terminal.any() else np.arange(len(coords))
+            anchor = int(candidates[np.argmin(metres[candidates])])
+            rows[doc["_id"]] = len(anchors)
+            anchors.append(anchor)
+            access.append(walk_minutes(metres[anchor]))
+        self.amenity_row = rows
+        self.amenity_anchor = np.array(anchors, dtype=self._hop_dtype)
+        self.amenity_access = np.array(access, dtype=np.float32)
+        return len(rows)
+
+    # --- LOOKUPS ---
+
+    def resolve(self, location: Optional[str]) -> Optional[str]:
+        """'Terminal 2', '2', 'Gate F12', 'F12' or a node id -> node id (None if unknown)."""
+        if not location:
+            return None
+        location = str(location).strip()
+        if location in self.index:
+            return location
+        match = TERMINAL_PATTERN.match(location)
+        terminal = (match.group(1) if match else location).upper()
+        for kind in NODE_PREFERENCE:
+            for node in self.nodes:
+                if node.get("kind") == kind and str(node.get("terminal", "")).upper() == terminal:
+                    return node["id"]
+        match = GATE_PATTERN.match(location)
+        if match:
+            return self.gate_node(match.group(1))
+        return None
+
+    def gate_node(self, gate: str) -> Optional[str]:
+        """'F12' / 'F' -> the node for boarding area F."""
+        area = re.match(r'\s*([A-Z]+)', str(gate).upper())
+        if not area:
+            return None
+        for node in self.nodes:
+            if node["id"].upper() == area.group(1) and node.get("kind") in ("gates", "terminal"):
+                return node["id"]
+        return None
+
+    def minutes(self, a: str, b: str) -> float:
+        return float(self.dist[self.index[a], self.index[b]])
+
+    def path(self, a: str, b: str) -> List[str]:
+        i, j = self.index[a], self.index[b]
+        if not np.isfinite(self.dist[i, j]):
+            return []
+        steps = [self.ids[i]]
+        while i != j:
+            i = int(self.next_hop[i, j])
+            steps.append(self.ids[i])
+        return steps
+
+    def amenity_minutes(self, node: str, amenity_id) -> Optional[float]:
+        row = self.amenity_row.get(amenity_id)
+        if row is None:
+            return None
+        return float(self.dist[self.index[node], self.amenity_anchor[row]] + self.amenity_access[row])
+
+    # --- INCREMENTAL UPDATES ---
+
+    def set_edge(self, a: str, b: str, minutes: Optional[float]):
+        """Adds, retimes or (minutes=None) removes the a<->b edge, then patches the tables."""
+        i, j = self.index[a], self.index[b]
+        old = self._adj[i].get(j, np.inf)
+        new = np.inf if minutes is None else float(minutes)
+        if new == old:
+            return
+        if np.isfinite(new):
+            self._adj[i][j] = self._adj[j][i] = new
+        else:
+            self._adj[i].pop(j, None)
+            self._adj[j].pop(i, None)
+        if new < old:
+            self._relax(i, j, new)
+        else:
+            self._repair(i, j, old)
+
+    def close_node(self, node: str):
+        """Takes a node out of service (e.g. a checkpoint closing); reopen_node() restores it."""
+        i = self.index[node]
+        if node in self._closed:
+            return
+        self._closed[node] = dict(self._adj[i])
+        for j in list(self._adj[i]):
+            self.set_edge(node, self.ids[j], None)
+
+    def reopen_node(self, node: str):
+        for j, w in self._closed.pop(node, {}).items():
+            self.set_edge(node, self.ids[j], w)
+
+    def _relax(self, i: int, j: int, w: float):
+        # Every pair (s, t) can now go s -> i -> j -> t (or the reverse).
+        for u, v in ((i, j), (j, i)):
+            via = self.dist[:, u, None] + np.float32(w) + self.dist[None, v, :]
+            better = via < self.dist
+            if better.any():
+                first = self.next_hop[:, u].copy()
+                first[u] = v
+                self.dist[better] = via[better]
+                self.next_hop[better] = np.broadcast_to(first[:, None], self.dist.shape)[better]
+
+    def _repair(self, i: int, j: int, old: float):
+        # Sources whose shortest-path tree used the edge are exactly those for which reaching one
+        # endpoint via the other was (one of) the shortest ways; every other row is unchanged.
+        tol = 1e-4
+        d = self.dist
+        with np.errstate(invalid="ignore"):  # inf - inf for unreachable pairs
+            affected = np.flatnonzero((np.abs(d[:, j] - (d[:, i] + old)) <= tol) |
+                                      (np.abs(d[:, i] - (d[:, j] + old)) <= tol))
+        for source in affected:
+            dist, hop = self._dijkstra(int(source))
+            self.dist[source] = dist
+            self.next_hop[source] = hop
+        # Undirected graph: keep the matrix symmetric for the recomputed rows.
+        self.dist[:, affected] = self.dist[affected].T
+
+    def _dijkstra(self, source: int):
+        # Plain lists in the hot loop: indexing numpy scalars one at a time is several times slower.
+        n = len(self.ids)
+        inf = float("inf")
+        dist = [inf] * n
+        hop = [-1] * n
+        done = [False] * n
+        dist[source] = 0.0
+        heap = [(0.0, source, source)]
+        adj = self._adj
+        while heap:
+            d, u, first = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            hop[u] = first
+            for v, w in adj[u].items():
+                nd = d + w
+                if nd < dist[v]:
+                    dist[v] = nd
+                    heapq.heappush(heap, (nd, v, v if u == source else first))
+        return np.array(dist, dtype=np.float32), np.array(hop, dtype=self._hop_dtype)
+
+    # --- PERSISTENCE ---
+
+    def save(self, path: str):
+        np.savez_compressed(path, ids=np.array(self.ids), dist=self.dist, next_hop=self.next_hop)
+
+    def stats(self) -> dict:
+        return {
+            "nodes": len(self.ids),
+            "amenities": len(self.amenity_row),
+            "table_bytes": int(self.dist.nbytes + self.next_hop.nbytes),
+            "closed": sorted(self._closed),
+        }
+
+
+class WalkingGraphs:
+    """One WalkingGraph per airport, built on first use from the registry + amenity coordinates."""
+
+    def __init__(self, registry: Dict[str, dict], collection=None, refresh_seconds: float = 600):
+        self.registry = registry
+        self.collection = collection
+        self.refresh_seconds = refresh_seconds
+        self._graphs: Dict[str, WalkingGraph] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_registry_file(cls, collection=None, path: Optional[str] = None) -> "WalkingGraphs":
+        from airport_extractor import load_registry, REGISTRY_PATH
+        try:
+            return cls(load_registry(path or REGISTRY_PATH), collection)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning("⚠️ Could not load airport registry, walking times disabled", extra={"error": str(e)})
+            return cls({}, collection)
+
+    def get(self, airport_code: str) -> Optional[WalkingGraph]:
+        code = (airport_code or "").upper()
+        graph = self._graphs.get(code)
+        if graph is not None and time.time() - graph.built_at < self.refresh_seconds:
+            return graph
+        if code not in self.registry:
+            return None
+        with self._lock:
+            graph = self._graphs.get(code)
+            if graph is None or time.time() - graph.built_at >= self.refresh_seconds:
+                fresh = WalkingGraph.from_registry(self.registry[code])
+                if graph is not None:
+                    # Carry live closures over to the rebuilt graph
+                    for node in graph._closed:
+                        fresh.close_node(node)
+                if self.collection is not None:
+                    try:
+                        fresh.attach_amenities(self.collection.find(
+                            {"airport_code": code}, {"lat": 1, "lon": 1, "terminal_id": 1}))
+                    except Exception as e:
+                        log.warning("⚠️ Could not anchor amenities", extra={"airport": code, "error": str(e)})
+                self._graphs[code] = graph = fresh
+        return graph
+
+    async def aget(self, airport_code: str) -> Optional[WalkingGraph]:
+        graph = self._graphs.get((airport_code or "").upper())
+        if graph is not None and time.time() - graph.built_at < self.refresh_seconds:
+            return graph
+        # (Re)building reads every amenity's coordinates; do it off the event loop.
+        return await asyncio.to_thread(self.get, airport_code)
+
+
+if __name__ == "__main__":
+    import argparse
+    from airport_extractor import load_registry
+
+    parser = argparse.ArgumentParser(description="Walking-time tables: lookups and incremental updates.")
+    parser.add_argument("--airport", default="SFO")
+    parser.add_argument("--size", type=int, default=400, help="Nodes in the synthetic graph")
+    args = parser.parse_args()
+
+    graph = WalkingGraph.from_registry(load_registry()[args.airport.upper()])
+    print(f"🗺️  {args.airport}: {graph.stats()}")
+    a, b = graph.ids[0], graph.ids[-1]
+    print(f"   {a} -> {b}: {graph.minutes(a, b):.1f} min via {' -> '.join(graph.path(a, b))}")
+
+    rng = np.random.default_rng(3)
+    coords = rng.uniform(0, 0.02, size=(args.size, 2)) + [37.6, -122.4]
+    nodes = [{"id": f"n{i}", "lat": float(lat), "lon": float(lon)} for i, (lat, lon) in enumerate(coords)]
+    edges = [{"a": f"n{i}", "b": f"n{j}"} for i in range(args.size)
+             for j in rng.choice(args.size, 3, replace=False) if i != j]
+
+    start = time.perf_counter()
+    synthetic = WalkingGraph("SYN", nodes, edges)
+    build_ms = (time.perf_counter() - start) * 1000
+    pairs = rng.integers(0, args.size, size=(10000, 2))
+    start = time.perf_counter()
+    for i, j in pairs:
+        synthetic.minutes(synthetic.ids[i], synthetic.ids[j])
+    lookup_us = (time.perf_counter() - start) / len(pairs) * 1e6
+    start = time.perf_counter()
+    for edge in edges[:20]:
+        synthetic.set_edge(edge["a"], edge["b"], None)
+    close_ms = (time.perf_counter() - start) * 1000 / 20
+    print(f"\n⏱️  {args.size} nodes: full build {build_ms:.0f} ms | lookup {lookup_us:.2f} µs | "
+          f"edge closure (incremental) {close_ms:.1f} ms")